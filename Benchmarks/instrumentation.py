@@ -0,0 +1,252 @@
+"""
+Lightweight instrumentation for finding out where the time of a run goes (reading the corpus,
+encrypting, writing files, loading data, featurizing, fit(), ...). Code is instrumented with
+timers and counters:
+
+    with instrumentation.timer("generate.write_shard"):
+        ...
+    instrumentation.count("data_loader.samples_read", len(lines))
+
+Instrumentation is off by default, and then a timer only measures its own block (so callers can
+still read timer.seconds) and count() returns straight away. It's turned on with enable(), or by
+setting the CIPHER_INSTRUMENTATION environment variable to a comma separated list of options:
+
+    timers: add up the time and number of calls of every timer, and the counters
+    cprofile: also run cProfile around every profiled() block and save the stats as <name>.prof
+    tracemalloc: also trace Python memory allocations and report the peak of every profiled() block
+
+(any other value, e.g. 1, means timers). A summary of every timer and counter is printed to
+stderr when the run finishes. Process pool workers collect their own totals, which the parent
+adds in with merge(snapshot()) (see ../Ciphers/generate.py).
+peak_memory() gives the peak memory of the process on any platform, for recording alongside
+results (see run_benchmarks.py and ../Results/results_store.py).
+
+Example: CIPHER_INSTRUMENTATION=timers,tracemalloc python KNN.py
+
+__author__ = "Aaron Smith"
+__date__ = "10/18/2026"
+"""
+
+import atexit
+import cProfile
+import multiprocessing
+import os
+import platform
+import sys
+import time
+import tracemalloc
+try:
+    import resource # Only on Unix
+except ImportError:
+    resource = None
+try:
+    import psutil # Optional, used for peak_memory() where resource isn't available (e.g. Windows)
+except ImportError:
+    psutil = None
+
+environment_variable = "CIPHER_INSTRUMENTATION"
+
+enabled = False # Whether timers and counters are added up
+options = set() # Which of "timers", "cprofile" and "tracemalloc" are on
+profile_directory = "." # Where profiled() blocks save their cProfile stats
+
+timings = {} # Timer name -> [number of calls, total seconds]
+counters = {} # Counter name -> total
+memory_peaks = {} # profiled() block name -> peak bytes traced by tracemalloc
+_reporting = False # Whether the summary is printed at exit
+
+
+class Timer:
+    """
+    Class for timing a block of code (use timer() to make one). After the block, seconds holds how
+    long it took, whether or not instrumentation is enabled.
+    """
+    __slots__ = ["name", "start", "seconds"]
+
+    def __init__(self, name):
+        self.name = name
+        self.seconds = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exception):
+        self.seconds = time.perf_counter() - self.start
+        if enabled:
+            timing = timings.get(self.name)
+            if timing is None:
+                timings[self.name] = [1, self.seconds]
+            else:
+                timing[0] += 1
+                timing[1] += self.seconds
+        return False
+
+
+def timer(name):
+    """
+    Function to make a timer for a block of code, to be used as "with timer(name):".
+
+    Args:
+        name: Name to add the block's time to, e.g. "generate.write_shard"
+    """
+    return Timer(name)
+
+
+def count(name, amount=1):
+    """
+    Function to add to a counter (when instrumentation is enabled).
+
+    Args:
+        name: Name of the counter, e.g. "generate.samples"
+        amount: How much to add
+    """
+    if enabled:
+        counters[name] = counters.get(name, 0) + amount
+
+
+def peak_memory():
+    """
+    Function to get the peak memory (resident set size) of this process so far, in bytes. Uses the
+    resource module on Unix, and otherwise psutil if it's installed (Windows keeps the peak working
+    set, other systems only the current size). Without either, falls back to the peak of the Python
+    allocations tracemalloc has traced (if it's tracing). Returns None if none of those are available.
+    """
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if platform.system() == "Darwin" else peak * 1024 # Linux reports kilobytes
+    if psutil is not None:
+        memory = psutil.Process().memory_info()
+        return getattr(memory, "peak_wset", memory.rss)
+    if tracemalloc.is_tracing():
+        return tracemalloc.get_traced_memory()[1]
+    return None
+
+
+class profiled:
+    """
+    Class for a block of code to run under cProfile and/or tracemalloc, when those options are on.
+    Otherwise it only times the block, like timer().
+    """
+
+    def __init__(self, name):
+        """
+        Args:
+            name: Name of the block. cProfile stats are saved to <profile_directory>/<name>.prof
+        """
+        self.name = name
+        self.timer = Timer(name)
+        self.profile = None
+
+    def __enter__(self):
+        if "tracemalloc" in options:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        if "cprofile" in options:
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+        self.timer.__enter__()
+        return self.timer
+
+    def __exit__(self, *exception):
+        self.timer.__exit__(*exception)
+        if self.profile is not None:
+            self.profile.disable()
+            os.makedirs(profile_directory, exist_ok=True)
+            self.profile.dump_stats(os.path.join(profile_directory, self.name + ".prof"))
+        if "tracemalloc" in options and tracemalloc.is_tracing():
+            memory_peaks[self.name] = max(memory_peaks.get(self.name, 0), tracemalloc.get_traced_memory()[1])
+        return False
+
+
+def enable(enabled_options=("timers",), directory=None, report_at_exit=True):
+    """
+    Function to turn instrumentation on. The options are also put in the environment, so that
+    processes started from this one (e.g. process pool workers) are instrumented too.
+
+    Args:
+        enabled_options: Any of "timers", "cprofile" and "tracemalloc" (timers are always on)
+        directory: Where to save cProfile stats (defaults to the current directory)
+        report_at_exit: Whether to print report() when the program exits (only done in the main process)
+    """
+    global enabled, options, profile_directory, _reporting
+    enabled = True
+    options = set(enabled_options) | {"timers"}
+    if directory is not None:
+        profile_directory = directory
+    os.environ[environment_variable] = ",".join(sorted(options))
+    if report_at_exit and not _reporting and multiprocessing.parent_process() is None:
+        _reporting = True
+        atexit.register(report)
+
+
+def reset():
+    """
+    Function to clear every timer, counter and memory peak.
+    """
+    timings.clear()
+    counters.clear()
+    memory_peaks.clear()
+
+
+def snapshot(clear=False):
+    """
+    Function to get a copy of the totals so far, e.g. to send them from a worker process to its parent.
+
+    Args:
+        clear: Whether to reset the totals afterwards (so that they aren't sent twice)
+    """
+    totals = {"timings": {name: list(timing) for name, timing in timings.items()}, "counters": dict(counters), "memory_peaks": dict(memory_peaks)}
+    if clear:
+        reset()
+    return totals
+
+
+def merge(totals):
+    """
+    Function to add the totals of another process (from its snapshot()) to this one's.
+
+    Args:
+        totals: Result of snapshot()
+    """
+    if not enabled or totals is None:
+        return
+    for name, [calls, seconds] in totals["timings"].items():
+        timing = timings.setdefault(name, [0, 0.0])
+        timing[0] += calls
+        timing[1] += seconds
+    for name, amount in totals["counters"].items():
+        counters[name] = counters.get(name, 0) + amount
+    for name, peak in totals["memory_peaks"].items():
+        memory_peaks[name] = max(memory_peaks.get(name, 0), peak)
+
+
+def report(file=None):
+    """
+    Function to print a summary of every timer (slowest first), counter and memory peak.
+
+    Args:
+        file: Where to print it (defaults to stderr)
+    """
+    file = file or sys.stderr
+    if len(timings) + len(counters) + len(memory_peaks) == 0:
+        return
+    print("Instrumentation summary:", file=file)
+    if timings:
+        width = max(len(name) for name in timings)
+        print("  " + "timer".ljust(width) + "      calls    total (s)  per call (ms)", file=file)
+        for name, [calls, seconds] in sorted(timings.items(), key=lambda item: -item[1][1]):
+            print("  " + name.ljust(width) + str(calls).rjust(11) + ("%.3f" % seconds).rjust(13) + ("%.3f" % (1000 * seconds / calls)).rjust(15), file=file)
+    for name, amount in sorted(counters.items()):
+        print("  " + name + ": " + str(amount), file=file)
+    for name, peak in sorted(memory_peaks.items()):
+        print("  " + name + " peak traced memory: " + str(round(peak / 1024 ** 2, 1)) + " MB", file=file)
+    if "cprofile" in options:
+        print("  cProfile stats saved in " + os.path.abspath(profile_directory) + " (view with python -m pstats <name>.prof)", file=file)
+
+
+# Turn on instrumentation if it was asked for through the environment (this is also how worker processes inherit it).
+if os.environ.get(environment_variable, "") not in ["", "0"]:
+    enable([option.strip() for option in os.environ[environment_variable].split(",")
+            if option.strip() in ["timers", "cprofile", "tracemalloc"]])
@@ -0,0 +1,288 @@
+"""
+Benchmarks for the parts of this project that take the most time: generating cipher data,
+extracting features and training/scoring the classifiers. Results are written as JSON, so runs
+can be compared with each other (use --compare with the JSON of an earlier run).
+
+    generators: samples/second of each ../Ciphers generator (make_samples()) for each text length.
+        Needs ../Ciphers/brown_corpus.txt.
+    features: samples/second and letters/second of unigram, bigram and trigram counting (see
+        ../ML Experiments/features.py) for each text length.
+    classifiers: fit and predict wall time, and peak memory, of each classifier used in
+        ../ML Experiments for each number of samples and text length. Uses the data files in
+        ../Data. Each one runs in its own process, so its peak memory is its own.
+
+Example: python run_benchmarks.py --lengths 100 1000 --samples 1000 5000 --output results.json
+
+__author__ = "Aaron Smith"
+__date__ = "10/18/2026"
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import numpy as np
+import instrumentation
+
+repository_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ciphers_directory = os.path.join(repository_directory, "Ciphers")
+experiments_directory = os.path.join(repository_directory, "ML Experiments")
+data_directory = os.path.join(repository_directory, "Data")
+sys.path.append(ciphers_directory)
+sys.path.append(experiments_directory)
+
+generator_names = ["shift", "vigenere", "hill", "playfair", "columnar"]
+classifier_names = ["knn", "svm", "random_forest", "adaboost", "mlp", "voting"]
+data_folders = ["Columnar Transposition Cipher", "Shift Cipher", "Playfair Cipher", "Hill Cipher", "Vigenere Cipher"]
+
+
+def best_time(function, repeats):
+    """
+    Function to run function repeats times and return the fastest time (in seconds).
+
+    Args:
+        function: Function (with no arguments) to time
+        repeats: Number of times to run it
+    """
+    times = []
+    for i in range(repeats):
+        start_time = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start_time)
+    return min(times)
+
+
+def benchmark_generators(text_lengths, count, repeats):
+    """
+    Function to measure how many samples/second each cipher generator makes, for each text length.
+
+    Args:
+        text_lengths: Text lengths to measure
+        count: Number of samples to generate per run
+        repeats: Number of runs (the fastest one is kept)
+    """
+    if not os.path.exists(os.path.join(ciphers_directory, "brown_corpus.txt")):
+        print("Skipping generators (no Ciphers/brown_corpus.txt)")
+        return []
+    import generate
+    # The generators read the corpus relative to the Ciphers folder.
+    working_directory = os.getcwd()
+    os.chdir(ciphers_directory)
+    results = []
+    try:
+        for name in generator_names:
+            module = generate.ciphers[name]
+            module.make_samples(min(text_lengths), 10, np.random.default_rng(0)) # Load the corpus first
+            for text_length in text_lengths:
+                rng = np.random.default_rng(0)
+                seconds = best_time(lambda: module.make_samples(text_length, count, rng), repeats)
+                results.append({"cipher": name, "text_length": text_length, "samples": count,
+                                "seconds": seconds, "samples_per_second": count / seconds})
+                print("generator " + name + " length " + str(text_length) + ": " + str(round(count / seconds)) + " samples/s")
+    finally:
+        os.chdir(working_directory)
+    return results
+
+
+def benchmark_features(text_lengths, count, repeats):
+    """
+    Function to measure how fast unigram, bigram and trigram counts are computed, for each text length.
+
+    Args:
+        text_lengths: Text lengths to measure
+        count: Number of samples to featurize per run
+        repeats: Number of runs (the fastest one is kept)
+    """
+    import features
+    results = []
+    for text_length in text_lengths:
+        letters = np.random.default_rng(0).integers(0, 26, size=(count, text_length), dtype=np.uint8)
+        feature_sets = {
+            "unigram": lambda: features.unigram_counts(letters),
+            "bigram": lambda: features.ngram_counts(letters, 2),
+            "trigram": lambda: features.ngram_counts(letters, 3),
+        }
+        for feature_set, function in feature_sets.items():
+            seconds = best_time(function, repeats)
+            results.append({"feature_set": feature_set, "text_length": text_length, "samples": count, "seconds": seconds,
+                            "samples_per_second": count / seconds, "letters_per_second": count * text_length / seconds})
+            print("features " + feature_set + " length " + str(text_length) + ": " + str(round(count / seconds)) + " samples/s")
+    return results
+
+
+def make_classifier(name):
+    """
+    Function to make an (unfitted) classifier, set up the same way as in the ../ML Experiments scripts.
+
+    Args:
+        name: One of classifier_names
+    """
+    from sklearn import svm
+    from sklearn.ensemble import AdaBoostClassifier, GradientBoostingClassifier, RandomForestClassifier, VotingClassifier
+    from sklearn.neighbors import KNeighborsClassifier
+    from sklearn.neural_network import MLPClassifier
+    if name == "knn":
+        return KNeighborsClassifier(n_neighbors=1, algorithm="brute")
+    if name == "svm":
+        return svm.SVC(kernel="poly", gamma="auto")
+    if name == "random_forest":
+        return RandomForestClassifier(n_estimators=100)
+    if name == "adaboost":
+        return AdaBoostClassifier(RandomForestClassifier(n_estimators=100))
+    if name == "mlp":
+        return MLPClassifier()
+    if name == "voting":
+        return VotingClassifier(estimators=[("knn", make_classifier("knn")), ("rf", make_classifier("random_forest")), ("mlp", make_classifier("mlp")),
+                                            ("gradient_boost", GradientBoostingClassifier()), ("adaboost", make_classifier("adaboost"))],
+                                voting="soft", weights=[1, 2, 5, 1, 3])
+    raise ValueError("Unknown classifier " + name)
+
+
+def run_classifier(name, number_of_samples, text_length):
+    """
+    Function to time fitting and scoring one classifier on our data files. Meant to be run in its own
+    process (see benchmark_classifiers()), so that the peak memory is only that of this classifier.
+
+    Args:
+        name: One of classifier_names
+        number_of_samples: Total number of samples to train on (and to score on)
+        text_length: Text length of the data files to use
+    """
+    import data_loader
+    import features
+    file_names = [os.path.join(data_directory, folder, "text_length_" + str(text_length) + ".txt") for folder in data_folders]
+    samples_per_file = number_of_samples // len(file_names)
+    [training_lines, scoring_lines] = data_loader.stratified_split(file_names, samples_per_file, samples_per_file, 0)
+    [training_letters, classifications] = data_loader.load_samples(file_names, training_lines, text_length)
+    [scoring_letters, scoring_classifications] = data_loader.load_samples(file_names, scoring_lines, text_length)
+    training_data = features.unigram_counts(training_letters)
+    scoring_data = features.unigram_counts(scoring_letters)
+
+    model = make_classifier(name)
+    start_time = time.perf_counter()
+    model.fit(training_data, classifications)
+    fit_seconds = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    predictions = model.predict(scoring_data)
+    predict_seconds = time.perf_counter() - start_time
+    return {"classifier": name, "samples": samples_per_file * len(file_names), "text_length": text_length,
+            "fit_seconds": fit_seconds, "predict_seconds": predict_seconds,
+            "predictions_per_second": len(predictions) / predict_seconds,
+            "accuracy": float(np.mean(predictions == scoring_classifications)), "peak_memory_bytes": instrumentation.peak_memory()}
+
+
+def benchmark_classifiers(names, sample_counts, text_lengths, timeout):
+    """
+    Function to benchmark each classifier for each number of samples and text length, each in its own process.
+
+    Args:
+        names: Classifiers to benchmark (from classifier_names)
+        sample_counts: Numbers of samples to train on
+        text_lengths: Text lengths to use
+        timeout: Most seconds to let one benchmark run for
+    """
+    results = []
+    for text_length in text_lengths:
+        missing = [folder for folder in data_folders if not os.path.exists(os.path.join(data_directory, folder, "text_length_" + str(text_length) + ".txt"))]
+        if len(missing) > 0:
+            print("Skipping classifiers for length " + str(text_length) + " (no data for " + ", ".join(missing) + ")")
+            continue
+        for number_of_samples in sample_counts:
+            for name in names:
+                command = [sys.executable, os.path.abspath(__file__), "--classifier-worker", name, str(number_of_samples), str(text_length)]
+                try:
+                    process = subprocess.run(command, capture_output=True, text=True, timeout=timeout)
+                except subprocess.TimeoutExpired:
+                    results.append({"classifier": name, "samples": number_of_samples, "text_length": text_length, "error": "timed out after " + str(timeout) + "s"})
+                    print("classifier " + name + " " + str(number_of_samples) + " samples length " + str(text_length) + ": timed out")
+                    continue
+                if process.returncode != 0:
+                    error = (process.stderr.strip().splitlines() or ["exit code " + str(process.returncode)])[-1]
+                    results.append({"classifier": name, "samples": number_of_samples, "text_length": text_length, "error": error})
+                    print("classifier " + name + " " + str(number_of_samples) + " samples length " + str(text_length) + ": " + error)
+                    continue
+                result = json.loads(process.stdout.strip().splitlines()[-1])
+                results.append(result)
+                print("classifier " + name + " " + str(number_of_samples) + " samples length " + str(text_length) + ": fit "
+                      + str(round(result["fit_seconds"], 3)) + "s, predict " + str(round(result["predict_seconds"], 3)) + "s, peak "
+                      + (str(round(result["peak_memory_bytes"] / 1024 ** 2)) + " MB" if result["peak_memory_bytes"] is not None else "unknown"))
+    return results
+
+
+def environment():
+    """
+    Function to describe the machine and software the benchmarks ran on.
+    """
+    import scipy
+    import sklearn
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=repository_directory, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    return {"time": time.strftime("%Y-%m-%d %H:%M:%S"), "commit": commit, "platform": platform.platform(),
+            "processor": platform.processor(), "cpu_count": os.cpu_count(), "python": platform.python_version(),
+            "numpy": np.__version__, "scipy": scipy.__version__, "sklearn": sklearn.__version__}
+
+
+def compare(old_results, new_results, threshold=0.1):
+    """
+    Function to print the benchmarks whose throughput changed by more than threshold between two runs.
+
+    Args:
+        old_results: JSON of the earlier run
+        new_results: JSON of this run
+        threshold: Fraction of change to report (0.1 = 10%)
+    """
+    measures = {"generators": [["cipher", "text_length", "samples"], "samples_per_second"],
+                "features": [["feature_set", "text_length", "samples"], "samples_per_second"],
+                "classifiers": [["classifier", "samples", "text_length"], "predictions_per_second"]}
+    for section, [key_fields, measure] in measures.items():
+        old = {tuple(result[field] for field in key_fields): result for result in old_results.get(section, []) if measure in result}
+        for result in new_results.get(section, []):
+            key = tuple(result[field] for field in key_fields)
+            if key in old and measure in result:
+                change = result[measure] / old[key][measure] - 1
+                if abs(change) > threshold:
+                    print(("faster: " if change > 0 else "SLOWER: ") + section + " " + str(key) + " " + measure + " " + str(round(change * 100)) + "%")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the cipher generators, feature extraction and classifiers.")
+    parser.add_argument("--lengths", nargs="+", type=int, default=[100, 300, 1000], help="text lengths")
+    parser.add_argument("--samples", nargs="+", type=int, default=[1000, 5000], help="numbers of samples to train the classifiers on")
+    parser.add_argument("--generator-samples", type=int, default=10000, help="samples per generator run")
+    parser.add_argument("--feature-samples", type=int, default=10000, help="samples per feature extraction run")
+    parser.add_argument("--classifiers", nargs="+", choices=classifier_names, default=classifier_names)
+    parser.add_argument("--skip", nargs="+", choices=["generators", "features", "classifiers"], default=[])
+    parser.add_argument("--repeats", type=int, default=3, help="runs of each generator/feature benchmark (the fastest is kept)")
+    parser.add_argument("--timeout", type=int, default=1800, help="most seconds for one classifier benchmark")
+    parser.add_argument("--output", default=None, help="JSON file to write (defaults to results/benchmark_<time>.json)")
+    parser.add_argument("--compare", default=None, help="JSON of an earlier run to compare against")
+    parser.add_argument("--classifier-worker", nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.classifier_worker:
+        [name, number_of_samples, text_length] = args.classifier_worker
+        print(json.dumps(run_classifier(name, int(number_of_samples), int(text_length))))
+        sys.exit(0)
+
+    results = {"environment": environment()}
+    if "generators" not in args.skip:
+        results["generators"] = benchmark_generators(args.lengths, args.generator_samples, args.repeats)
+    if "features" not in args.skip:
+        results["features"] = benchmark_features(args.lengths, args.feature_samples, args.repeats)
+    if "classifiers" not in args.skip:
+        results["classifiers"] = benchmark_classifiers(args.classifiers, args.samples, args.lengths, args.timeout)
+
+    output_file_name = args.output or os.path.join(os.path.dirname(os.path.abspath(__file__)), "results", "benchmark_" + time.strftime("%Y%m%d_%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output_file_name)), exist_ok=True)
+    with open(output_file_name, "w") as results_output:
+        json.dump(results, results_output, indent=4)
+    print("Wrote " + output_file_name)
+
+    if args.compare:
+        with open(args.compare, "r") as compare_input:
+            compare(json.load(compare_input), results)
@@ -0,0 +1,44 @@
+"""
+This file is used to write files atomically, for everything that writes data or caches that other
+processes may be reading at the same time (corpus.py, dataset.py, generate.py, and
+../ML Experiments/data_loader.py, feature_cache.py and model_store.py). A file is written under a
+temporary name and then renamed over the real one, so a half written file is never read. The
+temporary name includes the process id, so processes writing the same file at once don't clash.
+
+__author__ = "Aaron Smith"
+__date__ = "10/18/2026"
+"""
+
+import os
+
+
+def temp_name(name):
+    """
+    Function to get the temporary name to write a file (or directory) under before renaming it to
+    name. It's in the same folder as name, so the rename is atomic.
+
+    Args:
+        name: Name of the file or directory
+    """
+    return name + "." + str(os.getpid()) + ".tmp"
+
+
+def write_atomically(file_name, write, mode="wb"):
+    """
+    Function to write a file by writing a temporary file and renaming it, so that a half written
+    file is never read by another process. If write fails, the temporary file is deleted.
+
+    Args:
+        file_name: Name of the file to write
+        write: Function that takes the open file and writes the contents to it
+        mode: Mode to open the file with ("wb" for binary, "w" for text)
+    """
+    temp_file_name = temp_name(file_name)
+    try:
+        with open(temp_file_name, mode) as file_output:
+            write(file_output)
+        os.replace(temp_file_name, file_name)
+    except BaseException:
+        if os.path.exists(temp_file_name):
+            os.remove(temp_file_name)
+        raise
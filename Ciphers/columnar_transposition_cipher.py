@@ -6,90 +6,183 @@ columnar transposition cipher. See
 http://practicalcryptography.com/ciphers/columnar-transposition-cipher/ for a brief
 description of the cipher. Can be editted to use a random key, or a default key.
 
-It writes the result to a txt file at the specified location. Uses multiprocessing
-to run multiple instances of the cipher in parallel. That way large amounts of data
-can be processed at a time, outputting to multiple files in order to get large
-variations in the data.
+It writes the result to a txt file at the specified location. Running this
+file uses generate.py to split the work into chunks that run in parallel on every
+core. That way large amounts of data can be processed at a time, outputting to
+multiple files in order to get large variations in the data.
+
+Since the cipher only moves letters around, it's expressed as an index permutation: for a
+given text length and key, permutation() gives the position in the plaintext that each
+letter of the ciphertext comes from. A whole batch of plaintexts (with keys that all have
+the same number of columns) can then be encrypted or decrypted with one fancy-index gather,
+and decrypt_candidates() decrypts one ciphertext under many candidate keys at once.
 
 __author__ = "Aaron Smith"
 __date__ = "11/9/2019"
 """
 
-import random
-from multiprocessing import Process
-
-def make_file(length):
-    input_file_name = "brown_corpus.txt"
-    output_file_name = "../Data/Columnar Transposition Cipher/Random Key Random Length/text_length_" + str(length) + ".txt"
-    text_length = length # Length of the character sequence to encrypt
-    iters = 10000 # How many times to encrypt a string
-
-    file_output = open(output_file_name, "w")
-
-    for j in range(iters):
-        # Number of columns for our columnar transposition. Can be 5 or 10 (must go into text_length evenly).
-        number_of_columns = random.randint(1, 2) * 5
-        #key = (3, 1, 2, 5, 4) # Ordering of the columns for the key
-        key = []
-        for j in range(number_of_columns):
-            key.append(j)
-        random.shuffle(key)
-        #print("key is " + str(key))
-        result = "" # Store the result in this string
-        plaintext = "" # Plaintext read from the input file
-
-        file_input = open(input_file_name, "r")
-
-        # Start our reading from a relatively random line from within the input file.
-        random_line = random.randint(1, 45000)
-        #print("Reading from file at line " + str(random_line))
-        for i in range(random_line):
-            file_input.readline()
-        # First, let's get a string of the specified length from our input file
-        while (len(plaintext) != text_length):
-            line = file_input.readline()
-            for char in line:
-                if char.isalpha(): # True if char is a letter (i.e. no special characters, no spaces, etc.)
-                    plaintext += char.lower()
-                    if (len(plaintext) == text_length):
-                        break
-
-        # Now let's encrypt result
-        # First initialize our matrix columns by using a list
-        columns = []
-        for i in range(number_of_columns):
-            columns.append('')
-        # Then insert our plaintext into the columns
-        for i in range(text_length):
-            columns[i % number_of_columns] += plaintext[i]
-        # Then rearrange the columns in the order specified by key
-        columns_rearranged = []
-        for c in key:
-            columns_rearranged.append(columns[c - 1])
-        # Then append characters to the result by going through our columns
-        for i in range(int(text_length / number_of_columns)):
-            for j in range(number_of_columns):
-                result += columns_rearranged[j][i]
-
-
-        # Write result to our output file
-        file_output.write(result + " key: " + str(key) + ", reading from line " + str(random_line) + "\n")
-        file_input.close()
-
-    file_output.close()
-
-
-# Make our program run multiple instances in parallel
-processes = []
-text_lengths = [100, 200, 300, 500, 1000]
-for length in text_lengths:
-    print("Starting on length: " + str(length))
-    process = Process(target = make_file, args = (length,))
-    process.start()
-    processes.append(process)
-
-# Wait for processes to finish
-for process in processes:
-    process.join()
-
-print("done")
+import os
+import sys
+import numpy as np
+import corpus
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Benchmarks")) # For instrumentation.py
+import instrumentation
+
+
+def column_order(keys):
+    """
+    Function to get which plaintext column ends up in each column of the ciphertext. Column j of
+    the ciphertext is column key[j] - 1 of the plaintext (so a key value of 0 refers to the last
+    column), which is how our data files were originally generated.
+
+    Args:
+        keys: Array of keys (last axis is the key, a permutation of 0 to number of columns - 1)
+    """
+    keys = np.asarray(keys)
+    return (keys - 1) % keys.shape[-1]
+
+
+def permutation(text_length, keys):
+    """
+    Function to get the index permutation(s) for a text length and one or more keys. Letter i of
+    the ciphertext is letter permutation[i] of the plaintext. For a batch of keys (number of keys
+    x number of columns), returns one permutation per key (number of keys x text_length).
+
+    Args:
+        text_length: Length of the text (must be divisible by the number of columns)
+        keys: Either one key, or a 2-D array of keys that all have the same number of columns
+    """
+    order = column_order(keys)
+    number_of_columns = order.shape[-1]
+    row_starts = np.arange(0, text_length, number_of_columns)
+    # The text is read row by row, so each row of the ciphertext is the same row of the plaintext
+    # with its columns rearranged.
+    return (row_starts[:, None] + order[..., None, :]).reshape(order.shape[:-1] + (text_length,))
+
+
+def inverse_permutation(text_length, keys):
+    """
+    Function to get the index permutation(s) that undo permutation(), i.e. letter i of the
+    plaintext is letter inverse_permutation[i] of the ciphertext.
+
+    Args:
+        text_length: Length of the text (must be divisible by the number of columns)
+        keys: Either one key, or a 2-D array of keys that all have the same number of columns
+    """
+    order = np.argsort(column_order(keys), axis=-1)
+    number_of_columns = order.shape[-1]
+    row_starts = np.arange(0, text_length, number_of_columns)
+    return (row_starts[:, None] + order[..., None, :]).reshape(order.shape[:-1] + (text_length,))
+
+
+def gather(texts, permutations):
+    """
+    Function to apply one permutation to every text, or one permutation per text.
+
+    Args:
+        texts: 2-D array (number of samples x text length)
+        permutations: Either one permutation (text length), or one per text (number of samples x text length)
+    """
+    if permutations.ndim == 1:
+        return texts[:, permutations]
+    return np.take_along_axis(texts, permutations, axis=1)
+
+
+def encrypt(plaintexts, keys):
+    """
+    Function to encrypt a batch of plaintexts using the columnar transposition cipher.
+
+    Args:
+        plaintexts: 2-D uint8 array (number of samples x text length) of letters in the range 0-25
+        keys: Either one key used for every plaintext, or one key per plaintext (number of
+            samples x number of columns). All keys must have the same number of columns.
+    """
+    return gather(plaintexts, permutation(plaintexts.shape[1], keys))
+
+
+def decrypt(ciphertexts, keys):
+    """
+    Function to decrypt a batch of ciphertexts that were encrypted using the columnar
+    transposition cipher.
+
+    Args:
+        ciphertexts: 2-D uint8 array (number of samples x text length) of letters in the range 0-25
+        keys: Either one key used for every ciphertext, or one key per ciphertext (number of
+            samples x number of columns). All keys must have the same number of columns.
+    """
+    return gather(ciphertexts, inverse_permutation(ciphertexts.shape[1], keys))
+
+
+def decrypt_candidates(ciphertext, keys):
+    """
+    Function to decrypt a single ciphertext under many candidate keys at once, e.g. for a key
+    search. Returns one decryption per key (number of keys x text length).
+
+    Args:
+        ciphertext: 1-D uint8 array of letters in the range 0-25
+        keys: 2-D array of candidate keys (number of keys x number of columns)
+    """
+    return np.asarray(ciphertext)[inverse_permutation(len(ciphertext), keys)]
+
+
+def generate_keys(count, number_of_columns, rng):
+    """
+    Function to generate random keys, i.e. random orderings of the columns.
+
+    Args:
+        count: Number of keys to generate
+        number_of_columns: Number of columns in each key
+        rng: numpy random Generator to shuffle with
+    """
+    return rng.permuted(np.tile(np.arange(number_of_columns), (count, 1)), axis=1)
+
+
+input_file_name = "brown_corpus.txt"
+output_directory = "../Data/Columnar Transposition Cipher/Random Key Random Length/"
+
+
+def make_samples(text_length, count, rng):
+    """
+    Function to encrypt count random plaintexts of length text_length from our input file.
+    Returns the lines to write to the output file, one per sample.
+
+    Args:
+        text_length: Length of the character sequence to encrypt
+        count: How many times to encrypt a string
+        rng: numpy random Generator used for the keys and starting lines
+    """
+    # Letters-only, memory-mapped version of our input file (see corpus.py).
+    [letters, line_offsets] = corpus.load_corpus(input_file_name)
+
+    # Number of columns for our columnar transposition. Can be 5 or 10 (must go into text_length evenly).
+    numbers_of_columns = rng.choice([5, 10], size=count)
+
+    # Start our reading from relatively random lines from within the input file.
+    random_lines = rng.integers(1, 45001, size=count)
+    plaintexts = corpus.get_plaintexts(letters, line_offsets, random_lines, text_length)
+
+    # Encrypt all the plaintexts with the same number of columns together.
+    ciphertexts = np.empty_like(plaintexts)
+    key_phrases = ["" for i in range(count)]
+    for number_of_columns in [5, 10]:
+        rows = np.flatnonzero(numbers_of_columns == number_of_columns)
+        keys = generate_keys(len(rows), number_of_columns, rng)
+        #keys[:] = (3, 1, 2, 5, 4) # Ordering of the columns for the key
+        with instrumentation.timer("encrypt.columnar"):
+            ciphertexts[rows] = encrypt(plaintexts[rows], keys)
+        for i in range(len(rows)):
+            key_phrases[rows[i]] = str(keys[i].tolist())
+    results = corpus.letters_to_texts(ciphertexts)
+
+    lines = []
+    for i in range(count):
+        lines.append(results[i] + " key: " + key_phrases[i] + ", reading from line " + str(random_lines[i]) + "\n")
+    return lines
+
+
+if __name__ == "__main__":
+    # Generate our data files. generate.py splits the work into chunks and runs them in parallel.
+    import generate
+    text_lengths = [100, 200, 300, 500, 1000]
+    generate.generate_files("columnar", text_lengths, 10000)
+    print("done")
@@ -0,0 +1,170 @@
+"""
+This file is used to preprocess the plaintext corpus (brown_corpus.txt) that all of our cipher
+generators read from. Rather than having every generator reopen the txt file, skip to a random
+line with readline() and filter out non-letter characters one at a time for every sample, the
+corpus is converted once into a letters-only blob. Each letter is lowercased and stored as a
+single uint8 in the range 0-25 (i.e. 'a' = 0, ..., 'z' = 25), with every non-letter character
+discarded. Alongside it we store a line offset table, where entry N is the number of letters
+that come before line N of the original txt file. That way the "reading from line N" metadata
+the generators write out still means the same thing.
+
+Both files are memory-mapped when loaded, so every generator (and every process) shares the same
+pages, and getting a plaintext of length L is just a zero-copy slice at some offset. The blob is
+rebuilt automatically whenever brown_corpus.txt is newer than it. Run this file directly to
+build it ahead of time.
+
+__author__ = "Aaron Smith"
+__date__ = "10/18/2026"
+"""
+
+import os
+import sys
+import numpy as np
+import atomic_file
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Benchmarks")) # For instrumentation.py
+import instrumentation
+
+# Keep loaded corpora around so that repeated calls (e.g. one per make_file()) reuse the same maps.
+_loaded_corpora = {}
+
+
+def corpus_file_names(input_file_name):
+    """
+    Function to get the names of the preprocessed files that belong to a corpus txt file.
+
+    Args:
+        input_file_name: Name of the corpus txt file (e.g. "brown_corpus.txt")
+    """
+    base_name = os.path.splitext(input_file_name)[0]
+    return [base_name + ".letters", base_name + ".line_offsets.npy"]
+
+
+def build_corpus(input_file_name="brown_corpus.txt"):
+    """
+    Function to convert a corpus txt file into a letters-only uint8 blob and a line offset
+    table. Both are written next to the txt file (see corpus_file_names()).
+
+    Args:
+        input_file_name: Name of the corpus txt file to preprocess
+    """
+    [letters_file_name, offsets_file_name] = corpus_file_names(input_file_name)
+    with open(input_file_name, "rb") as file_input:
+        raw = np.frombuffer(file_input.read().lower(), dtype=np.uint8)
+
+    # Keep only the (now lowercase) letters, converted to the range 0-25.
+    is_letter = (raw >= ord("a")) & (raw <= ord("z"))
+    letters = raw[is_letter] - ord("a")
+
+    # Number of letters before each line. Line 0 starts at offset 0, and line N starts after
+    # however many letters came before the Nth newline.
+    letters_so_far = np.cumsum(is_letter, dtype=np.int64)
+    newlines = np.flatnonzero(raw == ord("\n"))
+    line_offsets = np.concatenate(([0], letters_so_far[newlines]))
+
+    # Write atomically so that a half written corpus is never picked up, since several generators may
+    # build the corpus at the same time.
+    atomic_file.write_atomically(letters_file_name, letters.tofile)
+    atomic_file.write_atomically(offsets_file_name, lambda offsets_output: np.save(offsets_output, line_offsets))
+    return [letters_file_name, offsets_file_name]
+
+
+def load_corpus(input_file_name="brown_corpus.txt"):
+    """
+    Function to get the memory-mapped letters blob and line offset table for a corpus,
+    building them first if they don't exist yet (or are older than the txt file).
+
+    Args:
+        input_file_name: Name of the corpus txt file
+    """
+    if input_file_name in _loaded_corpora:
+        return _loaded_corpora[input_file_name]
+
+    [letters_file_name, offsets_file_name] = corpus_file_names(input_file_name)
+    source_time = os.path.getmtime(input_file_name)
+    for file_name in [letters_file_name, offsets_file_name]:
+        if not os.path.exists(file_name) or os.path.getmtime(file_name) < source_time:
+            build_corpus(input_file_name)
+            break
+
+    letters = np.memmap(letters_file_name, dtype=np.uint8, mode="r")
+    line_offsets = np.load(offsets_file_name, mmap_mode="r")
+    _loaded_corpora[input_file_name] = [letters, line_offsets]
+    return [letters, line_offsets]
+
+
+def get_plaintext(letters, line_offsets, line, text_length):
+    """
+    Function to get text_length letters (as values 0-25) of plaintext, starting from the
+    given line of the corpus. This is a slice of the memory-mapped blob, so no copy is made.
+
+    Args:
+        letters: Letters blob returned by load_corpus()
+        line_offsets: Line offset table returned by load_corpus()
+        line: Number of lines to skip before reading (same as "reading from line N")
+        text_length: Number of letters to read
+    """
+    offset = int(line_offsets[line])
+    if offset + text_length > len(letters):
+        raise ValueError("Not enough letters after line " + str(line) + " to read " + str(text_length))
+    return letters[offset:offset + text_length]
+
+
+def get_plaintexts(letters, line_offsets, lines, text_length):
+    """
+    Function to get a batch of plaintexts at once, one per starting line. Unlike get_plaintext()
+    this gathers the letters into a new (number of lines x text_length) uint8 array, which is the
+    form the batch encrypt() functions of our ciphers take.
+
+    Args:
+        letters: Letters blob returned by load_corpus()
+        line_offsets: Line offset table returned by load_corpus()
+        lines: 1-D array of lines to start reading from (same as "reading from line N")
+        text_length: Number of letters to read for each plaintext
+    """
+    with instrumentation.timer("corpus.get_plaintexts"):
+        offsets = np.asarray(line_offsets)[np.asarray(lines)]
+        if len(offsets) > 0 and offsets.max() + text_length > len(letters):
+            raise ValueError("Not enough letters after line " + str(np.asarray(lines)[offsets.argmax()]) + " to read " + str(text_length))
+        return letters[offsets[:, None] + np.arange(text_length)]
+
+
+def letters_to_text(letters):
+    """
+    Function to convert an array of letters (values 0-25) back into a lowercase string.
+
+    Args:
+        letters: 1-D array of letters in the range 0-25
+    """
+    return (np.asarray(letters, dtype=np.uint8) + ord("a")).tobytes().decode("ascii")
+
+
+def letters_to_texts(batch):
+    """
+    Function to convert a 2-D array of letters (values 0-25), one row per sample, into a list of
+    lowercase strings.
+
+    Args:
+        batch: 2-D array of letters in the range 0-25
+    """
+    with instrumentation.timer("corpus.letters_to_texts"):
+        batch = np.asarray(batch, dtype=np.uint8)
+        text_length = batch.shape[1]
+        raw = (batch + ord("a")).tobytes().decode("ascii")
+        return [raw[i:i + text_length] for i in range(0, len(raw), text_length)]
+
+
+def text_to_letters(text):
+    """
+    Function to convert a lowercase string into an array of letters (values 0-25).
+
+    Args:
+        text: String made up of only lowercase letters
+    """
+    return np.frombuffer(text.encode("ascii"), dtype=np.uint8) - ord("a")
+
+
+if __name__ == "__main__":
+    [letters_file_name, offsets_file_name] = build_corpus()
+    [letters, line_offsets] = load_corpus()
+    print("Wrote " + str(len(letters)) + " letters to " + letters_file_name)
+    print("Wrote " + str(len(line_offsets) - 1) + " line offsets to " + offsets_file_name)
@@ -0,0 +1,164 @@
+"""
+This file is used to store our cipher data in a compact binary format. The txt data files
+(Data/<Cipher>/text_length_N.txt) store each sample as a line of ASCII text followed by
+" key: ..., reading from line N", so every experiment has to re-parse them line by line. For
+each txt file we instead store two .npy files next to it:
+
+    text_length_N.ciphertexts.npy: (number of samples x N) uint8 matrix of letters 0-25
+    text_length_N.metadata.npy: one record per sample, with fields
+        key: the key as up to max_key_length values (letters as 0-25, numbers as themselves)
+        key_length: how many values of key are used
+        source_line: line of the corpus the plaintext was read from
+        source_offset: letter offset of that line in the corpus blob (see corpus.py), or -1 if unknown
+
+Both are loaded with np.load(mmap_mode="r"), which takes the same (constant) time no matter how
+many samples there are, and only the rows that are actually used are ever read from disk.
+
+Keys are stored the same way for every cipher: the shift amount is one value, vigenere and
+playfair keys are their letters, hill keys are the key matrix in row order (so the key size is
+the square root of key_length) and columnar keys are the column ordering.
+
+Run this file directly to convert all of the existing txt files under ../Data.
+
+__author__ = "Aaron Smith"
+__date__ = "10/18/2026"
+"""
+
+import glob
+import os
+import numpy as np
+import atomic_file
+import corpus
+
+max_key_length = 100 # Largest key we store (a 10x10 hill key)
+
+metadata_dtype = np.dtype([
+    ("key", np.uint8, (max_key_length,)),
+    ("key_length", np.uint8),
+    ("source_line", np.int32),
+    ("source_offset", np.int64),
+])
+
+
+def dataset_file_names(text_file_name):
+    """
+    Function to get the names of the binary files that belong to a txt data file.
+
+    Args:
+        text_file_name: Name of the txt data file (e.g. "../Data/Shift Cipher/text_length_100.txt")
+    """
+    base_name = os.path.splitext(text_file_name)[0]
+    return [base_name + ".ciphertexts.npy", base_name + ".metadata.npy"]
+
+
+def parse_key(key_phrase):
+    """
+    Function to convert the key written in a txt data file into a list of values.
+
+    Args:
+        key_phrase: Text between "key: " and ", reading from line" (e.g. "25", "ZVVHU",
+            "[4, 0, 2, 3, 1]" or "1 2 3 4 ")
+    """
+    key_phrase = key_phrase.strip().strip("[]")
+    values = key_phrase.replace(",", " ").split()
+    if len(values) > 0 and all(value.isdigit() for value in values):
+        return [int(value) for value in values]
+    return [ord(char) - 97 for char in key_phrase.lower()]
+
+
+def parse_lines(lines):
+    """
+    Function to convert lines of a txt data file into a ciphertext matrix and metadata records.
+    Returns a list containing both.
+
+    Args:
+        lines: List of lines of a txt data file
+    """
+    texts = []
+    metadata = np.zeros(len(lines), dtype=metadata_dtype)
+    for i, line in enumerate(lines):
+        [text, rest] = line.rstrip("\n").split(" key: ", 1)
+        [key_phrase, source_line] = rest.rsplit(", reading from line ", 1)
+        key = parse_key(key_phrase)
+        if len(key) > max_key_length:
+            raise ValueError("Key on line " + str(i) + " is longer than " + str(max_key_length) + " values")
+        texts.append(text)
+        metadata["key"][i, :len(key)] = key
+        metadata["key_length"][i] = len(key)
+        metadata["source_line"][i] = int(source_line)
+
+    text_length = len(texts[0]) if len(texts) > 0 else 0
+    if any(len(text) != text_length for text in texts):
+        raise ValueError("Ciphertexts are not all the same length")
+    ciphertexts = np.frombuffer("".join(texts).encode("ascii"), dtype=np.uint8) - ord("a")
+    if ciphertexts.size > 0 and ciphertexts.max() > 25:
+        raise ValueError("Ciphertexts contain characters other than lowercase letters")
+    return [ciphertexts.reshape(len(texts), text_length), metadata]
+
+
+def save_dataset(text_file_name, ciphertexts, metadata):
+    """
+    Function to write a ciphertext matrix and its metadata next to a txt data file.
+
+    Args:
+        text_file_name: Name of the txt data file the dataset belongs to
+        ciphertexts: 2-D uint8 array (number of samples x text length) of letters 0-25
+        metadata: 1-D array of metadata_dtype records, one per sample
+    """
+    file_names = dataset_file_names(text_file_name)
+    # Write atomically so that a half written dataset is never loaded.
+    for file_name, array in zip(file_names, [ciphertexts, metadata]):
+        atomic_file.write_atomically(file_name, lambda file_output: np.save(file_output, array))
+    return file_names
+
+
+def convert_text_file(text_file_name, input_file_name="brown_corpus.txt"):
+    """
+    Function to convert a txt data file into the binary format. The source offsets are filled
+    in from the corpus if it can be found, and are -1 otherwise.
+
+    Args:
+        text_file_name: Name of the txt data file to convert
+        input_file_name: Name of the corpus txt file the plaintexts were read from
+    """
+    with open(text_file_name, "r") as file_input:
+        [ciphertexts, metadata] = parse_lines(file_input.readlines())
+
+    metadata["source_offset"] = -1
+    if input_file_name is not None and os.path.exists(input_file_name):
+        [letters, line_offsets] = corpus.load_corpus(input_file_name)
+        metadata["source_offset"] = np.asarray(line_offsets)[metadata["source_line"]]
+    return save_dataset(text_file_name, ciphertexts, metadata)
+
+
+def load_dataset(text_file_name):
+    """
+    Function to get the memory-mapped ciphertext matrix and metadata for a txt data file,
+    converting the txt file first if the binary files don't exist yet (or are older than it).
+
+    Args:
+        text_file_name: Name of the txt data file
+    """
+    file_names = dataset_file_names(text_file_name)
+    if os.path.exists(text_file_name):
+        source_time = os.path.getmtime(text_file_name)
+        if any(not os.path.exists(file_name) or os.path.getmtime(file_name) < source_time for file_name in file_names):
+            convert_text_file(text_file_name)
+    return [np.load(file_name, mmap_mode="r") for file_name in file_names]
+
+
+def get_key(metadata, i):
+    """
+    Function to get the key of a sample as an array of values.
+
+    Args:
+        metadata: Metadata returned by load_dataset()
+        i: Index of the sample
+    """
+    return metadata["key"][i, :metadata["key_length"][i]]
+
+
+if __name__ == "__main__":
+    for text_file_name in sorted(glob.glob("../Data/**/text_length_*.txt", recursive=True)):
+        [ciphertexts_file_name, metadata_file_name] = convert_text_file(text_file_name)
+        print("Converted " + text_file_name + " (" + str(len(np.load(metadata_file_name, mmap_mode="r"))) + " samples)")
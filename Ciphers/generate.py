@@ -0,0 +1,207 @@
+"""
+This file is used to generate our data files for any of the ciphers. Rather than running one
+process per text length (which only ever uses as many cores as there are text lengths), the
+work for each (cipher, text_length) is split into chunks of samples, and the chunks are run on
+a process pool sized to the machine.
+
+Each chunk is seeded from (seed, cipher, text_length, chunk index), so running with the same
+settings always produces the same files, no matter how many processes are used. Finished
+chunks are written as shard files next to the output file (in a ".shards" directory) and are
+then merged, in order, into the final txt file, which is also converted to the binary format
+of dataset.py. If a run crashes, running it again skips the shards that were already completed.
+
+Example: python generate.py --ciphers shift vigenere --lengths 100 1000 --samples 100000
+
+__author__ = "Aaron Smith"
+__date__ = "10/18/2026"
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import time
+import zlib
+import numpy as np
+from multiprocessing import Pool
+import atomic_file
+import corpus
+import dataset
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Benchmarks")) # For instrumentation.py
+import instrumentation
+import columnar_transposition_cipher
+import hill_cipher
+import playfair_cipher
+import shift_cipher
+import vigenere_cipher
+
+# Every cipher that can be generated, by name. Each module has make_samples(), input_file_name
+# and output_directory.
+ciphers = {
+    "columnar": columnar_transposition_cipher,
+    "hill": hill_cipher,
+    "playfair": playfair_cipher,
+    "shift": shift_cipher,
+    "vigenere": vigenere_cipher,
+}
+
+
+def output_file_name(cipher, text_length):
+    """
+    Function to get the name of the data file for a cipher and text length.
+
+    Args:
+        cipher: Name of the cipher (a key of ciphers)
+        text_length: Length of the ciphertexts in the file
+    """
+    return ciphers[cipher].output_directory + "text_length_" + str(text_length) + ".txt"
+
+
+def chunk_seed(seed, cipher, text_length, chunk_index):
+    """
+    Function to get the random Generator for a chunk. The cipher name is hashed with crc32
+    (rather than hash(), which changes between runs) so that seeds are reproducible.
+
+    Args:
+        seed: Seed for the whole run
+        cipher: Name of the cipher
+        text_length: Length of the ciphertexts in the chunk
+        chunk_index: Which chunk of the file this is
+    """
+    return np.random.default_rng([seed, zlib.crc32(cipher.encode()), text_length, chunk_index])
+
+
+def make_chunks(cipher, text_length, samples, chunk_size, seed):
+    """
+    Function to split the samples for one output file into chunks. Returns a list of chunks,
+    where each chunk is a list of [cipher, text_length, start, stop, chunk_index, seed, shard_file_name].
+
+    Args:
+        cipher: Name of the cipher
+        text_length: Length of the ciphertexts
+        samples: Total number of samples in the output file
+        chunk_size: Number of samples per chunk
+        seed: Seed for the whole run
+    """
+    shard_directory = output_file_name(cipher, text_length) + ".shards/"
+    chunks = []
+    for chunk_index, start in enumerate(range(0, samples, chunk_size)):
+        stop = min(start + chunk_size, samples)
+        # The seed and sample range are part of the name, so shards from a run with different
+        # settings are never picked up by mistake.
+        shard_file_name = shard_directory + "seed_" + str(seed) + "_samples_" + str(start) + "_" + str(stop) + ".txt"
+        chunks.append([cipher, text_length, start, stop, chunk_index, seed, shard_file_name])
+    return chunks
+
+
+def make_shard(chunk):
+    """
+    Function to generate one chunk of samples and write it to its shard file. Meant to be run
+    by the process pool. Returns the chunk, the number of seconds it took and the worker's
+    instrumentation totals for it (see ../Benchmarks/instrumentation.py).
+
+    Args:
+        chunk: One of the chunks returned by make_chunks()
+    """
+    [cipher, text_length, start, stop, chunk_index, seed, shard_file_name] = chunk
+    start_time = time.time()
+    rng = chunk_seed(seed, cipher, text_length, chunk_index)
+    with instrumentation.timer("generate.make_samples"):
+        lines = ciphers[cipher].make_samples(text_length, stop - start, rng)
+
+    # Write atomically, so that a shard only exists once it's complete.
+    with instrumentation.timer("generate.write_shard"):
+        atomic_file.write_atomically(shard_file_name, lambda shard_output: shard_output.writelines(lines), "w")
+    instrumentation.count("generate.samples", stop - start)
+    instrumentation.count("generate.shard_bytes", os.path.getsize(shard_file_name))
+    return [chunk, time.time() - start_time, instrumentation.snapshot(clear=True) if instrumentation.enabled else None]
+
+
+def merge_shards(chunks, file_name, keep_shards=False):
+    """
+    Function to concatenate the shard files of an output file, in order, into the output file.
+
+    Args:
+        chunks: The chunks making up the output file (from make_chunks())
+        file_name: Name of the output file
+        keep_shards: If True, the shard files are kept after merging instead of deleted
+    """
+    def write_shards(file_output):
+        for chunk in chunks:
+            with open(chunk[6], "rb") as shard_input:
+                shutil.copyfileobj(shard_input, file_output)
+
+    with instrumentation.timer("generate.merge_shards"):
+        atomic_file.write_atomically(file_name, write_shards)
+    if not keep_shards:
+        shutil.rmtree(file_name + ".shards")
+
+
+def generate_files(cipher_names, text_lengths, samples, chunk_size=2000, processes=None, seed=0, keep_shards=False):
+    """
+    Function to generate the data files for some ciphers and text lengths, in parallel.
+
+    Args:
+        cipher_names: Name of a cipher, or a list of names (keys of ciphers)
+        text_lengths: List of ciphertext lengths to make a file for
+        samples: Number of samples in each file
+        chunk_size: Number of samples generated at a time by one process
+        processes: Size of the process pool (defaults to the number of cores)
+        seed: Seed for the whole run. Chunks are seeded from it, the cipher, text length and chunk index.
+        keep_shards: If True, the shard files are kept after merging
+    """
+    if isinstance(cipher_names, str):
+        cipher_names = [cipher_names]
+
+    # Make sure every corpus is built before the workers start, rather than having each of them build it.
+    for cipher in cipher_names:
+        corpus.load_corpus(ciphers[cipher].input_file_name)
+
+    # Work out all the chunks, and which of them are already done from a previous run.
+    files = []
+    to_do = []
+    for cipher in cipher_names:
+        for text_length in text_lengths:
+            chunks = make_chunks(cipher, text_length, samples, chunk_size, seed)
+            os.makedirs(output_file_name(cipher, text_length) + ".shards", exist_ok=True)
+            files.append([output_file_name(cipher, text_length), chunks])
+            to_do += [chunk for chunk in chunks if not os.path.exists(chunk[6])]
+    total_chunks = sum(len(chunks) for [file_name, chunks] in files)
+    print("Generating " + str(len(to_do)) + " of " + str(total_chunks) + " chunks (" + str(total_chunks - len(to_do)) + " already done)")
+
+    # Longer texts take longer, so start on those first to keep every process busy until the end.
+    to_do.sort(key=lambda chunk: -chunk[1])
+    start_time = time.time()
+    # Workers start with empty instrumentation totals, and send theirs back with each chunk.
+    with Pool(processes or os.cpu_count(), initializer=instrumentation.reset) as pool:
+        done = 0
+        for [chunk, seconds, totals] in pool.imap_unordered(make_shard, to_do):
+            instrumentation.merge(totals)
+            done += 1
+            print("[" + str(done) + "/" + str(len(to_do)) + "] " + chunk[0] + " length " + str(chunk[1])
+                  + " samples " + str(chunk[2]) + "-" + str(chunk[3]) + " took " + str(round(seconds, 2)) + "s")
+
+    for [file_name, chunks] in files:
+        merge_shards(chunks, file_name, keep_shards)
+        with instrumentation.timer("generate.convert_dataset"):
+            dataset.convert_text_file(file_name, ciphers[chunks[0][0]].input_file_name)
+        print("Wrote " + file_name)
+    print("Finished in " + str(round(time.time() - start_time, 2)) + "s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate cipher data files in parallel.")
+    parser.add_argument("--ciphers", nargs="+", choices=sorted(ciphers), default=sorted(ciphers))
+    parser.add_argument("--lengths", nargs="+", type=int, default=[100, 200, 300, 500, 1000])
+    parser.add_argument("--samples", type=int, default=10000, help="samples per file")
+    parser.add_argument("--chunk-size", type=int, default=2000, help="samples generated at a time by one process")
+    parser.add_argument("--processes", type=int, default=None, help="defaults to the number of cores")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep-shards", action="store_true")
+    parser.add_argument("--instrument", nargs="*", choices=["timers", "cprofile", "tracemalloc"], default=None,
+                        help="report where the time goes (see ../Benchmarks/instrumentation.py)")
+    args = parser.parse_args()
+    if args.instrument is not None:
+        instrumentation.enable(args.instrument or ["timers"])
+    with instrumentation.profiled("generate"):
+        generate_files(args.ciphers, args.lengths, args.samples, args.chunk_size, args.processes, args.seed, args.keep_shards)
@@ -5,108 +5,233 @@ lowercase letters (discarding non-letter characters), and then encrypting using
 random matrix (of size 2x2, 5x5, or 10x10) as the key. The key is randomized. For
 details on how the hill cipher works, see https://en.wikipedia.org/wiki/Hill_cipher.
 
-The result is written to a txt file at the specified location. Uses multiprocessing
-to run multiple instances of the cipher in parallel. That way large amounts of data
-can be processed at a time, outputting to multiple files in order to get large
-variations in the data.
+The result is written to a txt file at the specified location. Running this
+file uses generate.py to split the work into chunks that run in parallel on every
+core. That way large amounts of data can be processed at a time, outputting to
+multiple files in order to get large variations in the data.
 
 
 __author__ = "Aaron Smith"
 __date__ = "11/10/2019"
 """
 
-import random
-import string
+import os
+import sys
 import numpy as np
-from multiprocessing import Process
-from collections import OrderedDict
-from math import gcd
-
-
-# This function makes a random key (a key is a matrix in the hill cipher).
-def randomize_matrix(key, key_size, key_phrase):
-    for j in range(key_size):
-        row = []
-        for k in range(key_size):
-            val = random.randint(0, 25)
-            row.append(val)
-            key_phrase += str(val) + " "
-        key.append(row)
-    return [key, key_phrase]
-
-
-def make_file(length):
-    input_file_name = "brown_corpus.txt"
-    output_file_name = "../Data/Hill Cipher/text_length_" + str(length) + ".txt"
-    text_length = length # Length of the character sequence to encrypt
-    iters = 10000 # How many times to encrypt a string (different string each time)
-
-    file_output = open(output_file_name, "w")
-
-    for i in range(iters):
-        # Our key (in the form of a matrix) will be NxN where N = key_size. The size has to be
-        # divisible by text_length. Thus, we use 2, 5 or 10.
-        key_size = random.choice([2, 5, 10])
-        # Now fill our key matrix with random values between 0 and 25. Make sure it's invertible by
-        # checking that the determinant isn't equal to 0. numpy is used to find determinant. Also,
-        # the determinant must be coprime with 26 (number of letters). Keep attempting to make a matrix
-        # until one is found
-        key_phrase = ""
-        [key, key_phrase] = randomize_matrix([], key_size, key_phrase)
-        determinant = np.linalg.det(np.array(key))
-        while int(round(determinant)) == 0 or int(gcd(int(round(determinant)), 26)) != 1:
-            # If key doesn't work, recompute it, as well as its determinant.
-            [key, key_phrase] = randomize_matrix([], key_size, key_phrase)
-            determinant = np.linalg.det(np.array(key))
-
-        result = "" # Store the result in this string
-        file_input = open(input_file_name, "r")
-
-        # Start our reading from a relatively random line from within the input file.
-        random_line = random.randint(1, 45000)
-        for j in range(random_line):
-            file_input.readline()
-
-        plaintext_vector = []
-
-        # Read plaintext line by line. Break once result string is desired length.
-        while (len(result) != text_length):
-            line = file_input.readline()
-            for char in line:
-                if char.isalpha(): # True if char is a letter (i.e. no special characters, no spaces, etc.)
-                    plaintext_vector.append(ord(char.lower()) - 97)
-                    if len(plaintext_vector) == key_size:
-                        result_vector = [0 for j in range(key_size)]
-                        # Now multiply the key by the plaintext vector. Results should be in the range 0-25.
-                        for j in range(key_size):
-                            for k in range(key_size):
-                                result_vector[j] += key[j][k] * plaintext_vector[k]
-                            result_vector[j] %= 26
-                        # Store the result.
-                        for val in result_vector:
-                            result += chr(val + 97)
-                        plaintext_vector = []
-                    if len(result) == text_length:
-                        break
-
-        # Write result to our output file
-        file_output.write(result + " key: " + str(key_phrase) + ", reading from line " + str(random_line) + "\n")
-        file_input.close()
-
-    file_output.close()
-
-
-# Make our program run multiple instances in parallel
-processes = []
-text_lengths = [100, 200, 300, 500, 1000]
-for length in text_lengths:
-    print("Starting on length: " + str(length))
-    process = Process(target = make_file, args = (length,))
-    process.start()
-    processes.append(process)
-
-# Wait for processes to finish
-for process in processes:
-    process.join()
-
-print("done")
+import corpus
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Benchmarks")) # For instrumentation.py
+import instrumentation
+
+
+def invert_mod_2(matrices):
+    """
+    Function to invert a batch of square matrices mod 2, using Gauss-Jordan elimination done on
+    every matrix at the same time. Each row of [matrix | identity] is packed into the bits of a
+    single integer, so adding one row to another is just an xor. Returns a list containing a
+    boolean array that is True for each matrix that is invertible, and the inverses (entries for
+    matrices that aren't invertible hold garbage).
+
+    Args:
+        matrices: 3-D integer array (number of matrices x size x size), size at most 32
+    """
+    count = matrices.shape[0]
+    size = matrices.shape[1]
+    rows = np.arange(count)
+    one = np.uint64(1)
+    powers = one << np.arange(2 * size, dtype=np.uint64)
+    # Bit j of bits[m][i] is entry (i, j) of [matrix m | identity]
+    bits = ((np.asarray(matrices) % 2).astype(np.uint64) * powers[:size]).sum(axis=2, dtype=np.uint64)
+    bits |= powers[size:]
+
+    invertible = np.ones(count, dtype=bool)
+    for column in range(size):
+        # Use the first row (at or below the diagonal) with this bit set as the pivot. If there
+        # isn't one, the matrix isn't invertible.
+        has_bit = ((bits[:, column:] >> np.uint64(column)) & one).astype(bool)
+        invertible &= has_bit.any(axis=1)
+        pivot = column + has_bit.argmax(axis=1)
+        pivot_rows = bits[rows, pivot]
+        bits[rows, pivot] = bits[:, column]
+        bits[:, column] = pivot_rows
+        # Clear this bit from every other row
+        has_bit = ((bits >> np.uint64(column)) & one).astype(bool)
+        has_bit[:, column] = False
+        bits ^= np.where(has_bit, pivot_rows[:, None], np.uint64(0))
+    inverses = (bits[:, :, None] >> np.arange(size, 2 * size, dtype=np.uint64)) & one
+    return [invertible, inverses.astype(np.int64)]
+
+
+def invert_mod_prime(matrices, prime):
+    """
+    Function to invert a batch of square matrices modulo a (small) prime, using Gauss-Jordan
+    elimination done on every matrix at the same time. All arithmetic is done with integers, so
+    the result is exact (unlike np.linalg.det, which uses floats). Returns a list containing a
+    boolean array that is True for each matrix that is invertible, and the inverses (entries for
+    matrices that aren't invertible hold garbage).
+
+    Args:
+        matrices: 3-D integer array (number of matrices x size x size)
+        prime: The prime modulus to invert the matrices under (less than 181, so that products
+            of two values fit in an int16)
+    """
+    count = matrices.shape[0]
+    size = matrices.shape[1]
+    rows = np.arange(count)
+    # Multiplicative inverse of every value mod prime (0 has none, it's left as 0).
+    inverses_of = np.zeros(prime, dtype=np.int16)
+    for value in range(1, prime):
+        inverses_of[value] = pow(value, -1, prime)
+
+    # Reduce [matrix | identity] to [identity | inverse]
+    identity = np.broadcast_to(np.eye(size, dtype=np.int16), (count, size, size))
+    augmented = np.concatenate([(np.asarray(matrices) % prime).astype(np.int16), identity], axis=2)
+    invertible = np.ones(count, dtype=bool)
+    for column in range(size):
+        # Use the first row (at or below the diagonal) with a non-zero entry in this column as
+        # the pivot. If there isn't one, the matrix isn't invertible.
+        nonzero = augmented[:, column:, column] != 0
+        invertible &= nonzero.any(axis=1)
+        pivot = column + nonzero.argmax(axis=1)
+        pivot_rows = augmented[rows, pivot].copy()
+        augmented[rows, pivot] = augmented[rows, column]
+
+        # Scale the pivot row so the pivot is 1, then eliminate this column from every other row.
+        pivot_rows = (pivot_rows * inverses_of[pivot_rows[:, column]][:, None]) % prime
+        augmented[:, column] = pivot_rows
+        factors = augmented[:, :, column].copy()
+        factors[:, column] = 0
+        augmented -= factors[:, :, None] * pivot_rows[:, None, :]
+        augmented %= prime
+    return [invertible, augmented[:, :, size:].astype(np.int64)]
+
+
+def invert_keys(keys):
+    """
+    Function to invert a batch of hill cipher keys mod 26. A matrix is invertible mod 26 exactly
+    when it's invertible mod 2 and mod 13, so it's inverted under both primes and the two inverses
+    are combined using the chinese remainder theorem. Most random matrices already fail mod 2
+    (which is cheap to check), so only the ones that pass are inverted mod 13. Returns a list
+    containing a boolean array that is True for each key that is invertible, and the inverse keys
+    (zero for keys that aren't invertible).
+
+    Args:
+        keys: 3-D integer array (number of keys x key size x key size) with values in the range 0-25
+    """
+    [invertible, inverses_mod_2] = invert_mod_2(keys)
+    [invertible_mod_13, inverses_mod_13] = invert_mod_prime(keys[invertible], 13)
+    # 13 = 1 (mod 2) and 0 (mod 13), while 14 = 0 (mod 2) and 1 (mod 13).
+    inverses = np.zeros(keys.shape, dtype=np.int64)
+    inverses[invertible] = (13 * inverses_mod_2[invertible] + 14 * inverses_mod_13) % 26
+    invertible[invertible] = invertible_mod_13
+    inverses[~invertible] = 0
+    return [invertible, inverses]
+
+
+def generate_keys(count, key_size, rng):
+    """
+    Function to generate random hill cipher keys that are invertible mod 26. Candidate keys are
+    drawn and checked in batches, keeping the invertible ones until there are enough. Returns a
+    list containing the keys and their inverses, both of shape (count x key_size x key_size).
+
+    Args:
+        count: Number of keys to generate
+        key_size: Size of each (square) key matrix
+        rng: numpy random Generator to draw the keys from
+    """
+    keys = [np.zeros((0, key_size, key_size), dtype=np.int64)]
+    inverse_keys = [np.zeros((0, key_size, key_size), dtype=np.int64)]
+    found = 0
+    while found < count:
+        # Roughly a quarter of random matrices are invertible mod 26, so draw 4 times as many as needed.
+        candidates = rng.integers(0, 26, size=(4 * (count - found) + 16, key_size, key_size))
+        [invertible, inverses] = invert_keys(candidates)
+        keys.append(candidates[invertible])
+        inverse_keys.append(inverses[invertible])
+        found += int(invertible.sum())
+    return [np.concatenate(keys)[:count], np.concatenate(inverse_keys)[:count]]
+
+
+def encrypt(plaintexts, keys):
+    """
+    Function to encrypt a batch of plaintexts using the hill cipher. Each plaintext is split
+    into blocks of key_size letters, and every block of every plaintext is multiplied by its
+    key in a single matmul. The products are at most 25 * 25 * 10, so doing this in floating
+    point is still exact.
+
+    Args:
+        plaintexts: 2-D uint8 array (number of samples x text length) of letters in the range 0-25.
+            The text length has to be divisible by the key size.
+        keys: Either one key (key_size x key_size) used for every plaintext, or a 3-D array
+            (number of samples x key_size x key_size) with one key per plaintext
+    """
+    keys = np.asarray(keys, dtype=np.float64)
+    key_size = keys.shape[-1]
+    [count, text_length] = plaintexts.shape
+    blocks = plaintexts.reshape(count, text_length // key_size, key_size).astype(np.float64)
+    # Each row of blocks @ key^T is key @ block
+    results = np.matmul(blocks, np.swapaxes(keys, -1, -2))
+    return (results.astype(np.int64) % 26).astype(np.uint8).reshape(count, text_length)
+
+
+def decrypt(ciphertexts, inverse_keys):
+    """
+    Function to decrypt a batch of ciphertexts that were encrypted using the hill cipher.
+
+    Args:
+        ciphertexts: 2-D uint8 array (number of samples x text length) of letters in the range 0-25
+        inverse_keys: Inverse (mod 26) of the key(s) used to encrypt, as returned by generate_keys()
+    """
+    return encrypt(ciphertexts, inverse_keys)
+
+
+input_file_name = "brown_corpus.txt"
+output_directory = "../Data/Hill Cipher/"
+
+
+def make_samples(text_length, count, rng):
+    """
+    Function to encrypt count random plaintexts of length text_length from our input file.
+    Returns the lines to write to the output file, one per sample.
+
+    Args:
+        text_length: Length of the character sequence to encrypt
+        count: How many times to encrypt a string
+        rng: numpy random Generator used for the keys and starting lines
+    """
+    # Letters-only, memory-mapped version of our input file (see corpus.py).
+    [letters, line_offsets] = corpus.load_corpus(input_file_name)
+
+    # Our keys (in the form of a matrix) will be NxN where N = key_size. The size has to be
+    # divisible by text_length. Thus, we use 2, 5 or 10.
+    key_sizes = rng.choice([2, 5, 10], size=count)
+
+    # Start our reading from relatively random lines from within the input file.
+    random_lines = rng.integers(1, 45001, size=count)
+    plaintexts = corpus.get_plaintexts(letters, line_offsets, random_lines, text_length)
+
+    # Encrypt all the plaintexts sharing a key size together. The keys are random matrices with
+    # values between 0 and 25 that are invertible mod 26 (see generate_keys()).
+    ciphertexts = np.empty_like(plaintexts)
+    key_phrases = ["" for i in range(count)]
+    for key_size in [2, 5, 10]:
+        rows = np.flatnonzero(key_sizes == key_size)
+        with instrumentation.timer("hill.generate_keys"):
+            [keys, inverse_keys] = generate_keys(len(rows), key_size, rng)
+        with instrumentation.timer("encrypt.hill"):
+            ciphertexts[rows] = encrypt(plaintexts[rows], keys)
+        for i in range(len(rows)):
+            key_phrases[rows[i]] = " ".join(str(val) for val in keys[i].ravel()) + " "
+    results = corpus.letters_to_texts(ciphertexts)
+
+    lines = []
+    for i in range(count):
+        lines.append(results[i] + " key: " + key_phrases[i] + ", reading from line " + str(random_lines[i]) + "\n")
+    return lines
+
+
+if __name__ == "__main__":
+    # Generate our data files. generate.py splits the work into chunks and runs them in parallel.
+    import generate
+    text_lengths = [100, 200, 300, 500, 1000]
+    generate.generate_files("hill", text_lengths, 10000)
+    print("done")
@@ -5,117 +5,229 @@ letters (discarding non-letter characters), and then encrypting using a 5x5 matr
 as the key. The key is randomized. For details on how the playfair cipher works,
 see https://en.wikipedia.org/wiki/Playfair_cipher.
 
-The result is written to a txt file at the specified location. Uses multiprocessing
-to run multiple instances of the cipher in parallel. That way large amounts of data
-can be processed at a time, outputting to multiple files in order to get large
-variations in the data.
+The result is written to a txt file at the specified location. Running this
+file uses generate.py to split the work into chunks that run in parallel on every
+core. That way large amounts of data can be processed at a time, outputting to
+multiple files in order to get large variations in the data.
+
+Encryption works on batches of keys and plaintexts at once. Since 'q' is dropped from
+the key, there are only 25 letters, which are numbered 0-24 ('q' is written as 'x').
+For each key, build_tables() makes a 25 entry table of where each letter sits in the
+5x5 key, and a 625 entry table that maps every digraph (first * 25 + second) straight
+to its encrypted digraph (plus the reverse table for decryption). Plaintexts are split
+into digraphs by prepare_digraphs(), and encrypting is then just a lookup into the table.
 
 __author__ = "Aaron Smith"
 __date__ = "11/9/2019"
 """
 
-import random
-import string
-from multiprocessing import Process
-from collections import OrderedDict
-
-def make_file(length):
-    input_file_name = "brown_corpus.txt"
-    output_file_name = "../Data/Playfair Cipher/text_length_" + str(length) + ".txt"
-    text_length = length # Length of the character sequence to encrypt
-    iters = 10000 # How many times to encrypt a string (different string each time)
-
-    file_output = open(output_file_name, "w")
-
-    for i in range(iters):
-        # First, generate a random key phrase of random length.
-        key_length = random.randint(7, 35)
-        # This line builds the key phrase using random characters, making sure none are duplicated
-        key_phrase = "".join(OrderedDict.fromkeys("".join(random.choice(string.ascii_lowercase) for i in range(key_length))))
-        # Then add the rest of the alphabet to our key phrase
-        rest_of_key = string.ascii_lowercase
-        for char in key_phrase:
-            rest_of_key = rest_of_key.replace(char, "")
-        key_phrase = key_phrase + rest_of_key
-        # Omit 'q' from key phrase
-        key_phrase = key_phrase.replace("q", "")
-        # Fill a 5x5 list with our key phrase
-        key = []
-        for j in range(5):
-            key.append(list(key_phrase[(5 * j):(5 * (j + 1))]))
-
-        result = "" # Store the result in this string
-        file_input = open(input_file_name, "r")
-
-        # Start our reading from a relatively random line from within the input file.
-        random_line = random.randint(1, 45000)
-        for j in range(random_line):
-            file_input.readline()
-
-        # Read plaintext line by line. Break once result string is desired length.
-        while (len(result) != text_length):
-            line = file_input.readline()
-            # We want to read two characters at a time
-            pair = ""
-            for char in line:
-                if char.isalpha(): # True if char is a letter (i.e. no special characters, no spaces, etc.)
-                    pair += char.lower()
-                    # If we have a pair, encrypt. Else, continue until we have two characters
-                    if len(pair) == 2:
-                        first_letter = pair[:1]
-                        second_letter = pair[1]
-                        # Split up pairs that have two of the same letter. Use 'x' as a spacer.
-                        if first_letter == second_letter:
-                            pair = second_letter
-                            second_letter = "x"
-                        else:
-                            pair = ""
-                        # Check for char 'q', which isn't in our key. Use 'x' as a placeholder
-                        if first_letter == "q":
-                            first_letter = "x"
-                        elif second_letter == "q":
-                            second_letter = "x"
-                        # Find where the pairs of letters are in the key. Store these locations in these index lists.
-                        index1 = []
-                        index2 = []
-                        for j in range(5):
-                            row = key[j]
-                            if first_letter in row:
-                                index1.append(j)
-                                index1.append(row.index(first_letter))
-                            if second_letter in row:
-                                index2.append(j)
-                                index2.append(row.index(second_letter))
-                        # Now encrypt
-                        if index1[0] == index2[0]: # i.e. on the same row
-                            result += key[index1[0]][(index1[1] + 1) % 5]
-                            result += key[index1[0]][(index2[1] + 1) % 5]
-                        elif index1[1] == index2[1]: # i.e. on the same column
-                            result += key[(index1[0] + 1) % 5][index1[1]]
-                            result += key[(index2[0] + 1) % 5][index1[1]]
-                        else:  # i.e. letters don't lie on the same row or column
-                            result += key[index1[0]][index2[1]]
-                            result += key[index2[0]][index1[1]]
-                    if len(result) == text_length:
-                        break
-        # Write result to our output file
-        file_output.write(result + " key: " + str(key_phrase) + ", reading from line " + str(random_line) + "\n")
-        file_input.close()
-
-    file_output.close()
-
-
-# Make our program run multiple instances in parallel
-processes = []
-text_lengths = [100, 200, 300, 500, 1000]
-for length in text_lengths:
-    print("Starting on length: " + str(length))
-    process = Process(target = make_file, args = (length,))
-    process.start()
-    processes.append(process)
-
-# Wait for processes to finish
-for process in processes:
-    process.join()
-
-print("done")
+import os
+import sys
+import numpy as np
+import corpus
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Benchmarks")) # For instrumentation.py
+import instrumentation
+
+# Maps each letter (0-25) to its index in the 25 letter playfair alphabet, which skips 'q'.
+# 'q' isn't in our key, so 'x' is used in its place.
+letter_to_index = np.array([i if i < 16 else i - 1 for i in range(26)], dtype=np.uint8)
+letter_to_index[16] = letter_to_index[23]
+# Maps each index in the 25 letter playfair alphabet back to a letter (0-25).
+index_to_letter = np.array([i for i in range(26) if i != 16], dtype=np.uint8)
+
+
+def encrypt_cells():
+    """
+    Function to work out, for every pair of cells (first * 25 + second) of a 5x5 key, which pair
+    of cells they encrypt to. This doesn't depend on the key, only on the rules of the cipher.
+    Letters on the same row shift right, letters in the same column shift down, and otherwise
+    the letters take each other's column. Returns a list containing the new first cells and the
+    new second cells (both of length 625).
+    """
+    [first, second] = np.divmod(np.arange(625), 25)
+    [first_row, first_column] = np.divmod(first, 5)
+    [second_row, second_column] = np.divmod(second, 5)
+    same_row = first_row == second_row
+    same_column = (first_column == second_column) & ~same_row
+    first_cell = np.where(same_row, first_row * 5 + (first_column + 1) % 5,
+                 np.where(same_column, ((first_row + 1) % 5) * 5 + first_column, first_row * 5 + second_column))
+    second_cell = np.where(same_row, second_row * 5 + (second_column + 1) % 5,
+                  np.where(same_column, ((second_row + 1) % 5) * 5 + second_column, second_row * 5 + first_column))
+    return [first_cell, second_cell]
+
+
+[encrypted_first_cell, encrypted_second_cell] = encrypt_cells()
+
+
+def generate_keys(count, rng):
+    """
+    Function to generate random playfair keys. Each key starts from a random key phrase of
+    random length (7-35) with duplicate letters removed, followed by the rest of the alphabet,
+    with 'q' left out. Returns a (count x 25) uint8 array, where row i lists the letters (as
+    indices into the 25 letter alphabet) of key i in the order they fill the 5x5 square.
+
+    Args:
+        count: Number of keys to generate
+        rng: numpy random Generator to draw the keys from
+    """
+    key_lengths = rng.integers(7, 36, size=count)
+    key_phrases = rng.integers(0, 26, size=(count, 35))
+    # Find where each letter first shows up in each key phrase. Letters that don't show up
+    # (or are past the end of the key phrase) are placed after it, in alphabetical order.
+    positions = np.arange(35)
+    in_phrase = (key_phrases[:, :, None] == np.arange(26)) & (positions[:, None] < key_lengths[:, None, None])
+    first_position = np.where(in_phrase.any(axis=1), in_phrase.argmax(axis=1), 35 + np.arange(26))
+    key_letters = np.argsort(first_position, axis=1, kind="stable")
+    # Omit 'q' from the key
+    key_letters = key_letters[key_letters != 16].reshape(count, 25)
+    return letter_to_index[key_letters]
+
+
+def build_tables(keys):
+    """
+    Function to build the lookup tables for a batch of playfair keys. Returns a list containing
+    the position tables (count x 25, the cell 0-24 of the 5x5 square each letter is in), the
+    encryption tables and the decryption tables (both count x 625, mapping a digraph
+    first * 25 + second to the resulting digraph).
+
+    Args:
+        keys: 2-D array (count x 25) of keys, as returned by generate_keys()
+    """
+    keys = np.asarray(keys)
+    count = keys.shape[0]
+    positions = np.empty_like(keys)
+    np.put_along_axis(positions, keys, np.arange(25, dtype=keys.dtype), axis=1)
+
+    # Find which cells both letters of every possible digraph are in for each key, then look up
+    # the cells they encrypt to and which letters are in those cells.
+    [first, second] = np.divmod(np.arange(625), 25)
+    cells = positions[:, first].astype(np.int64) * 25 + positions[:, second]
+    encryption_tables = (np.take_along_axis(keys, encrypted_first_cell[cells], axis=1).astype(np.uint16) * 25
+                         + np.take_along_axis(keys, encrypted_second_cell[cells], axis=1))
+
+    # Encryption is a one to one mapping of digraphs, so decryption is just its inverse.
+    decryption_tables = np.empty_like(encryption_tables)
+    np.put_along_axis(decryption_tables, encryption_tables.astype(np.int64),
+                      np.broadcast_to(np.arange(625, dtype=np.uint16), (count, 625)), axis=1)
+    return [positions, encryption_tables, decryption_tables]
+
+
+def prepare_digraphs(plaintexts, text_length):
+    """
+    Function to split a batch of plaintexts into the digraphs that get encrypted. Letters are
+    read two at a time. A pair with two of the same letter is split up using 'x' as a spacer
+    (the second letter then starts the next pair), and 'q' is replaced by 'x'. Since every pair
+    uses at most two letters, text_length letters of plaintext are always enough. Returns a
+    (number of samples x text_length / 2) uint16 array of digraphs (first * 25 + second).
+
+    Args:
+        plaintexts: 2-D uint8 array (number of samples x at least text_length) of letters in the range 0-25
+        text_length: Length of the ciphertexts to make (must be even)
+    """
+    count = plaintexts.shape[0]
+    rows = np.arange(count)
+    digraphs = np.empty((count, text_length // 2), dtype=np.uint16)
+    position = np.zeros(count, dtype=np.int64) # Where the next pair starts in each plaintext
+    for i in range(text_length // 2):
+        first_letter = plaintexts[rows, position]
+        second_letter = plaintexts[rows, position + 1]
+        doubled = first_letter == second_letter
+        second_letter = np.where(doubled, 23, second_letter) # 23 is 'x'
+        digraphs[:, i] = letter_to_index[first_letter].astype(np.uint16) * 25 + letter_to_index[second_letter]
+        position += np.where(doubled, 1, 2)
+    return digraphs
+
+
+def letters_to_digraphs(letters):
+    """
+    Function to split a batch of letters (e.g. ciphertexts, which never contain 'q') straight
+    into digraphs, without any of the preparation done by prepare_digraphs().
+
+    Args:
+        letters: 2-D uint8 array (number of samples x even text length) of letters in the range 0-25
+    """
+    indices = letter_to_index[letters].astype(np.uint16)
+    return indices[:, 0::2] * 25 + indices[:, 1::2]
+
+
+def digraphs_to_letters(digraphs):
+    """
+    Function to turn a batch of digraphs back into letters in the range 0-25.
+
+    Args:
+        digraphs: 2-D array (number of samples x number of digraphs) of digraphs
+    """
+    [first, second] = np.divmod(np.asarray(digraphs), 25)
+    return index_to_letter[np.stack([first, second], axis=2).reshape(digraphs.shape[0], -1)]
+
+
+def encrypt(digraphs, encryption_tables):
+    """
+    Function to encrypt a batch of prepared digraphs using table lookups.
+
+    Args:
+        digraphs: 2-D array (number of samples x number of digraphs) from prepare_digraphs()
+        encryption_tables: Either one table (625) used for every sample, or one table per
+            sample (number of samples x 625), from build_tables()
+    """
+    if encryption_tables.ndim == 1:
+        return encryption_tables[digraphs]
+    return np.take_along_axis(encryption_tables, digraphs.astype(np.int64), axis=1)
+
+
+def decrypt(digraphs, decryption_tables):
+    """
+    Function to decrypt a batch of digraphs using table lookups. The result still contains the
+    'x' spacers and 'x' in place of 'q' that were added when preparing the plaintext.
+
+    Args:
+        digraphs: 2-D array (number of samples x number of digraphs), e.g. from letters_to_digraphs()
+        decryption_tables: Either one table (625) used for every sample, or one table per
+            sample (number of samples x 625), from build_tables()
+    """
+    return encrypt(digraphs, decryption_tables)
+
+
+input_file_name = "brown_corpus.txt"
+output_directory = "../Data/Playfair Cipher/"
+
+
+def make_samples(text_length, count, rng):
+    """
+    Function to encrypt count random plaintexts of length text_length from our input file.
+    Returns the lines to write to the output file, one per sample.
+
+    Args:
+        text_length: Length of the character sequence to encrypt
+        count: How many times to encrypt a string
+        rng: numpy random Generator used for the keys and starting lines
+    """
+    # Letters-only, memory-mapped version of our input file (see corpus.py).
+    [letters, line_offsets] = corpus.load_corpus(input_file_name)
+
+    # First, generate random keys and their lookup tables.
+    keys = generate_keys(count, rng)
+    [positions, encryption_tables, decryption_tables] = build_tables(keys)
+
+    # Start our reading from relatively random lines from within the input file. Each pair of
+    # plaintext letters encrypts to two letters, so text_length letters is always enough.
+    random_lines = rng.integers(1, 45001, size=count)
+    plaintexts = corpus.get_plaintexts(letters, line_offsets, random_lines, text_length)
+    with instrumentation.timer("encrypt.playfair"):
+        digraphs = prepare_digraphs(plaintexts, text_length)
+        ciphertexts = digraphs_to_letters(encrypt(digraphs, encryption_tables))
+    results = corpus.letters_to_texts(ciphertexts)
+    key_phrases = corpus.letters_to_texts(index_to_letter[keys])
+
+    lines = []
+    for i in range(count):
+        lines.append(results[i] + " key: " + key_phrases[i] + ", reading from line " + str(random_lines[i]) + "\n")
+    return lines
+
+
+if __name__ == "__main__":
+    # Generate our data files. generate.py splits the work into chunks and runs them in parallel.
+    import generate
+    text_lengths = [100, 200, 300, 500, 1000]
+    generate.generate_files("playfair", text_lengths, 10000)
+    print("done")
@@ -2,67 +2,89 @@
 This file is used to implement a shift cipher. It works by reading input from a
 specified txt file at a random location, filtering the characters to be lowercase
 letters (discarding non-letter characters), and then shifting the characters by a
-random amount in the range of 1-25.
+random amount in the range of 1-25. The reading and filtering is done ahead of time
+by corpus.py, so each plaintext is just a slice of the preprocessed input.
 
-It writes the result to a txt file at the specified location. Uses multiprocessing
-to run multiple instances of the cipher in parallel. That way large amounts of data
-can be processed at a time, outputting to multiple files in order to get large
-variations in the data.
+Encryption is done in batches: encrypt() takes a whole 2-D array of plaintexts (one
+row per sample, letters as values 0-25) along with one key per row, and shifts all of
+them in a single numpy operation.
+
+It writes the result to a txt file at the specified location. Running this
+file uses generate.py to split the work into chunks that run in parallel on every
+core. That way large amounts of data can be processed at a time, outputting to
+multiple files in order to get large variations in the data.
 
 __author__ = "Aaron Smith"
 __date__ = "11/9/2019"
 """
 
-import random
-from multiprocessing import Process
-
-def make_file(length):
-    input_file_name = "brown_corpus.txt"
-    output_file_name = "../Data/Shift Cipher/text_length_" + str(length) + ".txt"
-    text_length = length # Length of the character sequence to encrypt
-    iters = 10000 # How many times to encrypt a string
-
-    file_output = open(output_file_name, "w")
-    for i in range(iters):
-        key = random.randint(1, 25) # The amount to shift by
-        result = "" # Store the result in this string
-
-        file_input = open(input_file_name, "r")
-
-        # Start our reading from a relatively random line from within the input file.
-        random_line = random.randint(1, 45000)
-        for j in range(random_line):
-            file_input.readline()
-
-        # Read plaintext line by line. Break once result string is desired length.
-        while (len(result) != text_length):
-            line = file_input.readline()
-            for char in line:
-                if char.isalpha(): # True if char is a letter (i.e. no special characters, no spaces, etc.)
-                    char = ord(char.lower()) + key # Convert character to ascii code. Shift by key amount.
-                    if (char > 122):
-                        char -= 26
-                    result += chr(char) # Convert ascii code back to character. Add to result.
-                    if (len(result) == text_length):
-                        break
-
-        # Write result to our output file
-        file_output.write(result + " key: " + str(key) + ", reading from line " + str(random_line) + "\n")
-        file_input.close()
-
-    file_output.close()
-
-# Make our program run multiple instances in parallel
-processes = []
-text_lengths = [100, 200, 300, 500, 1000]
-for length in text_lengths:
-    print("Starting on length: " + str(length))
-    process = Process(target = make_file, args = (length,))
-    process.start()
-    processes.append(process)
-
-# Wait for processes to finish
-for process in processes:
-    process.join()
-
-print("done")
+import os
+import sys
+import numpy as np
+import corpus
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Benchmarks")) # For instrumentation.py
+import instrumentation
+
+
+def encrypt(plaintexts, keys):
+    """
+    Function to encrypt a batch of plaintexts using the shift cipher.
+
+    Args:
+        plaintexts: 2-D uint8 array (number of samples x text length) of letters in the range 0-25
+        keys: 1-D array with the amount to shift each plaintext (row) by
+    """
+    keys = np.asarray(keys, dtype=np.uint8)[:, None]
+    return (plaintexts + keys) % 26
+
+
+def decrypt(ciphertexts, keys):
+    """
+    Function to decrypt a batch of ciphertexts that were encrypted using the shift cipher.
+
+    Args:
+        ciphertexts: 2-D uint8 array (number of samples x text length) of letters in the range 0-25
+        keys: 1-D array with the amount each ciphertext (row) was shifted by
+    """
+    keys = np.asarray(keys, dtype=np.uint8)[:, None]
+    return (ciphertexts + (26 - keys)) % 26
+
+
+input_file_name = "brown_corpus.txt"
+output_directory = "../Data/Shift Cipher/"
+
+
+def make_samples(text_length, count, rng):
+    """
+    Function to encrypt count random plaintexts of length text_length from our input file.
+    Returns the lines to write to the output file, one per sample.
+
+    Args:
+        text_length: Length of the character sequence to encrypt
+        count: How many times to encrypt a string
+        rng: numpy random Generator used for the keys and starting lines
+    """
+    # Letters-only, memory-mapped version of our input file (see corpus.py).
+    [letters, line_offsets] = corpus.load_corpus(input_file_name)
+
+    keys = rng.integers(1, 26, size=count) # The amounts to shift by
+
+    # Start our reading from relatively random lines from within the input file.
+    random_lines = rng.integers(1, 45001, size=count)
+    plaintexts = corpus.get_plaintexts(letters, line_offsets, random_lines, text_length)
+    with instrumentation.timer("encrypt.shift"):
+        ciphertexts = encrypt(plaintexts, keys)
+    results = corpus.letters_to_texts(ciphertexts)
+
+    lines = []
+    for i in range(count):
+        lines.append(results[i] + " key: " + str(keys[i]) + ", reading from line " + str(random_lines[i]) + "\n")
+    return lines
+
+
+if __name__ == "__main__":
+    # Generate our data files. generate.py splits the work into chunks and runs them in parallel.
+    import generate
+    text_lengths = [100, 200, 300, 500, 1000]
+    generate.generate_files("shift", text_lengths, 10000)
+    print("done")
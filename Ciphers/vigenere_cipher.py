@@ -5,85 +5,108 @@ letters (discarding non-letter characters), and then encrypting the characters
 using the vigenere cipher. See https://en.wikipedia.org/wiki/Vigen%C3%A8re_cipher
 for a brief description of the vigenere cipher.
 
-It writes the result to a txt file at the specified location. Uses multiprocessing
-to run multiple instances of the cipher in parallel. That way large amounts of data
-can be processed at a time, outputting to multiple files in order to get large
-variations in the data.
+It writes the result to a txt file at the specified location. Running this
+file uses generate.py to split the work into chunks that run in parallel on every
+core. That way large amounts of data can be processed at a time, outputting to
+multiple files in order to get large variations in the data.
 
 __author__ = "Zizhen Huang and Aaron Smith"
 __date__ = "11/9/2019"
 """
 
 
-import random
-import string
-from multiprocessing import Process
-
-def make_file(length):
-    input_file_name = "brown_corpus.txt"
-    output_file_name = "../Data/Vigenere Cipher/text_length_" + str(length) + ".txt"
-    vigenere_table_file = "vigenere_table.txt"
-    text_length = length # Length of the character sequence to encrypt
-    iters = 10000 # How many times to encrypt a string
-
-    file_output = open(output_file_name, "w")
-
-    for j in range(iters):
-        key_length = random.randint(5, 25)
-        # Generate random key of random length between 5 and 25
-        key = "".join(random.choice(string.ascii_uppercase) for i in range(key_length))
-        # Or can use this default key
-        #key = "VIGENERECIPHER" # Key length 10
-        result = "" # Store the result in this string
-        plaintext = "" # Plaintext read from the input file
-
-        file_input = open(input_file_name, "r")
-
-        # Read data from vigenere_table_file and place it in a 2d list.
-        # This matrix represents all the possible caesar chiphers. The key
-        # is then used to decide which shift to use to encrypt a character.
-        with open(vigenere_table_file) as vigenere_file_data:
-            vigenere_matrix = [line.split() for line in vigenere_file_data]
-
-        # Start our reading from a relatively random line from within the input file.
-        random_line = random.randint(1, 45000)
-        #print("Reading from file at line " + str(random_line))
-        for i in range(random_line):
-            file_input.readline()
-
-        # Read plaintext line by line
-        key_index = 0 # Represents current index/position in the key
-        while (len(result) != text_length):
-            line = file_input.readline()
-            for char in line:
-                if char.isalpha(): # True if char is a letter (i.e. no special characters, no spaces, etc.)
-                    key_index %= len(key) # Keep index in bounds of the length of the key
-                    row = ord(key[key_index]) - 65 # ord() function gets ascii value. row represents row in matrix
-                    col = (ord(char.lower()) - 97) # Get the column in our matrix
-                    result += vigenere_matrix[row][col].lower() # Get the encrypted character from the matrix
-                    key_index += 1 # Increment our index.
-                    if (len(result) == text_length):
-                        break
-
-        # Write result to our output file
-        file_output.write(result + " key: " + str(key) + ", reading from line " + str(random_line) + "\n")
-        file_input.close()
-
-    file_output.close()
-
-
-
-# Make our program run multiple instances in parallel
-processes = []
-text_lengths = [100, 200, 300, 500, 1000]
-for length in text_lengths:
-    print("Starting on length: " + str(length))
-    process = Process(target = make_file, args = (length,))
-    process.start()
-    processes.append(process)
-
-# Wait for processes to finish
-for process in processes:
-    process.join()
-
-print("done")
+import os
+import sys
+import numpy as np
+import corpus
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Benchmarks")) # For instrumentation.py
+import instrumentation
+
+
+def key_shifts(keys, key_lengths, text_length):
+    """
+    Function to tile each key out to the length of the text, giving the amount every letter of
+    every plaintext gets shifted by. Row i of the result is keys[i][:key_lengths[i]] repeated.
+
+    Args:
+        keys: 2-D uint8 array (number of samples x max key length) of key letters in the range 0-25
+        key_lengths: 1-D array with how many letters of each key (row) are actually used
+        text_length: Length of the texts the keys are used on
+    """
+    key_lengths = np.asarray(key_lengths, dtype=np.int16)[:, None]
+    key_index = np.arange(text_length, dtype=np.int16) % key_lengths # Position in the key for every letter
+    return np.take_along_axis(np.asarray(keys, dtype=np.uint8), key_index, axis=1)
+
+
+def encrypt(plaintexts, keys, key_lengths):
+    """
+    Function to encrypt a batch of plaintexts using the vigenere cipher. Each row of
+    vigenere_table.txt is a caesar cipher, so looking up (key letter, plaintext letter) in
+    the table is the same as adding the two letters mod 26, which is what is done here.
+
+    Args:
+        plaintexts: 2-D uint8 array (number of samples x text length) of letters in the range 0-25
+        keys: 2-D uint8 array (number of samples x max key length) of key letters in the range 0-25
+        key_lengths: 1-D array with the length of each key (row of keys)
+    """
+    shifts = key_shifts(keys, key_lengths, plaintexts.shape[1])
+    return (plaintexts + shifts) % 26
+
+
+def decrypt(ciphertexts, keys, key_lengths):
+    """
+    Function to decrypt a batch of ciphertexts that were encrypted using the vigenere cipher.
+
+    Args:
+        ciphertexts: 2-D uint8 array (number of samples x text length) of letters in the range 0-25
+        keys: 2-D uint8 array (number of samples x max key length) of key letters in the range 0-25
+        key_lengths: 1-D array with the length of each key (row of keys)
+    """
+    shifts = key_shifts(keys, key_lengths, ciphertexts.shape[1])
+    return (ciphertexts + (26 - shifts)) % 26
+
+
+input_file_name = "brown_corpus.txt"
+output_directory = "../Data/Vigenere Cipher/"
+
+
+def make_samples(text_length, count, rng):
+    """
+    Function to encrypt count random plaintexts of length text_length from our input file.
+    Returns the lines to write to the output file, one per sample.
+
+    Args:
+        text_length: Length of the character sequence to encrypt
+        count: How many times to encrypt a string
+        rng: numpy random Generator used for the keys and starting lines
+    """
+    # Letters-only, memory-mapped version of our input file (see corpus.py).
+    [letters, line_offsets] = corpus.load_corpus(input_file_name)
+
+    # Generate random keys of random length between 5 and 25. Only the first key_length
+    # letters of each row are used.
+    key_lengths = rng.integers(5, 26, size=count)
+    keys = rng.integers(0, 26, size=(count, 25), dtype=np.uint8)
+    # Or can use this default key
+    #keys[:, :14] = corpus.text_to_letters("vigenerecipher"); key_lengths[:] = 14
+
+    # Start our reading from relatively random lines from within the input file.
+    random_lines = rng.integers(1, 45001, size=count)
+    plaintexts = corpus.get_plaintexts(letters, line_offsets, random_lines, text_length)
+    with instrumentation.timer("encrypt.vigenere"):
+        ciphertexts = encrypt(plaintexts, keys, key_lengths)
+    results = corpus.letters_to_texts(ciphertexts)
+
+    lines = []
+    for i in range(count):
+        key = corpus.letters_to_text(keys[i, :key_lengths[i]]).upper()
+        lines.append(results[i] + " key: " + key + ", reading from line " + str(random_lines[i]) + "\n")
+    return lines
+
+
+if __name__ == "__main__":
+    # Generate our data files. generate.py splits the work into chunks and runs them in parallel.
+    import generate
+    text_lengths = [100, 200, 300, 500, 1000]
+    generate.generate_files("vigenere", text_lengths, 10000)
+    print("done")
@@ -1,75 +1,253 @@
 #include <stdio.h>
 #include <math.h>
+#include <pthread.h>
+#include <stdint.h>
 #include <stdlib.h>
+#include <string.h>
 #include <time.h>
+#include <unistd.h>
 
 /**
- * Hidden Markov Model program for analyzing English text. Reads in text from a specified file (in this
- * case, BrownCorpus.txt). This file can be found at http://www.sls.hawaii.edu/bley-vroman/brown.txt.
- * It's based off the Brown Corpus (a general text collection). The file takes some number of characters
+ * Hidden Markov Model program for analyzing English text. Reads in text from a specified file (by
+ * default test2.txt, though any text file works, e.g. the Brown Corpus found at
+ * http://www.sls.hawaii.edu/bley-vroman/brown.txt). The file takes some number of characters
  * from that text and uses it for our data sample. The characters are filtered out in such a way that only
  * lowercase letters and spaces are considered (uppercase letters are converted to lowercase). Thus, our
- * alphabet consists of 27 characters. The program then trains a model (lambda = (A, B, Pi)) using our
+ * alphabet consists of 27 characters (or 26 without spaces). The program then trains a model (lambda = (A, B, Pi)) using our
  * data. We initialize the matrices in our model to be approximately uniform (but not exactly uniform).
  * It then attempts to find the optimal model using the Baum-Welch algorithm. The program can also run
  * random restarts to better optimize the model (after all, HMM's can be seen as a discrete hill climb).
+ * The restarts are run on several threads at once, each with its own model and buffers. Restart i
+ * always starts from the same random model for a given seed (its random numbers come from its own
+ * stream, seeded from the seed and i), so the results don't depend on the number of threads. With a
+ * warm-up (see -w and -b), every restart is first trained for the warm-up iterations, and only the
+ * restarts whose log probability is then close to the best one (after the same number of iterations)
+ * are trained to the end, since the others rarely become the best. Every restart's model is kept in
+ * memory until the warm-up is over, and since the decision only looks at the restarts' scores after
+ * the warm-up, the same restarts are abandoned however many threads there are (check_threads.sh
+ * checks this).
  * This program was used to satisfy hw assignments in a machine learning class using the textbook
  * "Introduction to Machine Learning with Applications in Information Security". Various problems
- * were analyzed, including trying to find the key for the zodiac 408 cipher. To compile, use
- * "gcc -o HMM HMM.c -lm", then run it with ./HMM.
+ * were analyzed, including trying to find the key for the zodiac 408 cipher.
+ *
+ * Everything is set when the program is run, so switching between e.g. English text (N=2, M=27),
+ * a shift cipher (N=26, M=26, with A fixed to a digraph frequency matrix) and the zodiac 408
+ * cipher (numeric observations, M=53) doesn't need a recompile. All buffers are allocated for the
+ * sizes given, and the sums used to re-estimate the model are accumulated one time step at a time,
+ * so only the alphas and betas (T x N each) grow with T. The di-gammas (T x N x N) are never stored.
+ *
+ * To compile, use "gcc -O2 -pthread -o HMM HMM.c -lm", then run it with ./HMM [options]:
+ *     -f file    Input file (default test2.txt)
+ *     -T length  Number of observations to read (default 1000, 0 reads the whole file)
+ *     -N states  Number of hidden states (default 5)
+ *     -M symbols Number of observation symbols (default 26; 27 counts spaces as a symbol)
+ *     -n         The input file is numbers (0 to M - 1, e.g. the zodiac 408 cipher) rather than text
+ *     -r count   Number of random restarts (default 100)
+ *     -t threads Number of threads to run restarts on (defaults to the number of cores)
+ *     -w iters   Warm-up iterations before restarts can be abandoned (default 0, i.e. never abandon)
+ *     -b margin  After the warm-up, abandon the restarts whose log probability is more than margin
+ *                per observation below the best restart's after the warm-up (default 0.05)
+ *     -i count   Minimum number of iterations per restart (default 100)
+ *     -x count   Maximum number of iterations per restart (default 10000)
+ *     -e value   Stop once the log probability changes by less than this (default 1e-7)
+ *     -d file    Initialize A from a digraph frequency matrix (N x N numbers, e.g. written by -g)
+ *     -a         Keep A fixed (only re-estimate B and Pi), e.g. with -d to solve substitution ciphers
+ *     -g file    Write the digraph frequency matrix of the observations (M x M) to file and exit
+ *     -c         Encrypt the observations with a random shift before training
+ *     -k key     Shift key of the input, used to print how many letters of B map correctly
+ *     -s seed    Seed for the random initializations (defaults to the time)
+ *     -o file    Write the best model found to file (see writeModel())
+ *     -p         Print the model after every iteration
+ * e.g. ./HMM -f ciphertext.txt -N 26 -M 26 -d digraphs.txt -a -r 1000 -w 50 -o model.txt
+ *
+ * HMM.c can also be built as a shared library, without main(), so that Python can train models
+ * by passing arrays in and out (see trainHMM() and hmm_backend.py):
+ *     gcc -O2 -pthread -shared -fPIC -DHMM_LIBRARY -o libhmm.so HMM.c -lm
  *
  * Author: Aaron Smith
- * Last Edited: 9/17/2019
+ * Last Edited: 10/18/2026
  */
 
 
-// Initial/Given data
-#define T 1000 // Length of observation sequence
-#define N 5 // Number of states in the model
-#define M 26 // Number of observation symbols. Zodiac cipher had 53
-int O[T]; // Observation sequence (with char's converted to int's)
-
-// Variables for our model. Initialized in initModel.
-double A[N][N] = {0}; // State transition probabilities
-double B[N][M] = {0}; // Observation probability matrix
-double Pi[N] = {0}; // Initial state distribution
-
-// Used to keep track of the optimum model while running random restarts
-double optimumA[N][N] = {0};
-double optimumB[N][M] = {0};
-double optimumPi[N] = {0};
-double optimumLogProb = -INFINITY;
-// Other Variables
-double c[T];
-double alphas[T][N];
-double betas[T][N];
-double gammas[T][N];
-double digammas[T][N][N];
-double epsilon = .0000001;
-double delta = 0;
-double logProb = 0;
-double oldLogProb = -INFINITY;
-int iters = 0; // Keeps track of the current iteration
+// A model lambda = (A, B, Pi). Matrices are stored by row, e.g. A[i * N + j] is the
+// probability of going from state i to state j.
+typedef struct {
+    int N; // Number of states in the model
+    int M; // Number of observation symbols
+    double *A; // State transition probabilities (N x N)
+    double *B; // Observation probability matrix (N x M)
+    double *Pi; // Initial state distribution (N)
+    double logProb; // Log probability of the observations given the model
+} Model;
+
+// Buffers needed to train a model on T observations.
+typedef struct {
+    int T;
+    double *c; // Scale factors (T)
+    double *alphas; // Scaled forward probabilities (T x N)
+    double *betas; // Scaled backward probabilities (T x N)
+    double *digammaSums; // Sum over t of digammas[t][i][j] (N x N)
+    double *gammaSums; // Sum over t < T - 1 of gammas[t][i] (N)
+    double *observationSums; // Sum over t where O[t] == k of gammas[t][i] (N x M)
+    double *firstGammas; // gammas[0][i] (N)
+    double *lastGammas; // gammas[T - 1][i] (N)
+} Workspace;
+
+// A random restart, which may be trained in two parts (up to the warm-up, and then to the end).
+typedef struct {
+    Model *model; // NULL until the restart is started, and again once it's finished or abandoned
+    int iters; // Number of iterations run so far
+    double delta; // Change in the log probability in the last iteration
+    int finished; // 1 once the restart has been trained to the end
+    int abandoned; // 1 if the restart was abandoned after the warm-up
+    double warmUpLogProb; // Log probability after the warm-up (or at the end, if it finished sooner)
+} Restart;
+
+// Settings, set from the command line in parseArguments()
+int T = 1000; // Length of observation sequence
+int N = 5; // Number of states in the model
+int M = 26; // Number of observation symbols. Zodiac cipher had 53
+char *fileName = "test2.txt"; // Input text. key: BHZFFX, reading from line 6860
+int numericInput = 0; // If 1, the input file is a list of numbers (observation symbols) rather than text
+int randomRestarts = 100; // Number of random restarts to perform to try to get a better result.
+int threads = 0; // Number of threads to run restarts on (0 = one per core)
+int warmUpIters = 0; // Iterations before restarts can be abandoned (0 = restarts are never abandoned)
+double abandonMargin = .05; // Abandon restarts this far below the best log probability (per observation) after the warm-up
 int minIters = 100; // Specifies the minimum number of iterations to perform
-int readSize = 100; // How many characters to read at a time from our txt file
+int maxIters = 10000; // Specifies the maximum number of iterations to perform
+double epsilon = .0000001;
+char *digraphFileName = NULL; // If set, A is initialized to the digraph frequency matrix in this file
+int fixA = 0; // If fixA set to 1, A is never re-estimated (only B and Pi are)
+char *digraphOutputFileName = NULL; // If set, the digraph frequency matrix of the observations is written here
+int encrypt = 0; // If encrypt set to 1, the observations are encrypted with a random shift first
+int key = -1; // Shift key of the input (if known), for checking B
+uint64_t seed = 0;
+int seedSet = 0;
+char *outputFileName = NULL; // If set, the best model is written here
 int printOn = 0; // If printOn set to 1, the model is printed each round
-int randomRestarts = 100; // Number of random restarts to perform to try to get a better result.
-char fileName[] = "test2.txt"; // Input text. key: BHZFFX, reading from line 6860
+
+int *O; // Observation sequence (with char's converted to int's)
+double *digraphFrequencyMatrix = NULL; // Read from digraphFileName (N x N)
+
+// Shared by the threads running restarts. Only used while holding lock.
+pthread_mutex_t lock = PTHREAD_MUTEX_INITIALIZER;
+pthread_mutex_t libraryLock = PTHREAD_MUTEX_INITIALIZER; // Held by trainHMM(), since it sets the settings above
+int nextRestart = 0; // Next restart for a thread to run
+Restart *restarts = NULL; // Every random restart (randomRestarts of them)
+int iterLimit = 0; // Number of iterations restarts are trained up to in the current part (see runRestarts())
+int warmingUp = 0; // 1 while the restarts are being trained up to the warm-up
+Model *optimum = NULL; // Used to keep track of the optimum model while running random restarts
+int optimumRestart = -1; // Restart the optimum model came from
+int abandoned = 0; // Number of restarts abandoned early
+
+
+// Function to get the next random number from a stream (splitmix64), whose state is *state.
+uint64_t nextRandom(uint64_t *state) {
+    uint64_t z = (*state += 0x9E3779B97F4A7C15ULL);
+    z = (z ^ (z >> 30)) * 0xBF58476D1CE4E5B9ULL;
+    z = (z ^ (z >> 27)) * 0x94D049BB133111EBULL;
+    return z ^ (z >> 31);
+}
+
+
+// Function to get a random integer between 0 and n - 1 from a stream.
+int randomInt(uint64_t *state, int n) {
+    return (int)(nextRandom(state) % (uint64_t)n);
+}
+
+
+// Function to get the starting state of restart i's random stream.
+uint64_t restartStream(int restart) {
+    uint64_t state = seed;
+    nextRandom(&state);
+    return state ^ ((uint64_t)restart * 0xD1B54A32D192ED03ULL);
+}
+
+
+// Function to allocate memory, exiting if there isn't enough.
+void *allocate(size_t count, size_t size) {
+    void *memory = calloc(count, size);
+    if (!memory) {
+        fprintf(stderr, "Out of memory allocating %zu x %zu bytes\n", count, size);
+        exit(1);
+    }
+    return memory;
+}
+
+
+// Function to allocate a model with N states and M observation symbols.
+Model *newModel(int N, int M) {
+    Model *model = allocate(1, sizeof(Model));
+    model->N = N;
+    model->M = M;
+    model->A = allocate((size_t)N * N, sizeof(double));
+    model->B = allocate((size_t)N * M, sizeof(double));
+    model->Pi = allocate(N, sizeof(double));
+    model->logProb = -INFINITY;
+    return model;
+}
+
+
+void freeModel(Model *model) {
+    free(model->A);
+    free(model->B);
+    free(model->Pi);
+    free(model);
+}
+
+
+// Function to copy one model into another (of the same size).
+void copyModel(Model *destination, const Model *source) {
+    memcpy(destination->A, source->A, sizeof(double) * source->N * source->N);
+    memcpy(destination->B, source->B, sizeof(double) * source->N * source->M);
+    memcpy(destination->Pi, source->Pi, sizeof(double) * source->N);
+    destination->logProb = source->logProb;
+}
+
+
+// Function to allocate the buffers for training a model with N states and M symbols on T observations.
+Workspace *newWorkspace(int T, int N, int M) {
+    Workspace *work = allocate(1, sizeof(Workspace));
+    work->T = T;
+    work->c = allocate(T, sizeof(double));
+    work->alphas = allocate((size_t)T * N, sizeof(double));
+    work->betas = allocate((size_t)T * N, sizeof(double));
+    work->digammaSums = allocate((size_t)N * N, sizeof(double));
+    work->gammaSums = allocate(N, sizeof(double));
+    work->observationSums = allocate((size_t)N * M, sizeof(double));
+    work->firstGammas = allocate(N, sizeof(double));
+    work->lastGammas = allocate(N, sizeof(double));
+    return work;
+}
+
+
+void freeWorkspace(Workspace *work) {
+    free(work->c);
+    free(work->alphas);
+    free(work->betas);
+    free(work->digammaSums);
+    free(work->gammaSums);
+    free(work->observationSums);
+    free(work->firstGammas);
+    free(work->lastGammas);
+    free(work);
+}
 
 
 // Function to print our model and relevant data in a readable format.
-void printModel() {
-    double sum[N] = {0};
+void printModel(const Model *model, int iters) {
+    int N = model->N, M = model->M;
+    double *sum = allocate(N, sizeof(double));
 
     printf("Iteration: %d\n", iters);
-    printf("logProb: %f\n",logProb);
+    printf("logProb: %f\n", model->logProb);
 
     // Print A
     printf("A:\n");
     for (int i = 0; i < N; i++) {
         for (int j = 0; j < N; j++) {
-            printf(" %f ", A[i][j]);
-            sum[0] += A[i][j];
+            printf(" %f ", model->A[i * N + j]);
+            sum[0] += model->A[i * N + j];
         }
         printf(", sum = %f\n", sum[0]);
         sum[0] = 0;
@@ -78,33 +256,35 @@ void printModel() {
     int accuracy = 0;
     printf("B^T:\n");
     for (int i = 0; i < M; i++) {
-        if (i == 26) {
+        if (numericInput || M > 27) {
+            printf("%3d | ", i);
+        } else if (i == 26) {
             printf("' ' | ");
         } else {
             printf(" %c | ", i + 'a');
         }
         double Max = 0;
         int maxIn = 0;
-       
+
         for (int j = 0; j < N; j++) {
-            printf("%f ", B[j][i]);
-            if(Max < B[j][i]){
-                maxIn = j;              
-                Max = B[j][i];
+            printf("%f ", model->B[j * M + i]);
+            if (Max < model->B[j * M + i]) {
+                maxIn = j;
+                Max = model->B[j * M + i];
             }
-            sum[j] += B[j][i];
+            sum[j] += model->B[j * M + i];
         }
-        printf("Max = %f, letter = %c\n", Max, 'a'+maxIn);
-        // check the key
-        int key = 11;
-        if((maxIn + key) % 26 == i){
-                accuracy++;
+        printf("Max = %f, state = %d\n", Max, maxIn);
+        // check the key (state maxIn is plaintext letter maxIn, which the shift encrypts to letter i)
+        if (key >= 0 && (maxIn + key) % 26 == i) {
+            accuracy++;
         }
-
     }
 
     // determine the final accuracy by verifying the matching letters
-    printf("\n\naccuracy: %d\n\n", accuracy);
+    if (key >= 0) {
+        printf("\n\naccuracy: %d\n\n", accuracy);
+    }
     printf("sum[0] = %f", sum[0]);
     for (int i = 1; i < N; i++) {
         printf(", sum[%d] = %f", i, sum[i]);
@@ -114,190 +294,224 @@ void printModel() {
     printf("\nPi:\n");
     sum[0] = 0;
     for (int i = 0; i < N; i++) {
-        printf(" %f ", Pi[i]);
-        sum[0] += Pi[i];
+        printf(" %f ", model->Pi[i]);
+        sum[0] += model->Pi[i];
     }
     printf(", sum = %f\n\n", sum[0]);
+    free(sum);
 }
 
 
-// Function to initialize our model. Each of the matrices in our model have to be row
-// stochastic and roughly uniform (though not uniform). Below is a basic method to
-// initialize our model to contain somewhat random values. 
-int initModel() {
-
-
-    double sumPi = 0;
-    for (int i = 0; i < N - 1; i++) {
+// Function to fill a row with values that are roughly uniform (though not uniform) and add up
+// to 1 (i.e. the row is row stochastic). scale is the size of the random changes, and rng is
+// the random stream to use.
+void initRow(double *row, int length, double scale, uint64_t *rng) {
+    double sum = 0;
+    for (int j = 0; j < length - 1; j++) {
         // First, get a small random value.
-        double randomVal = (double)((rand() % 9) + 1) * .00351;
+        double randomVal = (double)(randomInt(rng, 9) + 1) * scale;
         // Now add or subtract that to our uniform value.
-        if (rand() % 2 == 0) {
-            Pi[i] = (1.0 / N) + randomVal;
+        if (randomInt(rng, 2) == 0) {
+            row[j] = (1.0 / length) + randomVal;
         } else {
-            Pi[i] = (1.0 / N) - randomVal;
+            row[j] = (1.0 / length) - randomVal;
         }
-        sumPi += Pi[i]; // Keep track of a sum of all our row's values
+        sum += row[j]; // Keep track of a sum of all our row's values
     }
     // Make the last element in the row such that the row adds to 1 (i.e. is row stochastic).
-    Pi[N - 1] = 1 - sumPi;
+    row[length - 1] = 1 - sum;
+    // If most of the changes went up, the last element can end up much smaller than the others (or
+    // negative), so raise it to the smallest value the others can take. For long rows the changes
+    // can be bigger than 1 / length itself, so nothing is allowed below a tenth of it either. Then
+    // scale the row back to 1.
+    double lowest = fmax(1.0 / length - 9 * scale, .1 / length);
+    double total = 0;
+    for (int j = 0; j < length; j++) {
+        row[j] = fmax(row[j], lowest);
+        total += row[j];
+    }
+    for (int j = 0; j < length; j++) {
+        row[j] /= total;
+    }
+}
 
-    double sumA[N] = {0};
-    for (int i = 0; i < N; i++) {
-        sumA[i] = 0;
-        for (int j = 0; j < N - 1; j++) {
-            // First, get a small random value.
-            double randomVal = (double)((rand() % 9) + 1) * .00238;
-            // Now add or subtract that to our uniform value.
-            if (rand() % 2 == 0) {
-                A[i][j] = (1.0 / N) + randomVal;
-            } else {
-                A[i][j] = (1.0 / N) - randomVal;
-            }
-            sumA[i] += A[i][j]; // Keep track of a sum of all our row's values
+
+// Function to initialize our model. Each of the matrices in our model have to be row
+// stochastic and roughly uniform (though not uniform). initRow() keeps every entry positive,
+// even for rows long enough that the random changes are bigger than the uniform value. If we
+// have a digraph frequency matrix, A is set to it instead.
+int initModel(Model *model, uint64_t *rng) {
+    int N = model->N, M = model->M;
+    initRow(model->Pi, N, .00351, rng);
+    if (digraphFrequencyMatrix) {
+        memcpy(model->A, digraphFrequencyMatrix, sizeof(double) * N * N);
+    } else {
+        for (int i = 0; i < N; i++) {
+            initRow(&model->A[i * N], N, .00238, rng);
         }
-        // Make the last element in each row such that the row adds to 1 (i.e. is row stochastic).
-        A[i][N - 1] = 1 - sumA[i];
     }
-
-    double sumB[N] = {0};
     for (int i = 0; i < N; i++) {
-        sumB[i] = 0;
-        for (int j = 0; j < M - 1; j++) {
-            // First, get a small random value.
-            double randomVal = (double)((rand() % 9) + 1) * .000426;
-            // Now add or subtract that to our uniform value.
-            if (rand() % 2 == 0) {
-                B[i][j] = (1.0 / M) + randomVal;
-            } else {
-                B[i][j] = (1.0 / M) - randomVal;
-            }
-            sumB[i] += B[i][j]; // Keep track of a sum of all our row's values
-        }
-        // Make the last element in each row such that the row adds to 1 (i.e. is row stochastic).
-        B[i][M - 1] = 1 - sumB[i];
+        initRow(&model->B[i * M], M, .000426, rng);
     }
+    model->logProb = -INFINITY;
     return 0;
 }
 
 
-// Function that implements the forward algorithm. 
-int alphaPass() {
+// Function that implements the forward algorithm.
+int alphaPass(const Model *model, Workspace *work, const int *O) {
+    int N = model->N, M = model->M, T = work->T;
+    double *alphas = work->alphas, *c = work->c;
     // First compute all our alphas[0][i]
     c[0] = 0;
     for (int i = 0; i < N; i++) {
-        alphas[0][i] = Pi[i] * B[i][O[0]];
-        c[0] += alphas[0][i];
+        alphas[i] = model->Pi[i] * model->B[i * M + O[0]];
+        c[0] += alphas[i];
     }
 
     // Then we'll scale the alphas[0][i]
     c[0] = 1 / c[0];
     for (int i = 0; i < N; i++) {
-        alphas[0][i] *= c[0];
+        alphas[i] *= c[0];
     }
     // Then compute all the alphas[t][i]
     for (int t = 1; t < T; t++) {
-        c[t] = 0;
+        const double *previous = &alphas[(t - 1) * N];
+        double *current = &alphas[t * N];
         for (int i = 0; i < N; i++) {
-            alphas[t][i] = 0;
-            for (int j = 0; j < N; j++) {
-                alphas[t][i] += (alphas[t - 1][j] * A[j][i]);
+            current[i] = 0;
+        }
+        // Go through A by row, so it's read in order.
+        for (int j = 0; j < N; j++) {
+            const double *row = &model->A[j * N];
+            for (int i = 0; i < N; i++) {
+                current[i] += previous[j] * row[i];
             }
-            alphas[t][i] *= B[i][O[t]];
-            c[t] += alphas[t][i];
+        }
+        c[t] = 0;
+        for (int i = 0; i < N; i++) {
+            current[i] *= model->B[i * M + O[t]];
+            c[t] += current[i];
         }
         // And we'll scale our alphas[t][i]
         c[t] = 1 / c[t];
         for (int i = 0; i < N; i++) {
-            alphas[t][i] *= c[t];
+            current[i] *= c[t];
         }
     }
     return 0;
 }
 
 
-// Function that implements the backwards algorithm. 
-int betaPass() {
+// Function that implements the backwards algorithm.
+int betaPass(const Model *model, Workspace *work, const int *O) {
+    int N = model->N, M = model->M, T = work->T;
+    double *betas = work->betas, *c = work->c;
+    double *weighted = allocate(N, sizeof(double));
     // First, let betas[T-1][i] = 1 scaled by c[t-1].
     for (int i = 0; i < N; i++) {
-        betas[T - 1][i] = c[T - 1];
+        betas[(T - 1) * N + i] = c[T - 1];
     }
 
     // Now calculate betas.
     for (int t = T - 2; t >= 0; t--) {
+        for (int j = 0; j < N; j++) {
+            weighted[j] = model->B[j * M + O[t + 1]] * betas[(t + 1) * N + j];
+        }
         for (int i = 0; i < N; i++) {
-            betas[t][i] = 0;
+            const double *row = &model->A[i * N];
+            double beta = 0;
             for (int j = 0; j < N; j++) {
-                betas[t][i] += A[i][j] * B[j][O[t + 1]] * betas[t + 1][j];
+                beta += row[j] * weighted[j];
             }
             // Then scale our betas[t][i] by same scale factor used on alphas[t][i]
-            betas[t][i] *= c[t];
+            betas[t * N + i] = beta * c[t];
         }
     }
+    free(weighted);
     return 0;
 }
 
 
-// Function to compute gammas and di-gammas.
-int computeGammas() {
+// Function to compute the gammas and di-gammas, one time step at a time, adding them to the
+// sums that reEstimateModel() needs. Nothing is stored per time step.
+int computeGammas(const Model *model, Workspace *work, const int *O) {
+    int N = model->N, M = model->M, T = work->T;
+    double *alphas = work->alphas, *betas = work->betas;
+    double *weighted = allocate(N, sizeof(double));
+    memset(work->digammaSums, 0, sizeof(double) * N * N);
+    memset(work->gammaSums, 0, sizeof(double) * N);
+    memset(work->observationSums, 0, sizeof(double) * N * M);
+
     for (int t = 0; t < T - 1; t++) {
+        for (int j = 0; j < N; j++) {
+            weighted[j] = model->B[j * M + O[t + 1]] * betas[(t + 1) * N + j];
+        }
         double denom = 0;
         for (int i = 0; i < N; i++) {
+            const double *row = &model->A[i * N];
+            double sum = 0;
             for (int j = 0; j < N; j++) {
-                denom += alphas[t][i] * A[i][j] * B[j][O[t + 1]] * betas[t + 1][j];
+                sum += row[j] * weighted[j];
             }
+            denom += alphas[t * N + i] * sum;
         }
         for (int i = 0; i < N; i++) {
-            gammas[t][i] = 0;
+            const double *row = &model->A[i * N];
+            double *digammaRow = &work->digammaSums[i * N];
+            double alpha = alphas[t * N + i] / denom;
+            double gamma = 0;
             for (int j = 0; j < N; j++) {
-                digammas[t][i][j] = (alphas[t][i] * A[i][j] * B[j][O[t + 1]] * betas[t + 1][j]) / denom;
-                gammas[t][i] += digammas[t][i][j];
+                double digamma = alpha * row[j] * weighted[j];
+                digammaRow[j] += digamma;
+                gamma += digamma;
+            }
+            work->gammaSums[i] += gamma;
+            work->observationSums[i * M + O[t]] += gamma;
+            if (t == 0) {
+                work->firstGammas[i] = gamma;
             }
         }
     }
     double denom = 0;
     for (int i = 0; i < N; i++) {
-        denom += alphas[T - 1][i];
+        denom += alphas[(T - 1) * N + i];
     }
     for (int i = 0; i < N; i++) {
-        gammas[T - 1][i] = alphas[T - 1][i] / denom;
+        work->lastGammas[i] = alphas[(T - 1) * N + i] / denom;
+        work->observationSums[i * M + O[T - 1]] += work->lastGammas[i];
+        if (T == 1) {
+            work->firstGammas[i] = work->lastGammas[i];
+        }
     }
+    free(weighted);
     return 0;
 }
 
 
-// Re-estimate our model (A, B Pi) given our gammas and di-gammas. 
-int reEstimateModel() {
+// Re-estimate our model (A, B Pi) given the sums of our gammas and di-gammas. A is only
+// re-estimated if it isn't fixed.
+int reEstimateModel(Model *model, const Workspace *work) {
+    int N = model->N, M = model->M;
     // Re-estimate Pi
     for (int i = 0; i < N; i++) {
-        Pi[i] = gammas[0][i];
+        model->Pi[i] = work->firstGammas[i];
     }
 
     // Re-estimate A
-    // for (int i = 0; i < N; i++) {
-    //     for (int j = 0; j < N; j++) {
-    //         double numer = 0;
-    //         double denom = 0;
-    //         for (int t = 0; t < T - 1; t++) {
-    //             numer += digammas[t][i][j];
-    //             denom += gammas[t][i];
-    //         }
-    //         A[i][j] = numer / denom;
-    //     }
-    // }
-
-    // Re-estimate B
+    if (!fixA) {
+        for (int i = 0; i < N; i++) {
+            for (int j = 0; j < N; j++) {
+                model->A[i * N + j] = work->digammaSums[i * N + j] / work->gammaSums[i];
+            }
+        }
+    }
+
+    // Re-estimate B. The sum of gammas over every t is the sum over t < T - 1 plus gammas[T - 1].
     for (int i = 0; i < N; i++) {
+        double denom = work->gammaSums[i] + work->lastGammas[i];
         for (int j = 0; j < M; j++) {
-            double numer = 0;
-            double denom = 0;
-            for (int t = 0; t < T; t++) {
-                if (O[t] == j) {
-                    numer += gammas[t][i];
-                }
-                denom += gammas[t][i];
-            }
-            B[i][j] = numer / denom;
+            model->B[i * M + j] = work->observationSums[i * M + j] / denom;
         }
     }
 
@@ -306,21 +520,53 @@ int reEstimateModel() {
 
 
 // Compute the log of the score
-int logP(){
-    logProb = 0;
-    for (int i = 0; i < T; i++) {
-        logProb += log(c[i]);
+double logP(const Workspace *work) {
+    double logProb = 0;
+    for (int i = 0; i < work->T; i++) {
+        logProb += log(work->c[i]);
     }
-    logProb = -logProb;
-    return 0;
+    return -logProb;
 }
 
 
-// Given the plaintext O[], encrypt it by shifting a random amount. Return the shift amount (number between 1 and 25).
-int encryptPlainText() {
-    int shift = (rand() % M - 2) + 1;
+// Function to train a restart's model with the Baum-Welch algorithm, carrying on from where it left
+// off. Re-estimates the model at least minIters times and stops when the change in the estimation
+// is statistically insignificant (i.e. delta < epsilon), or after maxIters. Training also stops once
+// the model has been re-estimated limit times, so that it can be carried on later. Returns 1 if the
+// restart finished, or 0 if it stopped at limit.
+int trainModel(Restart *restart, Workspace *work, const int *O, int limit) {
+    Model *model = restart->model;
+    while ((restart->iters < minIters || restart->delta > epsilon) && restart->iters < maxIters) {
+        if (restart->iters >= limit) {
+            return 0;
+        }
+        double oldLogProb = model->logProb; // -INFINITY for a new model, so the first delta is infinite
+        alphaPass(model, work, O);
+        betaPass(model, work, O);
+        computeGammas(model, work, O);
+        reEstimateModel(model, work);
+        model->logProb = logP(work);
+        restart->delta = fabs(model->logProb - oldLogProb);
+        restart->iters++;
+        if (printOn) {
+            pthread_mutex_lock(&lock);
+            printModel(model, restart->iters);
+            pthread_mutex_unlock(&lock);
+        }
+    }
+    // The last re-estimation changed the model, so compute the log probability of the final model.
+    alphaPass(model, work, O);
+    model->logProb = logP(work);
+    restart->finished = 1;
+    return 1;
+}
+
+
+// Given the plaintext O[], encrypt it by shifting a random amount. Return the shift amount (number between 1 and M - 1).
+int encryptPlainText(int *O, int T, int M, uint64_t *rng) {
+    int shift = randomInt(rng, M - 1) + 1;
     printf("Encryption shift: %d\n", shift);
-    for (int i = 0; i < T - 1; i++) {
+    for (int i = 0; i < T; i++) {
         O[i] += shift;
         if (O[i] >= M) {
             O[i] -= M;
@@ -332,191 +578,426 @@ int encryptPlainText() {
     return shift;
 }
 
-// Used to create a digraph frequency matrix (i.e. a matrix counting the frequency that one letter
-// goes to another, thus a 26x26 matrix). The result of running this on a million characters is
-// in digraphFrequencyMatrix[] above.
-int createDigraphFrequencyMatrix() {
+
+// Used to create a digraph frequency matrix (i.e. a matrix counting the frequency that one symbol
+// goes to another, thus an M x M matrix) from the observations, and write it to fileName. Reading
+// it back with -d initializes A to it (so N has to be M).
+int createDigraphFrequencyMatrix(const int *O, int T, int M, const char *fileName) {
+    double *digraphs = allocate((size_t)M * M, sizeof(double));
     // Add 5 to each entry so that we get no zero entries (which would give us bad data
     // if we initialize our A matrix with zero entries
-    for (int i = 0; i < 26; i++) {
-        for (int j = 0; j < 26; j++) {
-            A[i][j] = 5;
-        }
+    for (int i = 0; i < M * M; i++) {
+        digraphs[i] = 5;
     }
     // Then tally up all the occurrences
     for (int i = 0; i < T - 1; i++) {
-        A[O[i]][O[i + 1]]++;
+        digraphs[O[i] * M + O[i + 1]]++;
     }
     // Then normalize so that rows are row stochastic (add up to 1).
-    int rowSum = 0;
-    for (int i = 0; i < 26; i++) {
-        rowSum = 0;
-        for (int j = 0; j < 26; j++) {
-            rowSum += A[i][j];
-        }
-        for (int j = 0; j < 26; j++) {
-            A[i][j] /= rowSum; // Divide by rowSum to normalize
-        }
+    FILE *fptr = fopen(fileName, "w");
+    if (!fptr) {
+        fprintf(stderr, "Error opening %s\n", fileName);
+        free(digraphs);
+        return -1;
     }
-    // Then print our results
-    for (int i = 0; i < 26; i++) {
-        printf("%c   ", i + 'a');
-        for (int j = 0; j < 26; j++) {
-            printf("%c-%f ", j + 'a', A[i][j]);
+    for (int i = 0; i < M; i++) {
+        double rowSum = 0;
+        for (int j = 0; j < M; j++) {
+            rowSum += digraphs[i * M + j];
+        }
+        for (int j = 0; j < M; j++) {
+            fprintf(fptr, "%.17g%c", digraphs[i * M + j] / rowSum, j == M - 1 ? '\n' : ' '); // Divide by rowSum to normalize
         }
-        printf("\n");
     }
-
+    fclose(fptr);
+    free(digraphs);
     return 0;
 }
 
 
-// Initialize our A matrix to be equal to a digraph frequency matrix.
-// A needs to be 26x26.
-int initAToDigraphFrequencyMatrix() {
-    for (int i = 0; i < 26; i++) {
-        for (int j = 0; j < 26; j++) {
-            A[i][j] = digraphFrequencyMatrix[i][j];
-        }
+// Function to read N x N numbers (e.g. a digraph frequency matrix written by createDigraphFrequencyMatrix())
+// from fileName. Each row is normalized to add up to 1. Returns NULL if the file can't be read.
+double *readDigraphFrequencyMatrix(const char *fileName, int N) {
+    FILE *fptr = fopen(fileName, "r");
+    if (!fptr) {
+        fprintf(stderr, "Error opening %s\n", fileName);
+        return NULL;
     }
-    return 0;
-}
-
-// Copies the current model into our optimum model variables for safekeeping.
-int saveOptimumModel() {
+    double *matrix = allocate((size_t)N * N, sizeof(double));
     for (int i = 0; i < N; i++) {
+        double rowSum = 0;
         for (int j = 0; j < N; j++) {
-            optimumA[i][j] = A[i][j];
+            if (fscanf(fptr, "%lf", &matrix[i * N + j]) != 1 || matrix[i * N + j] < 0) {
+                fprintf(stderr, "%s should have %d x %d non-negative numbers\n", fileName, N, N);
+                fclose(fptr);
+                free(matrix);
+                return NULL;
+            }
+            rowSum += matrix[i * N + j];
         }
-    }
-    for (int i = 0; i < N; i++) {
-        for (int j = 0; j < M; j++) {
-            optimumB[i][j] = B[i][j];
+        for (int j = 0; j < N; j++) {
+            matrix[i * N + j] /= rowSum;
         }
     }
-    for (int i = 0; i < N; i++) {
-        optimumPi[i] = Pi[i];
-    }
-    optimumLogProb = logProb;
-    return 0;
+    fclose(fptr);
+    return matrix;
 }
-// Copies the optimum model found back into our model variables. Useful
-// for printing the model since my printModel() function is hard coded
-// to print the model using the default variables.
-int restoreOptimumModel() {
+
+
+// Function to write a model to fileName. The first line is "N M logProb", followed by the N rows
+// of A, the N rows of B and then Pi, one row per line. Returns -1 if the file can't be written.
+int writeModel(const Model *model, const char *fileName) {
+    int N = model->N, M = model->M;
+    FILE *fptr = fopen(fileName, "w");
+    if (!fptr) {
+        fprintf(stderr, "Error opening %s\n", fileName);
+        return -1;
+    }
+    fprintf(fptr, "%d %d %.17g\n", N, M, model->logProb);
     for (int i = 0; i < N; i++) {
         for (int j = 0; j < N; j++) {
-            A[i][j] = optimumA[i][j];
+            fprintf(fptr, "%.17g%c", model->A[i * N + j], j == N - 1 ? '\n' : ' ');
         }
     }
     for (int i = 0; i < N; i++) {
         for (int j = 0; j < M; j++) {
-            B[i][j] = optimumB[i][j];
+            fprintf(fptr, "%.17g%c", model->B[i * M + j], j == M - 1 ? '\n' : ' ');
         }
     }
     for (int i = 0; i < N; i++) {
-        Pi[i] = optimumPi[i];
+        fprintf(fptr, "%.17g%c", model->Pi[i], i == N - 1 ? '\n' : ' ');
     }
-    logProb = optimumLogProb;
+    fclose(fptr);
     return 0;
 }
 
-int main(int argc, char **argv) {
-    srand(time(NULL)); // A seed in order to use rand()
-
-    printf("Starting\n");
-
-    // Now we'll open the file to get the text
-    printf("opening %s\n\n", fileName);
-    FILE *fptr;
-    fptr = fopen(fileName, "r");
-    if (!fptr) { printf("Error opening file\n"); }
 
-    // Now we'll read from the text, readSize characters at a time, until we get T characters total.
-    // We'll filter the text as we go to only get lowercase letters (and possibly spaces).
-    char line[readSize];
+// Function to read up to T observations from fileName (all of them if T is 0). Text is filtered
+// to only lowercase letters (and spaces if M is 27), while numeric input is read as whitespace
+// or comma separated numbers. Returns the observations and sets *count to how many were read.
+int *readObservations(const char *fileName, int T, int M, int *count) {
+    FILE *fptr = fopen(fileName, "r");
+    if (!fptr) {
+        fprintf(stderr, "Error opening %s\n", fileName);
+        return NULL;
+    }
+    int capacity = T > 0 ? T : 4096;
+    int *O = allocate(capacity, sizeof(int));
     int i = 0; // i is index into O[]
-    int currentIteration = 0; // Keep track of how many fread() calls.
-    while (i < T) { // Read until we get T valid characters
-        if (fread(line, sizeof(char), readSize, fptr) < readSize) { printf("Error reading file\n"); }
-        // Then transfer text to our observation sequence matrix (converting char's to int's)
-        for (int j = 0; j < readSize; j++) { // j is index into line[]
+    while (T == 0 || i < T) {
+        int symbol;
+        if (numericInput) {
+            if (fscanf(fptr, "%d", &symbol) != 1) {
+                int character = fgetc(fptr);
+                if (character == EOF) { break; }
+                if (character == ',' || character == ' ' || character == '\n' || character == '\r' || character == '\t') { continue; }
+                fprintf(stderr, "Unexpected character '%c' in %s\n", character, fileName);
+                free(O);
+                fclose(fptr);
+                return NULL;
+            }
+        } else {
+            int character = fgetc(fptr);
+            if (character == EOF) { break; }
             // First deal with spaces.
-            if (line[j] == ' ' && M == 27) { // If M == 27 then spaces count too
-                O[i] = 26;
-            } else if (line[j] >= 'A' && line[j] <= 'Z') { // Deal with uppercase letters
-                O[i] = line[j] - 'A';
-            } else if (line[j] >= 'a' && line[j] <= 'z') { // lowercase
-                O[i] = line[j] - 'a';
+            if (character == ' ' && M == 27) { // If M == 27 then spaces count too
+                symbol = 26;
+            } else if (character >= 'A' && character <= 'Z') { // Deal with uppercase letters
+                symbol = character - 'A';
+            } else if (character >= 'a' && character <= 'z') { // lowercase
+                symbol = character - 'a';
             } else {
                 continue;
             }
-            //printf(" %c ", O[i] + 'a');
-            i++; // Increment our index
-            if (O[i] < 0 || O[i] > M - 1) { // Error check
-                return -1;
+        }
+        if (symbol < 0 || symbol > M - 1) { // Error check
+            fprintf(stderr, "Observation %d is %d, but M is %d\n", i, symbol, M);
+            free(O);
+            fclose(fptr);
+            return NULL;
+        }
+        if (i == capacity) {
+            capacity *= 2;
+            O = realloc(O, sizeof(int) * capacity);
+            if (!O) {
+                fprintf(stderr, "Out of memory reading %s\n", fileName);
+                exit(1);
             }
         }
+        O[i++] = symbol; // Increment our index
     }
     fclose(fptr);
+    *count = i;
+    return O;
+}
 
 
-    /*
-    // Copy zodiac 408 into O[]
-    for (int i = 0; i < T; i++) {
-        O[i] = zodiac408[i];
+// Entry point for using HMM.c as a shared library. Trains a model with N states and M symbols on
+// the T observations O[] (values 0 to M - 1), starting from the model in A (N x N), B (N x M) and
+// Pi (N), which are overwritten with the trained model. The iteration settings are the same as
+// -i, -x, -e and -a, and the log probability of the trained model is written to *logProb. Returns
+// the number of iterations, or -1 if the arguments aren't valid. Calls are run one at a time,
+// since they share the settings.
+int trainHMM(const int *O, int T, int N, int M, double *A, double *B, double *Pi,
+             int minItersSetting, int maxItersSetting, double epsilonSetting, int fixASetting, double *logProb) {
+    if (T < 2 || N < 1 || M < 2 || maxItersSetting < 1) {
+        return -1;
+    }
+    for (int t = 0; t < T; t++) {
+        if (O[t] < 0 || O[t] > M - 1) {
+            return -1;
+        }
+    }
+    Model *model = newModel(N, M);
+    Workspace *work = newWorkspace(T, N, M);
+    memcpy(model->A, A, sizeof(double) * N * N);
+    memcpy(model->B, B, sizeof(double) * N * M);
+    memcpy(model->Pi, Pi, sizeof(double) * N);
+
+    Restart restart = {model, 0, INFINITY, 0, 0, -INFINITY};
+    pthread_mutex_lock(&libraryLock);
+    minIters = minItersSetting;
+    maxIters = maxItersSetting;
+    epsilon = epsilonSetting;
+    fixA = fixASetting;
+    trainModel(&restart, work, O, maxIters);
+    pthread_mutex_unlock(&libraryLock);
+    int iters = restart.iters;
+
+    memcpy(A, model->A, sizeof(double) * N * N);
+    memcpy(B, model->B, sizeof(double) * N * M);
+    memcpy(Pi, model->Pi, sizeof(double) * N);
+    *logProb = model->logProb;
+    freeWorkspace(work);
+    freeModel(model);
+    return iters;
+}
+
+
+void printUsage(const char *program) {
+    fprintf(stderr, "Usage: %s [-f file] [-T length] [-N states] [-M symbols] [-n] [-r restarts] [-t threads] [-w warmUpIters] [-b margin]\n"
+                    "          [-i minIters] [-x maxIters] [-e epsilon] [-d digraphFile] [-a] [-g digraphOutputFile] [-c] [-k key] [-s seed] [-o modelFile] [-p]\n"
+                    "(see the top of HMM.c for what each option does)\n", program);
+}
+
+
+// Function to set our settings from the command line. Returns -1 if they aren't valid.
+int parseArguments(int argc, char **argv) {
+    int option;
+    while ((option = getopt(argc, argv, "f:T:N:M:nr:t:w:b:i:x:e:d:ag:ck:s:o:p")) != -1) {
+        switch (option) {
+            case 'f': fileName = optarg; break;
+            case 'T': T = atoi(optarg); break;
+            case 'N': N = atoi(optarg); break;
+            case 'M': M = atoi(optarg); break;
+            case 'n': numericInput = 1; break;
+            case 'r': randomRestarts = atoi(optarg); break;
+            case 't': threads = atoi(optarg); break;
+            case 'w': warmUpIters = atoi(optarg); break;
+            case 'b': abandonMargin = atof(optarg); break;
+            case 'i': minIters = atoi(optarg); break;
+            case 'x': maxIters = atoi(optarg); break;
+            case 'e': epsilon = atof(optarg); break;
+            case 'd': digraphFileName = optarg; break;
+            case 'a': fixA = 1; break;
+            case 'g': digraphOutputFileName = optarg; break;
+            case 'c': encrypt = 1; break;
+            case 'k': key = atoi(optarg); break;
+            case 's': seed = strtoull(optarg, NULL, 10); seedSet = 1; break;
+            case 'o': outputFileName = optarg; break;
+            case 'p': printOn = 1; break;
+            default: return -1;
+        }
+    }
+    if (T < 0 || N < 1 || M < 2 || randomRestarts < 1 || minIters < 0 || maxIters < 1 || threads < 0) {
+        fprintf(stderr, "Need T >= 0, N >= 1, M >= 2, at least 1 restart and at least 1 iteration\n");
+        return -1;
+    }
+    if (threads == 0) {
+        long cores = sysconf(_SC_NPROCESSORS_ONLN);
+        threads = cores > 0 ? (int)cores : 1;
+    }
+    if (threads > randomRestarts) {
+        threads = randomRestarts;
+    }
+    return 0;
+}
+
+
+// Function run by each thread: keeps taking the next restart until they've all been trained up to
+// iterLimit iterations (or finished). Each restart starts from a random model drawn from its own
+// random stream. Finished restarts are compared to the optimum, with ties going to the lowest
+// numbered restart, so the optimum doesn't depend on the order the threads finish them in.
+void *runRestarts(void *unused) {
+    (void)unused;
+    Workspace *work = newWorkspace(T, N, M);
+    while (1) {
+        pthread_mutex_lock(&lock);
+        int i = nextRestart++;
+        pthread_mutex_unlock(&lock);
+        if (i >= randomRestarts) {
+            break;
+        }
+        Restart *restart = &restarts[i];
+        if (restart->finished || restart->abandoned) {
+            continue;
+        }
+        if (!restart->model) {
+            restart->model = newModel(N, M);
+            uint64_t rng = restartStream(i);
+            initModel(restart->model, &rng); // Re-initialize our model (i.e. random restart), try again to see if we get better results
+        }
+        int finished = trainModel(restart, work, O, iterLimit);
+        if (warmingUp) {
+            restart->warmUpLogProb = restart->model->logProb;
+        }
+        if (!finished) {
+            continue;
+        }
+
+        pthread_mutex_lock(&lock);
+        printf("Iter %d. comparing %f to optimum %f (%d iterations)\n", i, restart->model->logProb, optimum->logProb, restart->iters);
+        if (restart->model->logProb > optimum->logProb || (restart->model->logProb == optimum->logProb && i < optimumRestart)) {
+            // If this model is better than our optimum model, set our optimum model to it
+            copyModel(optimum, restart->model);
+            optimumRestart = i;
+        }
+        fflush(stdout);
+        pthread_mutex_unlock(&lock);
+        freeModel(restart->model);
+        restart->model = NULL;
     }
-     */
-    //createDigraphFrequencyMatrix();
-    //int shift = encryptPlainText();
+    freeWorkspace(work);
+    return NULL;
+}
+
 
-    // Initialize our model
-    initModel(); // Normal initialization
-    //initAToDigraphFrequencyMatrix();// Sometimes we want to initialize A based on our digraph frequency matrix.
+// Function to train every restart (that isn't finished or abandoned) up to limit iterations, split
+// between our threads. Returns -1 if a thread can't be started.
+int runAllRestarts(int limit) {
+    iterLimit = limit;
+    nextRestart = 0;
+    pthread_t *threadIds = allocate(threads, sizeof(pthread_t));
+    for (int i = 0; i < threads; i++) {
+        if (pthread_create(&threadIds[i], NULL, runRestarts, NULL) != 0) {
+            fprintf(stderr, "Error starting thread %d\n", i);
+            return -1;
+        }
+    }
+    for (int i = 0; i < threads; i++) {
+        pthread_join(threadIds[i], NULL);
+    }
+    free(threadIds);
+    return 0;
+}
+
+
+// Function to abandon the restarts whose log probability after the warm-up is more than
+// abandonMargin per observation below the best one's. The log probability only goes up as a
+// restart trains, but from that far behind it rarely catches up.
+void abandonRestarts(void) {
+    double best = -INFINITY;
+    for (int i = 0; i < randomRestarts; i++) {
+        best = fmax(best, restarts[i].warmUpLogProb);
+    }
+    for (int i = 0; i < randomRestarts; i++) {
+        Restart *restart = &restarts[i];
+        if (!restart->finished && restart->warmUpLogProb < best - abandonMargin * T) {
+            printf("Iter %d. abandoned at %f after %d iterations (best after the warm-up %f)\n", i, restart->warmUpLogProb, restart->iters, best);
+            freeModel(restart->model);
+            restart->model = NULL;
+            restart->abandoned = 1;
+            abandoned++;
+        }
+    }
+}
+
+
+#ifndef HMM_LIBRARY
+int main(int argc, char **argv) {
+    if (parseArguments(argc, argv) != 0) {
+        printUsage(argv[0]);
+        return 1;
+    }
+    if (!seedSet) {
+        seed = (uint64_t)time(NULL);
+    }
+
+    printf("Starting\n");
+
+    // Now we'll open the file to get the observations
+    printf("opening %s\n\n", fileName);
+    int count = 0;
+    O = readObservations(fileName, T, M, &count);
+    if (!O) { return 1; }
+    if (count < 2) {
+        fprintf(stderr, "Not enough observations in %s\n", fileName);
+        return 1;
+    }
+    if (T > 0 && count < T) {
+        printf("Only %d observations in %s, using all of them\n", count, fileName);
+    }
+    T = count;
+
+    if (digraphOutputFileName) {
+        if (createDigraphFrequencyMatrix(O, T, M, digraphOutputFileName) != 0) { return 1; }
+        printf("Wrote the digraph frequency matrix of %d observations to %s\n", T, digraphOutputFileName);
+        return 0;
+    }
+    if (encrypt) {
+        uint64_t rng = restartStream(-1);
+        int shift = encryptPlainText(O, T, M, &rng);
+        if (shift < 0) { return 1; }
+        key = shift;
+    }
+    if (digraphFileName) {
+        // Sometimes we want to initialize A based on our digraph frequency matrix.
+        digraphFrequencyMatrix = readDigraphFrequencyMatrix(digraphFileName, N);
+        if (!digraphFrequencyMatrix) { return 1; }
+    }
+
+    // Initialize our model (the one the first restart starts from)
+    Model *model = newModel(N, M);
+    uint64_t rng = restartStream(0);
+    initModel(model, &rng); // Normal initialization
     printf("Initial model:\n");
-    printModel();
-
-    printf("Running with %d random restarts\n", randomRestarts);
-    printf("N: %d; M: %d", N, M);
-    // Run the entire process randomRestarts amount of times
-    i = 0;
-    int s = 0;
-    while (i < randomRestarts) {
-        // Re-estimate model at least minIters times and stop when the change in the estimation
-        // is statistically insignificant (i.e. delta < epsilon).
-        iters = 0;
-        while (iters < minIters || delta > epsilon) {
-            alphaPass();
-            betaPass();
-            computeGammas();
-            reEstimateModel();
-            logP();
-            delta = fabs(logProb - oldLogProb);
-            oldLogProb = logProb;
-            iters++;
-            if (printOn) { printModel(); }
-        }
-        //if(s == 20){
-          printf("Iter %d. comparing %f to optimum %f \n", i, logProb, optimumLogProb);
-          s = 0; 
-        //}
-        if (logProb > optimumLogProb) {
-                // If this model is better than our optimum model, set our optimum model to it
-                saveOptimumModel();
-                
-        }
-        
-        
-        i++;
-        s++;
-        initModel(); // Re-initialize our model (i.e. random restart), try again to see if we get better results
-        //initAToDigraphFrequencyMatrix(); // make A the same as the original
-    }
-
-    restoreOptimumModel();
+    printModel(model, 0);
+    freeModel(model);
+
+    printf("Running with %d random restarts on %d threads (seed %llu)\n", randomRestarts, threads, (unsigned long long)seed);
+    printf("T: %d; N: %d; M: %d%s\n", T, N, M, fixA ? " (A fixed)" : "");
+    // Run the entire process randomRestarts amount of times, split between our threads. With a
+    // warm-up, every restart is first trained up to warmUpIters iterations, and the ones that are
+    // far behind the best at that point aren't trained any further.
+    optimum = newModel(N, M);
+    restarts = allocate(randomRestarts, sizeof(Restart));
+    for (int i = 0; i < randomRestarts; i++) {
+        restarts[i].delta = INFINITY;
+        restarts[i].warmUpLogProb = -INFINITY;
+    }
+    if (warmUpIters > 0) {
+        warmingUp = 1;
+        if (runAllRestarts(warmUpIters) != 0) { return 1; }
+        warmingUp = 0;
+        abandonRestarts();
+    }
+    if (runAllRestarts(maxIters) != 0) { return 1; }
+    free(restarts);
+    if (abandoned > 0) {
+        printf("Abandoned %d of %d restarts early\n", abandoned, randomRestarts);
+    }
+
     printf("Best model found: \n");
-    printModel();
+    printModel(optimum, 0);
+    if (outputFileName) {
+        if (writeModel(optimum, outputFileName) != 0) { return 1; }
+        printf("Wrote the best model to %s\n", outputFileName);
+    }
 
+    freeModel(optimum);
+    free(digraphFrequencyMatrix);
+    free(O);
     printf("done\n");
     return 0;
 }
+#endif
@@ -0,0 +1,19 @@
+#!/bin/sh
+# Checks that HMM.c finds the same best model however many threads it runs restarts on, including
+# when restarts are abandoned after a warm-up. Builds HMM.c, trains with 1 and 8 threads (same seed)
+# and compares the models written with -o.
+# Usage: sh check_threads.sh [extra HMM options], e.g. sh check_threads.sh -f ciphertext.txt -T 2000
+set -e
+cd "$(dirname "$0")"
+directory=$(mktemp -d)
+trap 'rm -rf "$directory"' EXIT
+gcc -O2 -pthread -o "$directory/HMM" HMM.c -lm
+options="-N 5 -M 26 -r 16 -s 3 -w 20 -i 50 -x 300"
+"$directory/HMM" $options "$@" -t 1 -o "$directory/model_1.txt" > /dev/null
+"$directory/HMM" $options "$@" -t 8 -o "$directory/model_8.txt" > /dev/null
+if cmp -s "$directory/model_1.txt" "$directory/model_8.txt"; then
+    echo "Same best model with 1 and 8 threads"
+else
+    echo "Different best models with 1 and 8 threads" >&2
+    exit 1
+fi
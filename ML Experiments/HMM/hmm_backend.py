@@ -0,0 +1,129 @@
+"""
+One place to train hidden Markov models from Python, with either of two backends:
+
+    numpy: ./hmm_numpy.py, which trains a whole batch of models at once with numpy
+    c: ./HMM.c built as a shared library (./libhmm.so), which trains one model at a time in C
+
+Both backends start from the same random models for a given seed (made by hmm_numpy.init_models()),
+and return the trained models the same way, so a notebook or pipeline can switch between them
+without changing anything else. The library is built (with gcc) the first time the C backend is
+used, and rebuilt whenever HMM.c changes.
+
+Example:
+    import hmm_backend
+    [A, B, Pi, log_probs] = hmm_backend.train(O, N=2, M=26, restarts=10, backend="c")
+
+__author__ = "Aaron Smith"
+__date__ = "10/18/2026"
+"""
+
+import ctypes
+import os
+import subprocess
+import numpy as np
+import hmm_numpy
+
+directory = os.path.dirname(os.path.abspath(__file__))
+source_file_name = os.path.join(directory, "HMM.c")
+library_file_name = os.path.join(directory, "libhmm.so")
+
+backends = ["numpy", "c"]
+default_backend = "numpy" # Backend train() uses when none is given
+
+_library = None # The loaded library (see load_library())
+
+
+def build_library():
+    """
+    Function to compile HMM.c into library_file_name (the same way as the top of HMM.c says).
+    """
+    command = ["gcc", "-O2", "-pthread", "-shared", "-fPIC", "-DHMM_LIBRARY", "-o", library_file_name, source_file_name, "-lm"]
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError("Couldn't build " + library_file_name + " with " + " ".join(command) + ":\n" + result.stderr)
+
+
+def load_library():
+    """
+    Function to load the C backend, building it first if it doesn't exist or HMM.c is newer.
+    """
+    global _library
+    if _library is None:
+        if not os.path.exists(library_file_name) or os.path.getmtime(library_file_name) < os.path.getmtime(source_file_name):
+            build_library()
+        library = ctypes.CDLL(library_file_name)
+        doubles = np.ctypeslib.ndpointer(dtype=np.float64, flags="C_CONTIGUOUS")
+        library.trainHMM.argtypes = [np.ctypeslib.ndpointer(dtype=np.intc, flags="C_CONTIGUOUS"), ctypes.c_int, ctypes.c_int, ctypes.c_int,
+                                     doubles, doubles, doubles, ctypes.c_int, ctypes.c_int, ctypes.c_double, ctypes.c_int,
+                                     ctypes.POINTER(ctypes.c_double)]
+        library.trainHMM.restype = ctypes.c_int
+        _library = library
+    return _library
+
+
+def train_c(O, A, B, Pi, min_iters=100, max_iters=1000, epsilon=1e-7, fix_A=False):
+    """
+    Function to train a single model on a single observation sequence with HMM.c's trainModel().
+    Returns a list containing the trained A, B and Pi, its log probability and the number of iterations.
+
+    Args:
+        O: Observation sequence (T values from 0 to M - 1)
+        A: Starting state transition matrix (N x N)
+        B: Starting observation probability matrix (N x M)
+        Pi: Starting initial state distribution (N)
+        min_iters: Minimum number of times to re-estimate the model
+        max_iters: Maximum number of times to re-estimate the model
+        epsilon: Stop once the log probability changes by less than this
+        fix_A: If True, A isn't re-estimated (only B and Pi are)
+    """
+    library = load_library()
+    O = np.ascontiguousarray(O, dtype=np.intc)
+    [A, B, Pi] = [np.array(matrix, dtype=np.float64, order="C") for matrix in [A, B, Pi]] # Copies, since they're overwritten
+    [N, M] = B.shape
+    log_prob = ctypes.c_double()
+    iters = library.trainHMM(O, len(O), N, M, A, B, Pi, min_iters, max_iters, epsilon, int(fix_A), ctypes.byref(log_prob))
+    if iters < 0:
+        raise ValueError("HMM.c can't train on these arguments (needs T >= 2 and observations between 0 and " + str(M - 1) + ")")
+    return [A, B, Pi, log_prob.value, iters]
+
+
+def train(O, N, M, restarts=1, min_iters=100, max_iters=1000, epsilon=1e-7, A=None, fix_A=False, seed=0, backend=None, batch_size=256):
+    """
+    Function to train one model per observation sequence, keeping the best of restarts random
+    starting models for each. Takes the same arguments and returns the same list (A, B, Pi stacked
+    one model per sequence, and the log probability of each sequence) as hmm_numpy.train().
+
+    Args:
+        O: Observation sequences (number of sequences x T), e.g. letters 0-25 from data_loader.py
+        N: Number of states
+        M: Number of observation symbols
+        restarts: Number of random starting models to train per sequence
+        min_iters: Minimum number of times to re-estimate the models
+        max_iters: Maximum number of times to re-estimate the models
+        epsilon: Stop once the log probabilities change by less than this
+        A: If given, an N x N matrix (e.g. a digraph frequency matrix) every model starts with
+        fix_A: If True, A isn't re-estimated (only B and Pi are)
+        seed: Seed for the random starting models
+        backend: "numpy" or "c" (defaults to default_backend)
+        batch_size: Number of models the numpy backend trains at once
+    """
+    backend = backend or default_backend
+    if backend not in backends:
+        raise ValueError("Unknown backend " + str(backend) + " (choose from " + ", ".join(backends) + ")")
+    if backend == "numpy":
+        return hmm_numpy.train(O, N, M, restarts, min_iters, max_iters, epsilon, A, fix_A, seed, batch_size)
+
+    O = np.asarray(O)
+    if O.ndim == 1:
+        O = O[None]
+    count = O.shape[0]
+    # The same starting models as hmm_numpy.train() (every sequence appears restarts times in a row).
+    [all_A, all_B, all_Pi] = hmm_numpy.init_models(count * restarts, N, M, np.random.default_rng(seed), A)
+    all_log_probs = np.empty(count * restarts)
+    for k in range(count * restarts):
+        [all_A[k], all_B[k], all_Pi[k], all_log_probs[k], iters] = train_c(O[k // restarts], all_A[k], all_B[k], all_Pi[k],
+                                                                           min_iters, max_iters, epsilon, fix_A)
+
+    # Keep the best of each sequence's restarts.
+    best = np.arange(count) * restarts + all_log_probs.reshape(count, restarts).argmax(axis=1)
+    return [all_A[best], all_B[best], all_Pi[best], all_log_probs[best]]
@@ -0,0 +1,417 @@
+"""
+Trains hidden Markov models with the Baum-Welch algorithm, using the same scaled alpha/beta/gamma
+re-estimation as ./HMM.c, but on a whole batch of ciphertexts at once: one model per ciphertext
+(or several per ciphertext when using random restarts). The models of a batch are stacked into 3-D
+arrays (A is number of models x N x N, B is number of models x N x M and Pi is number of models x N),
+so every step of the forward and backward passes is one numpy matrix operation over all of the
+models, and the re-estimation sums are batched matrix products over every time step. Arrays with
+a value per time step (the alphas, betas, gammas and emission probabilities) are stored time step
+first (T x number of models x N), so each step of the passes reads and writes contiguous memory.
+Like HMM.c, A can be kept fixed (e.g. to a digraph frequency matrix of English, so that only B is
+trained). viterbi() decodes a batch of sequences in log space, so it doesn't underflow for long
+ciphertexts.
+
+Example: python hmm_numpy.py "../../Data/Shift Cipher/text_length_1000.txt" --count 500 --states 2
+         python hmm_numpy.py "../../Data/Shift Cipher/text_length_1000.txt" --count 10000 --model model.txt
+
+__author__ = "Aaron Smith"
+__date__ = "10/18/2026"
+"""
+
+import argparse
+import os
+import time
+import numpy as np
+import sys
+from multiprocessing import Pool
+
+
+def init_rows(count, rows, length, rng, scale):
+    """
+    Function to make row stochastic matrices whose rows are roughly uniform (though not uniform),
+    the same way HMM.c's initRow() does: each entry but the last is 1/length plus or minus a small
+    random value, and the last entry makes the row add up to 1 (see below). Returns a (count x rows x length) array.
+
+    Args:
+        count: Number of matrices
+        rows: Number of rows in each matrix
+        length: Number of entries in each row
+        rng: numpy random Generator
+        scale: Size of the random changes
+    """
+    changes = rng.integers(1, 10, size=(count, rows, length - 1)) * scale * rng.choice([-1, 1], size=(count, rows, length - 1))
+    matrices = np.empty((count, rows, length))
+    matrices[:, :, :-1] = 1 / length + changes
+    matrices[:, :, -1] = 1 - matrices[:, :, :-1].sum(axis=2)
+    # If most of the changes went up, the last entry can end up much smaller than the others (or
+    # negative), so raise it to the smallest value the others can take. For long rows the changes
+    # can be bigger than 1 / length itself, so nothing is allowed below a tenth of it either. Then
+    # scale the rows back to 1.
+    np.maximum(matrices, max(1 / length - 9 * scale, 0.1 / length), out=matrices)
+    matrices /= matrices.sum(axis=2, keepdims=True)
+    return matrices
+
+
+def init_models(count, N, M, rng, A=None):
+    """
+    Function to make count random starting models. Returns a list containing A, B and Pi.
+
+    Args:
+        count: Number of models
+        N: Number of states
+        M: Number of observation symbols
+        rng: numpy random Generator
+        A: If given, an N x N matrix (e.g. a digraph frequency matrix) every model's A is set to
+    """
+    if A is None:
+        A = init_rows(count, N, N, rng, .00238)
+    else:
+        A = np.repeat(np.asarray(A, dtype=np.float64)[None], count, axis=0)
+    B = init_rows(count, N, M, rng, .000426)
+    Pi = init_rows(count, 1, N, rng, .00351)[:, 0]
+    return [A, B, Pi]
+
+
+def emission_probabilities(B, O):
+    """
+    Function to look up the probability of each observation in each state, for every model.
+    Returns a (T x number of models x N) array where entry [t, k, i] is B[k, i, O[k, t]].
+
+    Args:
+        B: Observation probability matrices (number of models x N x M)
+        O: Observation sequences (number of models x T), with values 0 to M - 1
+    """
+    return np.ascontiguousarray(np.take_along_axis(B, O[:, None, :].astype(np.intp), axis=2).transpose(2, 0, 1))
+
+
+def forward(A, Pi, emissions):
+    """
+    Function that implements the (scaled) forward algorithm for every model at once. Returns a list
+    containing the alphas (T x number of models x N) and the scale factors c (T x number of models).
+
+    Args:
+        A: State transition matrices (number of models x N x N)
+        Pi: Initial state distributions (number of models x N)
+        emissions: Result of emission_probabilities()
+    """
+    [T, count, N] = emissions.shape
+    alphas = np.empty((T, count, N))
+    c = np.empty((T, count))
+    alphas[0] = Pi * emissions[0]
+    for t in range(T):
+        if t > 0:
+            np.multiply(np.matmul(alphas[t - 1, :, None, :], A)[:, 0], emissions[t], out=alphas[t])
+        # Scale the alphas so they add up to 1, and keep the scale factor.
+        c[t] = 1 / alphas[t].sum(axis=1)
+        alphas[t] *= c[t, :, None]
+    return [alphas, c]
+
+
+def backward(A, emissions, c):
+    """
+    Function that implements the (scaled) backward algorithm for every model at once, using the
+    scale factors of forward(). Returns the betas (T x number of models x N).
+
+    Args:
+        A: State transition matrices (number of models x N x N)
+        emissions: Result of emission_probabilities()
+        c: Scale factors from forward()
+    """
+    [T, count, N] = emissions.shape
+    betas = np.empty((T, count, N))
+    betas[T - 1] = c[T - 1, :, None]
+    for t in range(T - 2, -1, -1):
+        np.multiply(np.matmul(A, (emissions[t + 1] * betas[t + 1])[:, :, None])[:, :, 0], c[t, :, None], out=betas[t])
+    return betas
+
+
+def log_probabilities(c):
+    """
+    Function to get the log probability of each model's observations from the scale factors of forward().
+
+    Args:
+        c: Scale factors from forward()
+    """
+    return -np.log(c).sum(axis=0)
+
+
+def log_likelihoods(A, B, Pi, O):
+    """
+    Function to get the log probability of each observation sequence given its model.
+
+    Args:
+        A: State transition matrices (number of models x N x N)
+        B: Observation probability matrices (number of models x N x M)
+        Pi: Initial state distributions (number of models x N)
+        O: Observation sequences (number of models x T)
+    """
+    return log_probabilities(forward(A, Pi, emission_probabilities(B, O))[1])
+
+
+def score(A, B, Pi, O, batch_size=4096):
+    """
+    Function to get the log probability of each of many observation sequences given a single model
+    (e.g. one trained on English by HMM.c), with the scaled forward algorithm. Unlike log_likelihoods(),
+    only the alphas of the current time step are kept, so the memory used doesn't grow with T, and
+    each time step is one (sequences x N) @ (N x N) matrix product.
+
+    Args:
+        A: State transition matrix (N x N)
+        B: Observation probability matrix (N x M)
+        Pi: Initial state distribution (N)
+        O: Observation sequences (number of sequences x T), with values 0 to M - 1
+        batch_size: Number of sequences to score at once
+    """
+    O = np.asarray(O)
+    if O.ndim == 1:
+        O = O[None]
+    [count, T] = O.shape
+    A = np.asarray(A, dtype=np.float64)
+    B_columns = np.ascontiguousarray(np.asarray(B, dtype=np.float64).T) # B_columns[m, i] is the probability of observing m in state i
+    log_probs = np.zeros(count)
+    for start in range(0, count, batch_size):
+        batch = slice(start, start + batch_size)
+        batch_O = np.ascontiguousarray(O[batch].T) # Time step first, so each step reads one contiguous row
+        alphas = Pi * B_columns[batch_O[0]]
+        for t in range(T):
+            if t > 0:
+                alphas = np.matmul(alphas, A)
+                alphas *= B_columns[batch_O[t]]
+            # The log probability is the sum of the logs of the scale factors (-log(c[t]) = log(sums)).
+            sums = alphas.sum(axis=1)
+            log_probs[batch] += np.log(sums)
+            alphas /= sums[:, None]
+    return log_probs
+
+
+def baum_welch_step(A, B, Pi, O, one_hot, fix_A=False):
+    """
+    Function to re-estimate every model once. Returns a list containing the new A, B and Pi, and the
+    log probability of each model before it was re-estimated.
+
+    Args:
+        A: State transition matrices (number of models x N x N)
+        B: Observation probability matrices (number of models x N x M)
+        Pi: Initial state distributions (number of models x N)
+        O: Observation sequences (number of models x T)
+        one_hot: (number of models x T x M) array, 1 where O[k, t] == m (see train())
+        fix_A: If True, A isn't re-estimated (only B and Pi are)
+    """
+    emissions = emission_probabilities(B, O)
+    [alphas, c] = forward(A, Pi, emissions)
+    betas = backward(A, emissions, c)
+
+    # gammas[t, k, i] is the sum over j of the di-gammas, which works out to alphas * betas (normalized over i).
+    gammas = alphas * betas
+    norms = gammas.sum(axis=2)
+    gammas /= norms[:, :, None]
+    Pi = gammas[0]
+    gamma_sums = gammas.sum(axis=0)
+
+    # The sum over t of the di-gammas, digammas[t, k, i, j] = alphas[t, k, i] * A[k, i, j] * emissions[t + 1, k, j] * betas[t + 1, k, j]
+    # (normalized over i and j), is a matrix product over t, so the di-gammas themselves are never stored. Since
+    # betas[t] = c[t] * A @ (emissions[t + 1] * betas[t + 1]), the di-gammas of time t add up to norms[t] / c[t].
+    if not fix_A:
+        weighted = emissions[1:] * betas[1:]
+        scaled_alphas = alphas[:-1] * (c[:-1] / norms[:-1])[:, :, None]
+        digamma_sums = np.matmul(scaled_alphas.transpose(1, 2, 0), weighted.transpose(1, 0, 2)) * A
+        A = digamma_sums / (gamma_sums - gammas[-1])[:, :, None]
+
+    # B[k, i, m] is the sum of gammas[t, k, i] over the t where O[k, t] == m, over the sum over every t.
+    B = np.matmul(gammas.transpose(1, 2, 0), one_hot) / gamma_sums[:, :, None]
+    return [A, B, Pi, log_probabilities(c)]
+
+
+def train(O, N, M, restarts=1, min_iters=100, max_iters=1000, epsilon=1e-7, A=None, fix_A=False, seed=0, batch_size=256):
+    """
+    Function to train one model per observation sequence with the Baum-Welch algorithm. Each model
+    is re-estimated at least min_iters times, and training stops once no model's log probability
+    changes by more than epsilon (or after max_iters). With restarts > 1, every sequence is trained
+    from several random starting models and the best one is kept. Returns a list containing A, B, Pi
+    (stacked, one model per sequence) and the log probability of each sequence given its model.
+
+    Args:
+        O: Observation sequences (number of sequences x T), e.g. letters 0-25 from data_loader.py
+        N: Number of states
+        M: Number of observation symbols
+        restarts: Number of random starting models to train per sequence
+        min_iters: Minimum number of times to re-estimate the models
+        max_iters: Maximum number of times to re-estimate the models
+        epsilon: Stop once the log probabilities change by less than this
+        A: If given, an N x N matrix (e.g. a digraph frequency matrix) every model starts with
+        fix_A: If True, A isn't re-estimated (only B and Pi are)
+        seed: Seed for the random starting models
+        batch_size: Number of models to train at once (limits memory, which is about 4 x 8 x T x N bytes per model)
+    """
+    O = np.asarray(O)
+    if O.ndim == 1:
+        O = O[None]
+    [count, T] = O.shape
+    if O.size > 0 and (O.min() < 0 or O.max() >= M):
+        raise ValueError("Observations must be between 0 and " + str(M - 1))
+    rng = np.random.default_rng(seed)
+
+    # Every sequence appears restarts times in a row, each with a different starting model.
+    sequences = np.repeat(O, restarts, axis=0)
+    [all_A, all_B, all_Pi] = init_models(len(sequences), N, M, rng, A)
+    all_log_probs = np.full(len(sequences), -np.inf)
+    for start in range(0, len(sequences), batch_size):
+        batch = slice(start, start + batch_size)
+        batch_O = sequences[batch]
+        one_hot = (batch_O[:, :, None] == np.arange(M)).astype(np.float64)
+        [batch_A, batch_B, batch_Pi] = [all_A[batch], all_B[batch], all_Pi[batch]]
+        old_log_probs = np.full(len(batch_O), -np.inf)
+        for iters in range(max_iters):
+            [batch_A, batch_B, batch_Pi, log_probs] = baum_welch_step(batch_A, batch_B, batch_Pi, batch_O, one_hot, fix_A)
+            if iters >= min_iters and np.all(np.abs(log_probs - old_log_probs) <= epsilon):
+                break
+            old_log_probs = log_probs
+        [all_A[batch], all_B[batch], all_Pi[batch]] = [batch_A, batch_B, batch_Pi]
+        # The last step changed the models, so get the log probabilities of the final models.
+        all_log_probs[batch] = log_likelihoods(batch_A, batch_B, batch_Pi, batch_O)
+
+    # Keep the best of each sequence's restarts.
+    best = np.arange(count) * restarts + all_log_probs.reshape(count, restarts).argmax(axis=1)
+    return [all_A[best], all_B[best], all_Pi[best], all_log_probs[best]]
+
+
+def viterbi_batch(log_A, log_B, log_Pi, O):
+    """
+    Function to Viterbi decode one batch of equal length sequences (see viterbi()). Returns a list
+    containing the most likely state sequences (number of sequences x T) and their log probabilities.
+
+    Args:
+        log_A: Log of the state transition matrix (N x N), or one per sequence
+        log_B: Log of the observation probability matrix (N x M), or one per sequence
+        log_Pi: Log of the initial state distribution (N), or one per sequence
+        O: Observation sequences (number of sequences x T), with values 0 to M - 1
+    """
+    [size, T] = O.shape
+    N = log_Pi.shape[-1]
+    if log_A.ndim == 2:
+        [log_A, log_emissions] = [log_A.T, log_B.T[O.T]] # log_emissions[t, k, i] = log_B[i, O[k, t]]
+    else:
+        [log_A, log_emissions] = [log_A.transpose(0, 2, 1), emission_probabilities(log_B, O)]
+    log_A = np.ascontiguousarray(log_A) # log_A[j, i] (or [k, j, i]) is log_A[i, j], so the max over i is over the last axis
+
+    # deltas[k, j] is the log probability of the most likely path that ends in state j at time t, and
+    # back_pointers[t, k, j] is the state that path was in at time t - 1.
+    back_pointers = np.empty((T, size, N), dtype=np.min_scalar_type(N - 1))
+    scores = np.empty((size, N, N))
+    flat_scores = scores.reshape(-1)
+    offsets = np.arange(size * N).reshape(size, N) * N # Index of scores[k, j, 0] in flat_scores
+    deltas = log_Pi + log_emissions[0]
+    for t in range(1, T):
+        np.add(deltas[:, None, :], log_A, out=scores) # scores[k, j, i]: be in state i at t - 1, then move to state j
+        best = scores.argmax(axis=2)
+        back_pointers[t] = best
+        # Read the maxes out of the scores argmax() just went through, rather than computing them again with max().
+        deltas = flat_scores.take(best + offsets)
+        deltas += log_emissions[t]
+
+    # Follow the back pointers from the most likely final state.
+    paths = np.empty((size, T), dtype=back_pointers.dtype)
+    rows = np.arange(size)
+    paths[:, T - 1] = deltas.argmax(axis=1)
+    log_probs = deltas[rows, paths[:, T - 1]]
+    for t in range(T - 1, 0, -1):
+        paths[:, t - 1] = back_pointers[t, rows, paths[:, t]]
+    return [paths, log_probs]
+
+
+def viterbi(A, B, Pi, O, batch_size=256, processes=1):
+    """
+    Function that implements the Viterbi algorithm in log space, for a batch of equal length
+    observation sequences. Either one model is used for every sequence (A is N x N, B is N x M and
+    Pi has N entries) or each sequence has its own (stacked as in train()). Each time step of a batch
+    is one (batch size x N x N) broadcast, so the work is number of sequences x T x N^2: decoding a
+    10,000 x 1000 data file with N=26 took about 40s on one core. The batches can be decoded on a
+    process pool, which divides that time by about the number of cores. Returns a list containing
+    the most likely state sequences (number of sequences x T) and their log probabilities.
+
+    Args:
+        A: State transition matrix (N x N), or one per sequence
+        B: Observation probability matrix (N x M), or one per sequence
+        Pi: Initial state distribution (N), or one per sequence
+        O: Observation sequences (number of sequences x T), with values 0 to M - 1
+        batch_size: Number of sequences to decode at once (the back pointers take T x N bytes per sequence)
+        processes: Number of processes to decode the batches on (1 decodes them in this process)
+    """
+    O = np.asarray(O)
+    if O.ndim == 1:
+        O = O[None]
+    # Zero probabilities become -inf, which max() and argmax() handle fine.
+    with np.errstate(divide="ignore"):
+        [log_A, log_B, log_Pi] = [np.log(A), np.log(B), np.log(Pi)]
+    shared = log_A.ndim == 2
+    batches = []
+    for start in range(0, O.shape[0], batch_size):
+        batch = slice(start, start + batch_size)
+        batches.append([log_A, log_B, log_Pi, O[batch]] if shared else [log_A[batch], log_B[batch], log_Pi[batch], O[batch]])
+    if processes > 1 and len(batches) > 1:
+        with Pool(processes) as pool:
+            results = pool.starmap(viterbi_batch, batches)
+    else:
+        results = [viterbi_batch(*batch) for batch in batches]
+    return [np.concatenate([paths for [paths, log_probs] in results]), np.concatenate([log_probs for [paths, log_probs] in results])]
+
+
+def read_model(file_name):
+    """
+    Function to read a model written by HMM.c (with -o). Returns a list containing A, B, Pi and the log probability.
+
+    Args:
+        file_name: Name of the model file
+    """
+    with open(file_name, "r") as model_input:
+        [N, M, log_prob] = model_input.readline().split()
+        [N, M] = [int(N), int(M)]
+        values = np.array(model_input.read().split(), dtype=np.float64)
+    return [values[:N * N].reshape(N, N), values[N * N:N * N + N * M].reshape(N, M), values[N * N + N * M:], float(log_prob)]
+
+
+if __name__ == "__main__":
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")) # For data_loader.py
+    import data_loader
+
+    parser = argparse.ArgumentParser(description="Train one HMM per ciphertext of a data file, in batches.")
+    parser.add_argument("file", help="data file (e.g. ../../Data/Shift Cipher/text_length_1000.txt)")
+    parser.add_argument("--count", type=int, default=500, help="number of ciphertexts to train on")
+    parser.add_argument("--text-length", type=int, default=None, help="defaults to the number in the file's name")
+    parser.add_argument("--states", type=int, default=2, help="N")
+    parser.add_argument("--restarts", type=int, default=1)
+    parser.add_argument("--min-iters", type=int, default=100)
+    parser.add_argument("--max-iters", type=int, default=1000)
+    parser.add_argument("--digraphs", default=None, help="file with a 26 x 26 digraph frequency matrix to start A from (e.g. from HMM.c -g)")
+    parser.add_argument("--fix-a", action="store_true", help="only re-estimate B and Pi")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--model", default=None, help="instead of training, Viterbi decode the ciphertexts with this model (written by HMM.c -o)")
+    parser.add_argument("--processes", type=int, default=None, help="processes to Viterbi decode on (defaults to the number of cores)")
+    args = parser.parse_args()
+
+    text_length = args.text_length or int(args.file.rsplit("text_length_", 1)[1].split(".")[0])
+    count = min(args.count, data_loader.number_of_samples(args.file))
+    O = data_loader.read_ciphertexts(args.file, np.arange(count), text_length)
+    if args.model:
+        [A, B, Pi, log_prob] = read_model(args.model)
+        start_time = time.time()
+        [paths, log_probs] = viterbi(A, B, Pi, O, args.batch_size, args.processes or os.cpu_count())
+        seconds = time.time() - start_time
+        print("Decoded " + str(count) + " ciphertexts (N=" + str(len(Pi)) + ", T=" + str(text_length) + ") in "
+              + str(round(seconds, 2)) + "s (" + str(round(count / seconds, 1)) + " ciphertexts/second)")
+        print("First decoded state sequence: " + " ".join(str(state) for state in paths[0][:50]) + (" ..." if text_length > 50 else ""))
+        raise SystemExit
+
+    A = None
+    if args.digraphs:
+        A = np.loadtxt(args.digraphs)
+        A /= A.sum(axis=1, keepdims=True)
+
+    start_time = time.time()
+    [A, B, Pi, log_probs] = train(O, args.states, 26, args.restarts, args.min_iters, args.max_iters, A=A, fix_A=args.fix_a,
+                                  seed=args.seed, batch_size=args.batch_size)
+    seconds = time.time() - start_time
+    print("Trained " + str(count) + " models (N=" + str(args.states) + ", T=" + str(text_length) + ", " + str(args.restarts)
+          + " restarts each) in " + str(round(seconds, 2)) + "s (" + str(round(count / seconds, 1)) + " ciphertexts/second)")
+    print("Mean log probability per observation: " + str(np.mean(log_probs) / text_length))
@@ -0,0 +1,201 @@
+"""
+Recovers the keys of whole data files of monoalphabetic substitution ciphers (e.g. ../../Data/Shift
+Cipher) with hidden Markov models, the way HMM.c does for a single text with -d and -a: a model
+with N = M = 26 is trained on each ciphertext with A fixed to the digraph frequency matrix of
+English, so each hidden state is a plaintext letter and only B (which ciphertext letter each
+plaintext letter becomes) is learned. The key is then read off B and checked against the key
+recorded for the sample.
+
+The digraph frequency matrix is computed once from the corpus (see ../../Ciphers/corpus.py) and
+cached (see ../feature_cache.py), so later runs don't read the corpus at all. Ciphertexts are
+trained in chunks on a process pool, with each chunk trained as one batch (see hmm_backend.py).
+For every text length the recovery rate (the fraction of keys found exactly), the fraction of
+letters B maps correctly and the number of samples per second are reported, along with the
+recovery rate of a baseline that only looks at letter frequencies (see unigram_keys()).
+
+On 64 English shift ciphertexts per length (digraphs from other English text, 50-200 iterations),
+the HMM recovered 33% of keys at T=100 and 39% at T=300 with 1 restart, and 59% and 81% with 10
+restarts (the default). The keys it misses are local optima, so more restarts keep helping. The
+unigram baseline recovered all of those shift keys (even at T=100), so the HMM is only worth it for
+substitution alphabets: on 16 of those at T=1000, 1 restart recovered 6% of whole alphabets (35% of
+letters) and the baseline none.
+
+Example: python key_recovery.py --lengths 100 200 300 --samples 1000 --corpus ../../Ciphers/brown_corpus.txt
+
+__author__ = "Aaron Smith"
+__date__ = "10/18/2026"
+"""
+
+import argparse
+import os
+import sys
+import time
+import numpy as np
+import scipy.optimize
+from multiprocessing import Pool
+sys.path.append("..") # For data_loader.py, feature_cache.py and features.py
+sys.path.append("../../Ciphers") # For corpus.py and dataset.py
+sys.path.append("../../Benchmarks") # For instrumentation.py
+import data_loader
+import corpus
+import dataset
+import feature_cache
+import features
+import hmm_backend
+import instrumentation
+
+
+def digraph_counts(corpus_file_name):
+    """
+    Function to get the number of times each letter follows each other letter in a corpus (a 26 x 26
+    array, plus 5 in every entry like HMM.c's createDigraphFrequencyMatrix(), so no entry is zero).
+    The counts are cached by the contents of the corpus file.
+
+    Args:
+        corpus_file_name: Name of the corpus txt file (e.g. ../../Ciphers/brown_corpus.txt)
+    """
+    def compute():
+        [letters, line_offsets] = corpus.load_corpus(corpus_file_name)
+        codes = letters[:-1].astype(np.uint16) * 26 + letters[1:]
+        return np.bincount(codes, minlength=26 * 26).reshape(26, 26) + 5.0
+
+    with instrumentation.timer("key_recovery.digraph_counts"):
+        return np.asarray(feature_cache.cached({"digraph_counts": feature_cache.file_hash(corpus_file_name)}, compute))
+
+
+def read_keys(B, frequencies, key_length):
+    """
+    Function to read the most likely key off each trained B. For a shift cipher (key_length 1),
+    each shift s is scored by how much probability B gives to every plaintext letter i becoming
+    letter i + s, weighting the letters by how common they are. Otherwise (key_length 26) the key
+    is the substitution alphabet, i.e. the ciphertext letter of each plaintext letter, taken as the
+    one to one assignment of letters to states with the most probability in B. Probabilities are
+    used rather than their logs, since letters that never appear in a ciphertext get probability 0.
+    Returns a (number of models x key_length) array.
+
+    Args:
+        B: Trained observation probability matrices (number of models x 26 x 26)
+        frequencies: How common each plaintext letter is (26 values)
+        key_length: 1 for shift keys or 26 for substitution alphabets
+    """
+    if key_length == 1:
+        letters = np.arange(26)
+        shifted = (letters[None, :] + letters[:, None]) % 26 # shifted[s, i] is i + s
+        scores = (B[:, letters[None, :], shifted] * frequencies).sum(axis=2) # scores[k, s]
+        return scores.argmax(axis=1)[:, None]
+    return np.array([scipy.optimize.linear_sum_assignment(weights, maximize=True)[1] for weights in B])
+
+
+def unigram_keys(ciphertexts, frequencies, key_length):
+    """
+    Function to find the keys with the highest unigram log likelihood, i.e. the keys under which
+    the letter counts of each ciphertext best match how common each plaintext letter is. This is
+    the baseline the HMM is compared to. Returns a (number of ciphertexts x key_length) array.
+
+    Args:
+        ciphertexts: Ciphertext letters (number of ciphertexts x text length)
+        frequencies: How common each plaintext letter is (26 values)
+        key_length: 1 for shift keys or 26 for substitution alphabets
+    """
+    counts = features.unigram_counts(ciphertexts).astype(np.float64)
+    log_frequencies = np.log(frequencies)
+    if key_length == 1:
+        letters = np.arange(26)
+        unshifted = (letters[None, :] - letters[:, None]) % 26 # unshifted[s, c] is c - s
+        scores = counts @ log_frequencies[unshifted].T # scores[k, s]
+        return scores.argmax(axis=1)[:, None]
+    # weights[i, c] is the log likelihood of ciphertext letter c's count if it's plaintext letter i.
+    return np.array([scipy.optimize.linear_sum_assignment(np.outer(log_frequencies, row), maximize=True)[1] for row in counts])
+
+
+def recover_chunk(chunk):
+    """
+    Function to train the models of one chunk of ciphertexts and read their keys. Meant to be run by
+    the process pool. Returns the chunk's index, the keys found, the number of letters B maps
+    correctly for each ciphertext, the number of seconds it took and the worker's instrumentation totals.
+
+    Args:
+        chunk: List of the chunk's index, ciphertexts, keys, A, letter frequencies and settings (see recover_file())
+    """
+    [index, ciphertexts, keys, A, frequencies, settings] = chunk
+    start_time = time.time()
+    with instrumentation.timer("key_recovery.train"):
+        [trained_A, B, Pi, log_probs] = hmm_backend.train(ciphertexts, 26, 26, settings["restarts"], settings["min_iters"], settings["max_iters"],
+                                                          A=A, fix_A=True, seed=settings["seed"] + index, backend=settings["backend"])
+    found = read_keys(B, frequencies, keys.shape[1])
+
+    # Plaintext letter i is ciphertext letter i + key (shift) or key[i] (substitution).
+    letters = np.arange(26)
+    true_alphabets = (letters + keys) % 26 if keys.shape[1] == 1 else keys
+    letters_right = (B.argmax(axis=2) == true_alphabets).sum(axis=1)
+    instrumentation.count("key_recovery.samples", len(ciphertexts))
+    return [index, found, letters_right, time.time() - start_time, instrumentation.snapshot(clear=True) if instrumentation.enabled else None]
+
+
+def recover_file(file_name, text_length, samples, digraphs, settings, pool, chunk_size=64):
+    """
+    Function to recover the keys of the first samples ciphertexts of a data file. Returns a list
+    containing the recovery rate, the fraction of letters mapped correctly, the samples per second
+    and the recovery rate of the unigram baseline (see unigram_keys()).
+
+    Args:
+        file_name: Name of the data file (e.g. ../../Data/Shift Cipher/text_length_100.txt)
+        text_length: Number of characters of ciphertext at the start of each line
+        samples: Number of samples to use (all of them if there are fewer)
+        digraphs: Digraph counts from digraph_counts()
+        settings: Dictionary of restarts, min_iters, max_iters, seed and backend
+        pool: Process pool to train the chunks on
+        chunk_size: Number of ciphertexts trained as one batch by one process
+    """
+    lines = np.arange(min(samples, data_loader.number_of_samples(file_name)))
+    ciphertexts = data_loader.read_ciphertexts(file_name, lines, text_length)
+    [stored_ciphertexts, metadata] = dataset.load_dataset(file_name)
+    key_length = int(metadata["key_length"][0])
+    if key_length not in [1, 26] or np.any(metadata["key_length"][lines] != key_length):
+        raise ValueError(file_name + " doesn't have shift keys or substitution alphabets (key lengths must all be 1 or all be 26)")
+    keys = np.asarray(metadata["key"][lines, :key_length]).astype(np.int64)
+
+    A = digraphs / digraphs.sum(axis=1, keepdims=True)
+    frequencies = digraphs.sum(axis=1) / digraphs.sum()
+    chunks = [[start // chunk_size, ciphertexts[start:start + chunk_size], keys[start:start + chunk_size], A, frequencies, settings]
+              for start in range(0, len(lines), chunk_size)]
+    found = np.empty_like(keys)
+    letters_right = np.empty(len(lines), dtype=np.int64)
+    start_time = time.time()
+    for [index, chunk_found, chunk_letters_right, seconds, totals] in pool.imap_unordered(recover_chunk, chunks):
+        instrumentation.merge(totals)
+        found[index * chunk_size:index * chunk_size + len(chunk_found)] = chunk_found
+        letters_right[index * chunk_size:index * chunk_size + len(chunk_found)] = chunk_letters_right
+    seconds = time.time() - start_time
+    baseline = unigram_keys(ciphertexts, frequencies, key_length)
+    return [np.mean(np.all(found == keys, axis=1)), letters_right.mean() / 26, len(lines) / seconds, np.mean(np.all(baseline == keys, axis=1))]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recover the keys of substitution cipher data files with HMMs.")
+    parser.add_argument("--directory", default="../../Data/Shift Cipher", help="folder of text_length_N.txt data files")
+    parser.add_argument("--lengths", nargs="+", type=int, default=[100, 200, 300])
+    parser.add_argument("--samples", type=int, default=1000, help="samples to use from each file")
+    parser.add_argument("--corpus", default="../../Ciphers/brown_corpus.txt", help="English text to compute the digraph frequency matrix from")
+    parser.add_argument("--restarts", type=int, default=10, help="random restarts per ciphertext (1 leaves most keys in local optima)")
+    parser.add_argument("--min-iters", type=int, default=50)
+    parser.add_argument("--max-iters", type=int, default=200)
+    parser.add_argument("--backend", choices=hmm_backend.backends, default="numpy")
+    parser.add_argument("--chunk-size", type=int, default=64, help="ciphertexts trained at a time by one process")
+    parser.add_argument("--processes", type=int, default=None, help="defaults to the number of cores")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    digraphs = digraph_counts(args.corpus)
+    settings = {"restarts": args.restarts, "min_iters": args.min_iters, "max_iters": args.max_iters, "seed": args.seed, "backend": args.backend}
+    if args.backend == "c":
+        hmm_backend.load_library() # Build the library once, rather than in every worker
+    # Workers start with empty instrumentation totals, and send theirs back with each chunk.
+    with Pool(args.processes or os.cpu_count(), initializer=instrumentation.reset) as pool:
+        for text_length in args.lengths:
+            file_name = os.path.join(args.directory, "text_length_" + str(text_length) + ".txt")
+            [recovery_rate, letter_accuracy, samples_per_second, baseline_rate] = recover_file(file_name, text_length, args.samples, digraphs,
+                                                                                               settings, pool, args.chunk_size)
+            print("Text length " + str(text_length) + ": recovered " + str(round(100 * recovery_rate, 1)) + "% of keys, "
+                  + str(round(100 * letter_accuracy, 1)) + "% of letters mapped correctly, " + str(round(samples_per_second, 1)) + " samples/second"
+                  + " (unigram baseline recovered " + str(round(100 * baseline_rate, 1)) + "%)")
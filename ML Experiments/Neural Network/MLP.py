@@ -1,18 +1,30 @@
 """
 Builds a multi-layer perceptron classifier using our cipher data from ../../Data in order to classify
-a ciphertext to belong to a particular cipher. Uses sklearn MLPClassifier. It's currently commented
-out, but it's possible to train a model using different ciphertext statistics... below is code that
-will allow the model to be trained on monogram (default), bigram, trigram, or all three, statistics.
+a ciphertext to belong to a particular cipher. Uses sklearn MLPClassifier. It's possible to train a
+model using different ciphertext statistics... set ngram_sizes below to train the model on monogram
+(default), bigram, trigram, or all three, statistics. They're computed (as sparse matrices) by ../features.py.
+Set hmm_models to also give the model the score of each ciphertext under HMMs of English (see ../HMM/HMM.c).
 
 __author__ = "Aaron Smith"
 __date__ = "11/25/2019"
 """
 
+import sys
 from sklearn.neural_network import MLPClassifier
+sys.path.append("..") # For data_loader.py, feature_cache.py and model_store.py
+sys.path.append("../../Results") # For results_store.py
+sys.path.append("../../Benchmarks") # For instrumentation.py
+import data_loader
+import feature_cache
+import instrumentation
+import model_store
+import results_store
 
 text_length = 1000 # How many characters in each ciphertext sample (options include 100, 200, 300, 500, 1000)
 number_of_samples = 5000 # Total number of ciphertext samples to consider
-number_of_data_points = 26# + (26*26) + (26*26*26) # Size of each vector representing each sample
+seed = 0 # Seed for randomly choosing which samples are used for training and which for scoring
+ngram_sizes = [1] # Which statistics to use: [1] = monogram, [2] = bigram, [3] = trigram, [1, 2, 3] = all three
+hmm_models = [] # HMM model files (written by ../HMM/HMM.c -o) to add scores of, e.g. ["../HMM/english_2_states.txt"]
 
 file_names = [] # To keep track of all our data files
 file_names.append("../../Data/Columnar Transposition Cipher/text_length_" + str(text_length) + ".txt")
@@ -22,67 +34,31 @@ file_names.append("../../Data/Hill Cipher/text_length_" + str(text_length) + ".t
 file_names.append("../../Data/Vigenere Cipher/text_length_" + str(text_length) + ".txt")
 
 
-inputs = [] # To keep track of all our data file inputs
-for file_name in file_names:
-     inputs.append(open(file_name, "r"))
-
-# Initialize our data sets
-training_data = [[0 for i in range(number_of_data_points)] for j in range(number_of_samples)]
-scoring_data = [[0 for i in range(number_of_data_points)] for j in range(number_of_samples)]
-
-# First fill our training set. Each data file will get the same number of vectors in our data sets.
-# For now, our two data sets will be filled using character counts.
-samples_per_file = int(number_of_samples / len(inputs)) # How many samples to grab from each file
-i = 0
-for file_input in inputs:
-    j = 0
-    while (j != samples_per_file):
-        line = file_input.readline()
-        ciphertext = line[:text_length]
-        prevChar = 0
-        middleChar = 0
-        for char in ciphertext:
-            training_data[i][ord(char) - 97] += 1
-            """
-            if middleChar != 0:
-                training_data[i][((ord(middleChar) - 96) * (ord(char) - 96)) + (26) - 1] += 1
-                if prevChar != 0:
-                    training_data[i][((ord(prevChar) - 96) * (ord(middleChar) - 96) * (ord(char) - 96)) + (26) + (26*26) + - 1] += 1
-            prevChar = middleChar
-            middleChar = char
-            """
-        i += 1
-        j += 1
-i = 0
-# Then fill our scoring set (using different data).
-for file_input in inputs:
-    j = 0
-    while (j != samples_per_file):
-        line = file_input.readline()
-        ciphertext = line[:text_length]
-        prevChar = 0
-        middleChar = 0
-        for char in ciphertext:
-            scoring_data[i][ord(char) - 97] += 1
-            """
-            if middleChar != 0:
-                scoring_data[i][((ord(middleChar) - 96) * (ord(char) - 96)) + (26) + - 1] += 1
-                if prevChar != 0:
-                    scoring_data[i][((ord(prevChar) - 96) * (ord(middleChar) - 96) * (ord(char) - 96)) + (26) + (26*26) +  - 1] += 1
-            prevChar = middleChar
-            middleChar = char
-            """
-        i += 1
-        j += 1
+# Randomly choose our training set and our scoring set (using different data). Each data file will get the
+# same number of vectors in our data sets. Our two data sets will be filled using the n-gram counts from ngram_sizes.
+# The matrices are cached (see ../feature_cache.py), so the data files are only read again if they change.
+samples_per_file = int(number_of_samples / len(file_names)) # How many samples to grab from each file
+[training_lines, scoring_lines] = data_loader.stratified_split(file_names, samples_per_file, samples_per_file, seed)
+training_data = feature_cache.load_features(file_names, text_length, training_lines, ngram_sizes, hmm_models)
+scoring_data = feature_cache.load_features(file_names, text_length, scoring_lines, ngram_sizes, hmm_models)
 
 # Now fill our classifications list. This contains the corresponding classifications for our data vectors
 # in our training and scoring sets. Each type of vector will get a different classifying value corresponding
 # to it's cipher.
 classifications = []
-for j in range(len(inputs)):
+for j in range(len(file_names)):
     classifications += [j for i in range(samples_per_file)]
 
 # Now build our mlp model, and test the accuracy of the scoring set.
 model = MLPClassifier()
-model.fit(training_data, classifications)
-print(model.score(scoring_data, classifications))
+with instrumentation.profiled("mlp.fit") as fit_timer:
+    model.fit(training_data, classifications)
+with instrumentation.timer("mlp.score") as score_timer:
+    score = model.score(scoring_data, classifications)
+print(score)
+
+# Save the model so it can be used again without retraining (see ../model_store.py and ../classification_service.py).
+model_store.save_model(model, "mlp", text_length, ngram_sizes, hmm_models=hmm_models, score=score, number_of_samples=number_of_samples, seed=seed)
+
+# Record the result, along with what it cost, for graphing (see ../../Results/results_store.py and ../../Results/CreateGraph.py).
+results_store.record_result("mlp", text_length, number_of_samples, score, fit_timer.seconds, score_timer.seconds, ngram_sizes, notes="seed=" + str(seed), hmm_models=hmm_models)
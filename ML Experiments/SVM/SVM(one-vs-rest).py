@@ -1,4 +1,3 @@
-
 """
 Trains an SVM based on our cipher data from ../../Data using sklearn. Instead of using one SVM for
 multi-class classification (as is done in ./SVM.py), this builds one svm for each class, each svm
@@ -6,302 +5,200 @@ is trained as one vs rest (e.g. shift cipher vs all the other ciphers). While th
 in ./SVM.py performs with similar accuracy (and is also constructed much easier), building multiple
 SVM's this way can reveal which classes (ciphers) an SVM performs well on, and which one's it
 doesn't. In order to build all these SVM's in a timely manner, the work is split between multiple
-processes (and I admit, the code for this section looks a little ugly).
+processes. The data is read and featurized once, and the training set is put in shared memory,
+so every process trains on the same copy of it. Each process returns its fitted SVM directly,
+along with the length of the SVM's weight vector, which is needed to compare the SVMs' margins.
 
 __author__ = "Aaron Smith"
 __date__ = "11/25/2019"
 """
 
 from sklearn import svm
-from multiprocessing import Process, Manager
+from multiprocessing import Pool, shared_memory
 import numpy as np
-import random
+import os
+import sys
+sys.path.append("..") # For data_loader.py, feature_cache.py and features.py
+sys.path.append("../../Results") # For results_store.py
+sys.path.append("../../Benchmarks") # For instrumentation.py
+import data_loader
+import feature_cache
+import features
+import instrumentation
+import results_store
 
 text_length = 1000
-number_of_samples = 5000 # i.e. number of vectors (must be divisible by 1 + len(positive_cipher_file_names))
-number_of_data_points = 26 # i.e. height of vector
+number_of_samples = 5000 # i.e. number of vectors (must be divisible by the number of ciphers)
+seed = 0 # Seed for randomly choosing which samples are used for training and which for scoring
+
+# The ciphers (classes) to build an SVM for, one data file each. Any number of them can be used.
+ciphers = ["columnar", "shift", "playfair", "hill", "vigenere"]
+file_names = {
+    "columnar": "../../Data/Columnar Transposition Cipher/text_length_" + str(text_length) + ".txt",
+    "shift": "../../Data/Shift Cipher/text_length_" + str(text_length) + ".txt",
+    "playfair": "../../Data/Playfair Cipher/text_length_" + str(text_length) + ".txt",
+    "hill": "../../Data/Hill Cipher/text_length_" + str(text_length) + ".txt",
+    "vigenere": "../../Data/Vigenere Cipher/text_length_" + str(text_length) + ".txt",
+}
+
+# Set in each worker process by attach_training_set()
+training_memory = None
+training_set = None
+training_classifications = None
+
+
+def attach_training_set(shared_memory_name, shape, classifications):
+    """
+    Function to give a worker process access to the training set in shared memory. Used as the
+    initializer of the process pool.
 
-print("Text length: " + str(text_length))
-print("Number of samples: " + str(number_of_samples))
+    Args:
+        shared_memory_name: Name of the SharedMemory block holding the training set
+        shape: Shape of the training set
+        classifications: Which cipher (index into ciphers) each row of the training set is
+    """
+    global training_memory, training_set, training_classifications
+    training_memory = shared_memory.SharedMemory(name=shared_memory_name)
+    training_set = np.ndarray(shape, dtype=np.float64, buffer=training_memory.buf)
+    training_classifications = classifications
 
-def get_data(text_length, number_of_samples, number_of_data_points, positive_cipher_file_names, negative_cipher_file_name):
+
+def weight_norm(svm_model):
     """
-    Function to read data from some files and process it in order to train and score an SVM.
-    In general, SVM generates a binary classifier. For our purposes, we want a multi-class
-    classification. There are different ways to do this, in this file, we do it by generating
-    a one-vs-all classification. This means that our positive data set will be obtained from
-    multiple sources, while our negative set from one file. This can then be used to
-    score a ciphertext, either as negative or positive. If it's positive, then more testing
-    needs to be done to determine what category in the positive section it falls into.
+    Function to get the length of an SVM's weight vector w (in its kernel's feature space). The
+    decision function is f(x) = w . phi(x) + b, so |w|^2 = sum over the support vectors of
+    dual_coef * (f(support vector) - b).
 
     Args:
-        text_length: The length of the ciphertext (options include 100, 200, 300, 500, 1000)
-        number_of_samples: How many ciphertexts to use
-        number_of_data_points: Should be 26, data just looks at letter frequency counts, thus 26 letters
-        positive_cipher_file_names: Names of the files to be used for the positive classification
-        negative_cipher_file_name: Name of the file to be used for the negative classification
+        svm_model: A fitted binary SVM
     """
-    # Open our data files to be read from
-    positive_cipher_inputs = []
-    for file_name in positive_cipher_file_names:
-         positive_cipher_inputs.append(open(file_name, "r"))
-    negative_cipher_input = open(negative_cipher_file_name, "r")
-
-    # Initialize our data sets
-    training_set = [[0 for i in range(number_of_data_points)] for j in range(number_of_samples)]
-    scoring_set = [[0 for i in range(number_of_data_points)] for j in range(number_of_samples)]
-
-    # Now fill our data sets from our data files. Use character counts for data points in the vectors.
-    # Each file will contribute the same number of vectors in our data sets. (e.g., if there are 5 total files,
-    # and number_of_samples = 1000, then each file will contribute 200 vectors, regardless if positive or negative).
-    positive_ratio = len(positive_cipher_inputs) / (len(positive_cipher_inputs) + 1) # Percentage of our input files that are positive
-    i = 0
-    for file_input in positive_cipher_inputs:
-        j = 0
-        while (j != (number_of_samples * positive_ratio) / len(positive_cipher_inputs)):
-            line = file_input.readline()
-            ciphertext = line[:text_length]
-            for char in ciphertext:
-                training_set[i][ord(char) - 97] += 1
-            i += 1
-            j += 1
-    # Fill last (negative) part of training set
-    while (i != number_of_samples):
-        line = negative_cipher_input.readline()
-        ciphertext = line[:text_length]
-        for char in ciphertext:
-            training_set[i][ord(char) - 97] += 1
-        i += 1
-    # Fill first (positive) part of scoring set
-    i = 0
-    for file_input in positive_cipher_inputs:
-        j = 0
-        while (j != (number_of_samples * positive_ratio) / len(positive_cipher_inputs)):
-            line = file_input.readline()
-            ciphertext = line[:text_length]
-            for char in ciphertext:
-                scoring_set[i][ord(char) - 97] += 1
-            i += 1
-            j += 1
-    # Fill last (negative) part of scoring set
-    while (i != number_of_samples):
-        line = negative_cipher_input.readline()
-        ciphertext = line[:text_length]
-        for char in ciphertext:
-            scoring_set[i][ord(char) - 97] += 1
-        i += 1
-    # First half of our rows are classified as positive, i.e. 1. The rest is classified as -1.
-    classifications = [1 for i in range(int(number_of_samples * positive_ratio))] + [-1 for i in range(number_of_samples - int(number_of_samples * positive_ratio))]
-    return [training_set, scoring_set, classifications]
-
-
-def generate_svm_model(positive_cipher_file_names, negative_cipher_file_name, svm_models, name):
+    return np.sqrt(svm_model.dual_coef_[0] @ (svm_model.decision_function(svm_model.support_vectors_) - svm_model.intercept_[0]))
+
+
+def generate_svm_model(cipher_index):
     """
-    Function to generate an SVM model using the get_data() function to determine what
-    data to generate it with. Meant to be run by multiple processes.
+    Function to train an SVM that classifies a ciphertext as either belonging to one cipher
+    (classified as 1) or to any of the others (classified as -1). Meant to be run by multiple
+    processes, on the training set attached by attach_training_set(). Returns a list containing
+    the fitted SVM and its weight_norm().
 
     Args:
-        positive_cipher_file_names: Names of the files to be used for the positive classification
-        negative_cipher_file_name: Name of the file to be used for the negative classification
-        svm_models: A dictionary that is used to pass data back to the parent process
-        name: Name of the svm, used as a key into svm_models.
+        cipher_index: Index (into ciphers) of the cipher to classify against the rest
     """
-    [training_set, scoring_set, classifications] = get_data(text_length, number_of_samples, number_of_data_points, positive_cipher_file_names, negative_cipher_file_name)
+    classifications = np.where(training_classifications == cipher_index, 1, -1)
     svm_model = svm.SVC(kernel="poly", gamma="auto")
     svm_model.fit(training_set, classifications)
-    #print(svm_model)
-    print(name + " Accuracy: " + str(svm_model.score(scoring_set, classifications)))
-    svm_models[name] = svm_model
-    return svm_model
-
-
-# Below here is a monstrosity that will generate various svm models in parallel using multiprocessing
-
-processes = []
-manager = Manager()
-svm_models = manager.dict()
-
-
-positive_cipher_file_names = []
-positive_cipher_file_names.append("../../Data/Shift Cipher/text_length_" + str(text_length) + ".txt")
-positive_cipher_file_names.append("../../Data/Columnar Transposition Cipher/text_length_" + str(text_length) + ".txt")
-positive_cipher_file_names.append("../../Data/Playfair Cipher/text_length_" + str(text_length) + ".txt")
-positive_cipher_file_names.append("../../Data/Hill Cipher/text_length_" + str(text_length) + ".txt")
-negative_cipher_file_name = "../../Data/Vigenere Cipher/text_length_" + str(text_length) + ".txt"
-process = Process(target = generate_svm_model, args = (positive_cipher_file_names, negative_cipher_file_name, svm_models, "svm_model_vigenere_vs_rest"))
-process.start()
-processes.append(process)
-
-positive_cipher_file_names = []
-positive_cipher_file_names.append("../../Data/Shift Cipher/text_length_" + str(text_length) + ".txt")
-positive_cipher_file_names.append("../../Data/Vigenere Cipher/text_length_" + str(text_length) + ".txt")
-positive_cipher_file_names.append("../../Data/Playfair Cipher/text_length_" + str(text_length) + ".txt")
-positive_cipher_file_names.append("../../Data/Hill Cipher/text_length_" + str(text_length) + ".txt")
-negative_cipher_file_name = "../../Data/Columnar Transposition Cipher/text_length_" + str(text_length) + ".txt"
-process = Process(target = generate_svm_model, args = (positive_cipher_file_names, negative_cipher_file_name, svm_models, "svm_model_columnar_vs_rest"))
-process.start()
-processes.append(process)
-
-positive_cipher_file_names = []
-positive_cipher_file_names.append("../../Data/Columnar Transposition Cipher/text_length_" + str(text_length) + ".txt")
-positive_cipher_file_names.append("../../Data/Vigenere Cipher/text_length_" + str(text_length) + ".txt")
-positive_cipher_file_names.append("../../Data/Playfair Cipher/text_length_" + str(text_length) + ".txt")
-positive_cipher_file_names.append("../../Data/Hill Cipher/text_length_" + str(text_length) + ".txt")
-negative_cipher_file_name = "../../Data/Shift Cipher/text_length_" + str(text_length) + ".txt"
-process = Process(target = generate_svm_model, args = (positive_cipher_file_names, negative_cipher_file_name, svm_models, "svm_model_shift_vs_rest"))
-process.start()
-processes.append(process)
+    return [svm_model, weight_norm(svm_model)]
 
-"""
-positive_cipher_file_names = []
-positive_cipher_file_names = []
-positive_cipher_file_names.append("../../Data/Vigenere Cipher/text_length_" + str(text_length) + ".txt")
-negative_cipher_file_name = "../../Data/Shift Cipher/text_length_" + str(text_length) + ".txt"
-process = Process(target = generate_svm_model, args = (positive_cipher_file_names, negative_cipher_file_name, svm_models, "svm_model_shift_vs_vigenere"))
-process.start()
-processes.append(process)
-"""
 
-positive_cipher_file_names = []
-positive_cipher_file_names.append("../../Data/Columnar Transposition Cipher/text_length_" + str(text_length) + ".txt")
-positive_cipher_file_names.append("../../Data/Vigenere Cipher/text_length_" + str(text_length) + ".txt")
-positive_cipher_file_names.append("../../Data/Playfair Cipher/text_length_" + str(text_length) + ".txt")
-positive_cipher_file_names.append("../../Data/Shift Cipher/text_length_" + str(text_length) + ".txt")
-negative_cipher_file_name =  "../../Data/Hill Cipher/text_length_" + str(text_length) + ".txt"
-process = Process(target = generate_svm_model, args = (positive_cipher_file_names, negative_cipher_file_name, svm_models, "svm_model_hill_vs_rest"))
-process.start()
-processes.append(process)
-
-positive_cipher_file_names = []
-positive_cipher_file_names.append("../../Data/Columnar Transposition Cipher/text_length_" + str(text_length) + ".txt")
-positive_cipher_file_names.append("../../Data/Vigenere Cipher/text_length_" + str(text_length) + ".txt")
-positive_cipher_file_names.append("../../Data/Shift Cipher/text_length_" + str(text_length) + ".txt")
-positive_cipher_file_names.append("../../Data/Hill Cipher/text_length_" + str(text_length) + ".txt")
-negative_cipher_file_name = "../../Data/Playfair Cipher/text_length_" + str(text_length) + ".txt"
-process = Process(target = generate_svm_model, args = (positive_cipher_file_names, negative_cipher_file_name, svm_models, "svm_model_playfair_vs_rest"))
-process.start()
-processes.append(process)
-
-# Wait for processes to finish
-for process in processes:
-    process.join()
-svm_model_vigenere_vs_rest = svm_models["svm_model_vigenere_vs_rest"]
-svm_model_columnar_vs_rest = svm_models["svm_model_columnar_vs_rest"]
-svm_model_shift_vs_rest = svm_models["svm_model_shift_vs_rest"]
-#svm_model_shift_vs_vigenere = svm_models["svm_model_shift_vs_vigenere"]
-svm_model_hill_vs_rest = svm_models["svm_model_hill_vs_rest"]
-svm_model_playfair_vs_rest = svm_models["svm_model_playfair_vs_rest"]
-
-
-
-# Now that we have our SVM models, let's see if we can use them to correctly tell which cipher each ciphertext corresponds with.
-class type: # Use this as an ENUM
-    COLUMNAR = 0
-    SHIFT = 1
-    PLAYFAIR = 2
-    HILL = 3
-    VIGENERE = 4
-    OTHER = 5
-
-def determine_cipher(ciphertext):
+def generate_svm_models(training_data, classifications, processes=None):
     """
-    Function that uses our trained SVM models to attempt to classify the ciphertext as
-    belonging to a shift cipher (returns 2), vigenere cipher (returns 1), or a
-    columnar transposition cipher (returns 0).
+    Function to train one one-vs-rest SVM per cipher, in parallel. The training data is copied
+    into shared memory once, and every process trains on it from there. Returns a list containing
+    the SVM for each cipher and the weight_norm() of each SVM.
 
     Args:
-        ciphertext: The ciphertext to analyze
+        training_data: Training set (number of samples x number of data points)
+        classifications: Which cipher (index into ciphers) each row of the training set is
+        processes: Number of processes to use (defaults to one per cipher, at most one per core)
     """
-    # Put ciphertext into a list of character counts.
-    test_matrix = [0 for i in range(number_of_data_points)]
-    for char in ciphertext:
-        test_matrix[ord(char) - 97] += 1
-    # Now use predict() method using our trained SVM models.
-    if (svm_model_columnar_vs_rest.predict([test_matrix]) == [-1]):
-        return type.COLUMNAR
-    elif (svm_model_shift_vs_rest.predict([test_matrix]) == [-1]):
-        return type.SHIFT
-    elif (svm_model_playfair_vs_rest.predict([test_matrix]) == [-1]):
-        return type.PLAYFAIR
-    elif (svm_model_hill_vs_rest.predict([test_matrix]) == [-1]):
-        return type.HILL
-    elif (svm_model_vigenere_vs_rest.predict([test_matrix]) == [-1]):
-        return type.VIGENERE
-    else:
-        # If none of the svm's classify it as one of our ciphertexts, then it is most likely vigenere,
-        # since vigenere cipher is the most common one to not be classified correctly.
-        return type.VIGENERE
-
-
-count = 100
-accuracies = []
-
-# Test columnar transposition cipher detection
-file_input = open("../../Data/Columnar Transposition Cipher/text_length_" + str(text_length) + ".txt", "r")
-for j in range(random.randint(number_of_samples, number_of_samples * 2)):
-    file_input.readline()
-file_input.readline()
-count_correct = 0
-for i in range(count):
-    if (determine_cipher(file_input.readline()[:text_length]) == type.COLUMNAR):
-        count_correct += 1
-accuracies.append(count_correct / count)
-print("Percentage correctly classified as columnar: " + str(count_correct / count))
-
-# Test shift cipher detection
-file_input = open("../../Data/Shift Cipher/text_length_" + str(text_length) + ".txt", "r")
-for j in range(random.randint(number_of_samples, number_of_samples * 2)):
-    file_input.readline()
-file_input.readline()
-count_correct = 0
-for i in range(count):
-    if (determine_cipher(file_input.readline()[:text_length]) == type.SHIFT):
-        count_correct += 1
-accuracies.append(count_correct / count)
-print("Percentage correctly classified as shift: " + str(count_correct / count))
-
-# Test playfair cipher detection
-file_input = open("../../Data/Playfair Cipher/text_length_" + str(text_length) + ".txt", "r")
-for j in range(random.randint(number_of_samples, number_of_samples * 2)):
-    file_input.readline()
-file_input.readline()
-count_correct = 0
-for i in range(count):
-    if (determine_cipher(file_input.readline()[:text_length]) == type.PLAYFAIR):
-        count_correct += 1
-accuracies.append(count_correct / count)
-print("Percentage correctly classified as playfair: " + str(count_correct / count))
-
-# Test hill cipher detection
-file_input = open("../../Data/Hill Cipher/text_length_" + str(text_length) + ".txt", "r")
-for j in range(random.randint(number_of_samples, number_of_samples * 2)):
-    file_input.readline()
-file_input.readline()
-count_correct = 0
-for i in range(count):
-    if (determine_cipher(file_input.readline()[:text_length]) == type.HILL):
-        count_correct += 1
-accuracies.append(count_correct / count)
-print("Percentage correctly classified as hill: " + str(count_correct / count))
-
-# Test vigenere cipher detection
-file_input = open("../../Data/Vigenere Cipher/text_length_" + str(text_length) + ".txt", "r")
-for j in range(random.randint(number_of_samples, number_of_samples * 2)):
-    file_input.readline()
-file_input.readline()
-count_correct = 0
-for i in range(count):
-    if (determine_cipher(file_input.readline()[:text_length]) == type.VIGENERE):
-        count_correct += 1
-accuracies.append(count_correct / count)
-print("Percentage correctly classified as vigenere: " + str(count_correct / count))
-
-print("average: " + str(sum(accuracies) / 5))
-
-
-# This is testing for something else
-"""
-file_input = open("../ciphers_to_test.txt", "r")
-for file in file_input:
-    print(determine_cipher(file[5:105].rstrip()))
-"""
+    training_data = np.asarray(training_data, dtype=np.float64) # SVC trains on float64, so convert once here
+    classifications = np.asarray(classifications)
+    number_of_ciphers = int(classifications.max()) + 1
+    memory = shared_memory.SharedMemory(create=True, size=max(training_data.nbytes, 1))
+    try:
+        np.ndarray(training_data.shape, dtype=np.float64, buffer=memory.buf)[:] = training_data
+        processes = processes or min(number_of_ciphers, os.cpu_count())
+        with Pool(processes, initializer=attach_training_set, initargs=(memory.name, training_data.shape, classifications)) as pool:
+            results = pool.map(generate_svm_model, range(number_of_ciphers))
+    finally:
+        memory.close()
+        memory.unlink()
+    return [[svm_model for [svm_model, norm] in results], [norm for [svm_model, norm] in results]]
+
+
+def cipher_margins(test_matrices, svm_models, weight_norms):
+    """
+    Function to get how strongly each of our SVM models classifies each ciphertext as its cipher.
+    Returns a (number of ciphertexts x number of ciphers) array of the signed distances from each
+    SVM's decision boundary, where positive means the SVM thinks the ciphertext is its cipher.
+    decision_function() values are divided by the SVM's weight_norm(), since otherwise they're on a
+    different scale for each SVM and can't be compared.
+
+    Args:
+        test_matrices: Character counts of the ciphertexts (number of ciphertexts x number of data points)
+        svm_models: One-vs-rest SVM for each cipher
+        weight_norms: weight_norm() of each SVM (from generate_svm_models())
+    """
+    # One decision_function() call per SVM for the whole batch.
+    return np.column_stack([svm_model.decision_function(test_matrices) / norm for [svm_model, norm] in zip(svm_models, weight_norms)])
+
+
+def determine_ciphers(test_matrices, svm_models, weight_norms):
+    """
+    Function that uses our trained SVM models to attempt to classify a batch of ciphertexts as
+    belonging to one of our ciphers. Each ciphertext is classified as the cipher whose SVM has
+    the largest margin for it, so it always gets a cipher (even if no SVM or more than one SVM
+    classified it as theirs). Returns an array with the index (into ciphers) of each cipher.
+
+    Args:
+        test_matrices: Character counts of the ciphertexts (number of ciphertexts x number of data points)
+        svm_models: One-vs-rest SVM for each cipher
+        weight_norms: weight_norm() of each SVM (from generate_svm_models())
+    """
+    return cipher_margins(test_matrices, svm_models, weight_norms).argmax(axis=1)
+
+
+def classify_ciphertexts(ciphertexts, svm_models, weight_norms, text_length=text_length):
+    """
+    Function to classify a batch of ciphertexts (e.g. intercepted texts) with our SVM models. All of
+    the ciphertexts are featurized in one pass and then classified with determine_ciphers(). Returns
+    a list with the name of the cipher each ciphertext was classified as.
+
+    Args:
+        ciphertexts: List of ciphertexts (strings), or a 2-D array of their letters (values 0-25)
+        svm_models: One-vs-rest SVM for each cipher
+        weight_norms: weight_norm() of each SVM (from generate_svm_models())
+        text_length: Number of letters of each ciphertext to use (the text length the SVMs were trained on)
+    """
+    if not isinstance(ciphertexts, np.ndarray):
+        ciphertexts = features.prepare_ciphertexts(ciphertexts, text_length)
+    return [ciphers[i] for i in determine_ciphers(features.feature_matrix(ciphertexts), svm_models, weight_norms)]
+
+
+if __name__ == "__main__":
+    print("Text length: " + str(text_length))
+    print("Number of samples: " + str(number_of_samples))
+
+    # Read and featurize our data once. Each cipher gets the same number of vectors in our data sets.
+    cipher_file_names = [file_names[cipher] for cipher in ciphers]
+    samples_per_file = int(number_of_samples / len(ciphers))
+    [training_lines, scoring_lines] = data_loader.stratified_split(cipher_file_names, samples_per_file, samples_per_file, seed)
+    training_data = feature_cache.load_features(cipher_file_names, text_length, training_lines)
+    scoring_data = feature_cache.load_features(cipher_file_names, text_length, scoring_lines)
+    classifications = np.repeat(np.arange(len(ciphers)), samples_per_file)
+
+    with instrumentation.profiled("svm_one_vs_rest.fit") as fit_timer:
+        [svm_models, weight_norms] = generate_svm_models(training_data, classifications)
+    for i, cipher in enumerate(ciphers):
+        print("svm_model_" + cipher + "_vs_rest Accuracy: " + str(svm_models[i].score(scoring_data, np.where(classifications == i, 1, -1))))
+
+    # Now that we have our SVM models, let's see if we can use them to correctly tell which cipher each
+    # ciphertext corresponds with. The whole scoring set is classified at once.
+    with instrumentation.timer("svm_one_vs_rest.predict") as predict_timer:
+        predictions = determine_ciphers(scoring_data, svm_models, weight_norms)
+    accuracies = []
+    for i, cipher in enumerate(ciphers):
+        accuracy = np.mean(predictions[classifications == i] == i)
+        accuracies.append(accuracy)
+        print("Percentage correctly classified as " + cipher + ": " + str(accuracy))
+
+    print("average: " + str(sum(accuracies) / len(accuracies)))
+
+    # Record the result for graphing (see ../../Results/results_store.py), along with one row per cipher for
+    # the "Cipher vs Rest" graph (CreateGraph.py --group-by cipher). The peak memory is only this process's,
+    # not that of the processes that trained the SVMs.
+    results_store.record_result("svm_one_vs_rest", text_length, number_of_samples, sum(accuracies) / len(accuracies), fit_timer.seconds, predict_timer.seconds,
+                                notes="seed=" + str(seed))
+    for cipher, accuracy in zip(ciphers, accuracies):
+        results_store.record_result("svm_one_vs_rest", text_length, number_of_samples, accuracy, notes="seed=" + str(seed), cipher=cipher)
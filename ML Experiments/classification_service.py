@@ -0,0 +1,205 @@
+"""
+A local HTTP service that classifies ciphertexts with one of our saved models (see model_store.py).
+The model is loaded once when the service starts. Requests that arrive at about the same time are
+grouped into micro-batches, so the model is called once per batch rather than once per ciphertext:
+the first waiting request starts a batch, which takes every request that arrives within
+max_wait_ms (or until max_batch_size ciphertexts are waiting), and then featurizes them all at once
+(including any HMM scores, which are vectorized over the whole batch) and classifies them with one
+predict_proba() call. Each request's ciphertexts are checked and converted to letters on its own
+thread, so bad input fails only that request.
+
+Endpoints:
+    POST /classify with {"ciphertexts": ["...", ...]} returns
+        {"predictions": ["shift", ...], "probabilities": [{"columnar": 0.01, ...}, ...]}
+        (empty lists for no ciphertexts), or status 400 with {"error": "..."} if the request is malformed
+    GET /model returns the model's meta.json
+
+Example: python classification_service.py --model knn --port 8000
+         curl -d '{"ciphertexts": ["..."]}' localhost:8000/classify
+
+__author__ = "Aaron Smith"
+__date__ = "10/18/2026"
+"""
+
+import argparse
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import features
+import model_store
+
+
+class MicroBatcher:
+    """
+    Class that collects ciphertexts from many threads and classifies them in batches, on its own thread.
+    """
+
+    def __init__(self, model, meta, max_batch_size=256, max_wait_ms=5):
+        """
+        Args:
+            model: The fitted model
+            meta: The model's meta.json contents
+            max_batch_size: Most ciphertexts to classify in one batch
+            max_wait_ms: Longest time to wait for more requests after the first one of a batch arrives
+        """
+        self.model = model
+        self.meta = meta
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.requests = queue.Queue()
+        self.batches = 0 # Number of batches classified so far
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def classify(self, ciphertexts):
+        """
+        Function to classify some ciphertexts, waiting for the batch they end up in. Returns a list
+        containing the predicted cipher names and the probabilities of each cipher.
+
+        Args:
+            ciphertexts: List of ciphertexts (strings)
+        """
+        if len(ciphertexts) == 0:
+            return [[], []] # Nothing to classify, so don't wait for a batch
+        # Convert to letters here (on the request's thread) so that bad input fails only its own request.
+        # The letters are featurized along with the rest of their batch.
+        letters = features.prepare_ciphertexts(ciphertexts, self.meta["text_length"])
+        result = Future()
+        self.requests.put([letters, result])
+        return result.result()
+
+    def next_batch(self):
+        """
+        Function to wait for requests and return the next batch of them.
+        """
+        batch = [self.requests.get()]
+        size = batch[0][0].shape[0]
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch_size:
+            try:
+                request = self.requests.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                break
+            batch.append(request)
+            size += request[0].shape[0]
+        return batch
+
+    def run(self):
+        """
+        Function to keep classifying batches of requests. Runs on the batcher's thread.
+        """
+        while True:
+            batch = self.next_batch()
+            try:
+                # Every request's letters have the model's text length, so the batch is one letter matrix.
+                feature_matrix = model_store.featurize(np.concatenate([request[0] for request in batch]), self.meta)
+                probabilities = model_store.predict_probabilities(self.model, feature_matrix)
+            except Exception as error:
+                for [letters, result] in batch:
+                    result.set_exception(error)
+                continue
+            self.batches += 1
+            class_names = [self.meta["classes"][int(j)] for j in self.model.classes_]
+            predictions = [class_names[j] for j in probabilities.argmax(axis=1)]
+            start = 0
+            for [letters, result] in batch:
+                stop = start + letters.shape[0]
+                result.set_result([predictions[start:stop], [dict(zip(class_names, row.tolist())) for row in probabilities[start:stop]]])
+                start = stop
+
+
+class ClassificationHandler(BaseHTTPRequestHandler):
+    """
+    Class that handles the HTTP requests of the service. server.batcher is the service's MicroBatcher.
+    """
+
+    def send_json(self, status, body):
+        """
+        Function to send a JSON response.
+
+        Args:
+            status: HTTP status code
+            body: Object to send as JSON
+        """
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/model":
+            self.send_json(200, self.server.batcher.meta)
+        else:
+            self.send_json(404, {"error": "Unknown path " + self.path})
+
+    def do_POST(self):
+        if self.path != "/classify":
+            self.send_json(404, {"error": "Unknown path " + self.path})
+            return
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            if not isinstance(body, dict) or "ciphertexts" not in body:
+                raise ValueError('Expected a JSON object like {"ciphertexts": ["...", ...]}')
+            ciphertexts = body["ciphertexts"]
+            if isinstance(ciphertexts, str):
+                ciphertexts = [ciphertexts]
+            if not isinstance(ciphertexts, list) or not all(isinstance(ciphertext, str) for ciphertext in ciphertexts):
+                raise ValueError('"ciphertexts" must be a string or a list of strings')
+            [predictions, probabilities] = self.server.batcher.classify(ciphertexts)
+        except (ValueError, TypeError) as error:
+            self.send_json(400, {"error": str(error)})
+            return
+        except Exception as error:
+            self.send_json(500, {"error": str(error)})
+            return
+        self.send_json(200, {"predictions": predictions, "probabilities": probabilities})
+
+    def log_message(self, format, *args):
+        pass # Don't print a line for every request
+
+
+class ClassificationServer(ThreadingHTTPServer):
+    """
+    Class for the service's HTTP server. Each request is handled on its own thread, and the listen
+    backlog is raised from the default of 5 so that bursts of connections aren't refused.
+    """
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+def make_server(model_name, version=None, host="127.0.0.1", port=8000, max_batch_size=256, max_wait_ms=5):
+    """
+    Function to load a saved model and create the HTTP server for it (call serve_forever() on it to run it).
+
+    Args:
+        model_name: Name the model was saved under
+        version: Version of the model to use (defaults to the latest)
+        host: Address to listen on
+        port: Port to listen on (0 picks a free one)
+        max_batch_size: Most ciphertexts to classify in one batch
+        max_wait_ms: Longest time to wait for more requests after the first one of a batch arrives
+    """
+    [model, meta] = model_store.load_model(model_name, version)
+    server = ClassificationServer((host, port), ClassificationHandler)
+    server.batcher = MicroBatcher(model, meta, max_batch_size, max_wait_ms)
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Classify ciphertexts over HTTP with a saved model.")
+    parser.add_argument("--model", required=True, help="name the model was saved under (e.g. knn)")
+    parser.add_argument("--version", type=int, default=None, help="defaults to the latest version")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-batch-size", type=int, default=256)
+    parser.add_argument("--max-wait-ms", type=float, default=5)
+    args = parser.parse_args()
+    server = make_server(args.model, args.version, args.host, args.port, args.max_batch_size, args.max_wait_ms)
+    print("Serving model " + args.model + " v" + str(server.batcher.meta["version"]) + " on http://" + args.host + ":" + str(server.server_address[1]))
+    server.serve_forever()
@@ -0,0 +1,146 @@
+"""
+Command line tool that classifies every ciphertext in a file (one per line) with one of our saved
+models (see model_store.py). The file is read in chunks of lines, and each chunk is featurized and
+classified as a batch, optionally on a pool of processes. Results are written as each chunk
+finishes, and only a few chunks are ever in memory at once, so files of any size can be classified.
+
+The output is CSV with one row per input line: the line number, the predicted cipher and the
+probability of each cipher. Lines with fewer letters than the model's text length are written with
+an empty prediction. Lines of our data files can be used as input too, since only the first
+text_length letters of each line are used.
+
+Example: python classify_file.py --model knn ciphers_to_test.txt predictions.csv
+
+__author__ = "Aaron Smith"
+__date__ = "10/18/2026"
+"""
+
+import argparse
+import collections
+import itertools
+import sys
+import time
+from multiprocessing import Pool
+import features
+import model_store
+
+# Set by load_worker_model() (in each pool process, or in this process when no pool is used)
+model = None
+meta = None
+
+
+def load_worker_model(model_name, version):
+    """
+    Function to load the model once per process. Used as the initializer of the process pool.
+
+    Args:
+        model_name: Name the model was saved under
+        version: Version of the model (None for the latest)
+    """
+    global model, meta
+    [model, meta] = model_store.load_model(model_name, version)
+
+
+def classify_chunk(first_line, lines):
+    """
+    Function to classify a chunk of lines. Returns a list containing the CSV rows for the chunk and
+    the number of lines that were classified.
+
+    Args:
+        first_line: Line number of the first line of the chunk
+        lines: The lines of the chunk
+    """
+    [letters, kept] = features.extract_letters(lines, meta["text_length"])
+    class_names = [meta["classes"][int(j)] for j in model.classes_]
+    rows = []
+    if len(letters) > 0:
+        probabilities = model_store.predict_probabilities(model, model_store.featurize(letters, meta))
+        predictions = probabilities.argmax(axis=1)
+    j = 0
+    for i in range(len(lines)):
+        if kept[i]:
+            rows.append(str(first_line + i) + "," + class_names[predictions[j]] + "," + ",".join("%.4f" % p for p in probabilities[j]) + "\n")
+            j += 1
+        else:
+            rows.append(str(first_line + i) + "," + "," * len(class_names) + "\n")
+    return [rows, len(letters)]
+
+
+def read_chunks(file_input, chunk_size):
+    """
+    Function to read a file in chunks of lines. Yields the line number of the first line of each
+    chunk along with the lines.
+
+    Args:
+        file_input: File opened for reading
+        chunk_size: Number of lines per chunk
+    """
+    first_line = 1
+    while True:
+        lines = list(itertools.islice(file_input, chunk_size))
+        if len(lines) == 0:
+            return
+        yield [first_line, lines]
+        first_line += len(lines)
+
+
+def classify_file(model_name, input_file_name, output_file, version=None, chunk_size=10000, processes=1):
+    """
+    Function to classify every line of a file and write the results as CSV. Returns a list containing
+    the number of lines read and the number of them that were classified.
+
+    Args:
+        model_name: Name the model was saved under
+        input_file_name: Name of the file of ciphertexts
+        output_file: File (opened for writing) to write the CSV to
+        version: Version of the model (defaults to the latest)
+        chunk_size: Number of lines to classify at a time
+        processes: Number of processes to classify with (1 classifies in this process)
+    """
+    load_worker_model(model_name, version)
+    output_file.write("line,prediction," + ",".join(meta["classes"][int(j)] for j in model.classes_) + "\n")
+    total_lines = 0
+    total_classified = 0
+    with open(input_file_name, "r", errors="replace") as file_input:
+        chunks = read_chunks(file_input, chunk_size)
+        if processes <= 1:
+            for [first_line, lines] in chunks:
+                [rows, classified] = classify_chunk(first_line, lines)
+                output_file.writelines(rows)
+                total_lines += len(rows)
+                total_classified += classified
+        else:
+            with Pool(processes, initializer=load_worker_model, initargs=(model_name, version)) as pool:
+                # Keep at most two chunks per process in flight, and write the results in order.
+                pending = collections.deque()
+                for chunk in itertools.chain(chunks, [None]):
+                    if chunk is not None:
+                        pending.append(pool.apply_async(classify_chunk, chunk))
+                    while len(pending) > 0 and (chunk is None or len(pending) >= 2 * processes):
+                        [rows, classified] = pending.popleft().get()
+                        output_file.writelines(rows)
+                        total_lines += len(rows)
+                        total_classified += classified
+    return [total_lines, total_classified]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Classify every ciphertext (line) of a file with a saved model.")
+    parser.add_argument("input", help="file with one ciphertext per line")
+    parser.add_argument("output", nargs="?", default="-", help="CSV file to write (defaults to standard output)")
+    parser.add_argument("--model", required=True, help="name the model was saved under (e.g. knn)")
+    parser.add_argument("--version", type=int, default=None, help="defaults to the latest version")
+    parser.add_argument("--chunk-size", type=int, default=10000, help="lines to classify at a time")
+    parser.add_argument("--processes", type=int, default=1, help="processes to classify with")
+    args = parser.parse_args()
+
+    start_time = time.time()
+    output_file = sys.stdout if args.output == "-" else open(args.output, "w")
+    try:
+        [total_lines, total_classified] = classify_file(args.model, args.input, output_file, args.version, args.chunk_size, args.processes)
+    finally:
+        if output_file is not sys.stdout:
+            output_file.close()
+    seconds = time.time() - start_time
+    print("Classified " + str(total_classified) + " of " + str(total_lines) + " texts in " + str(round(seconds, 2)) + "s ("
+          + str(round(total_lines / max(seconds, 1e-9))) + " texts/second)", file=sys.stderr)
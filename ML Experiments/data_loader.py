@@ -0,0 +1,170 @@
+"""
+This file is used to load samples from our data files (../Data/<Cipher>/text_length_N.txt) for the
+experiment scripts. Instead of reading every file sequentially and taking the first samples for
+training and the next ones for scoring, the samples of each file are chosen at random, and only
+those samples are read.
+
+To do that, each data file gets a line index the first time it's used: the byte offset of the
+start of every line, saved next to the data file as text_length_N.line_index.npy (and rebuilt
+whenever the data file is newer). Reading sample i is then a seek to its offset. If the binary
+version of the data file exists (see ../Ciphers/dataset.py), the samples are sliced out of its
+memory-mapped ciphertext matrix instead.
+
+Splits are stratified, i.e. every file (cipher) contributes the same number of samples to both the
+training and the scoring set, and they're seeded, so the same seed always gives the same split.
+
+__author__ = "Aaron Smith"
+__date__ = "10/18/2026"
+"""
+
+import os
+import sys
+import numpy as np
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Ciphers")) # For dataset.py and atomic_file.py
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Benchmarks")) # For instrumentation.py
+import atomic_file
+import dataset
+import instrumentation
+
+block_size = 64 * 1024 ** 2 # Number of bytes of a data file to scan for newlines at a time
+
+
+def line_index_file_name(file_name):
+    """
+    Function to get the name of the line index file that belongs to a data file.
+
+    Args:
+        file_name: Name of the data file
+    """
+    return os.path.splitext(file_name)[0] + ".line_index.npy"
+
+
+def build_line_index(file_name):
+    """
+    Function to find the byte offset of the start of every line in a data file and save them
+    (as an int64 array) to its line index file.
+
+    Args:
+        file_name: Name of the data file
+    """
+    data = np.memmap(file_name, dtype=np.uint8, mode="r") if os.path.getsize(file_name) > 0 else np.zeros(0, dtype=np.uint8)
+    line_starts = [np.zeros(1, dtype=np.int64)]
+    with instrumentation.timer("data_loader.build_line_index"):
+        for start in range(0, len(data), block_size):
+            line_starts.append(np.flatnonzero(data[start:start + block_size] == ord("\n")).astype(np.int64) + start + 1)
+        line_starts = np.concatenate(line_starts)
+    # The last newline ends the file rather than starting another line.
+    if line_starts[-1] == len(data):
+        line_starts = line_starts[:-1]
+
+    atomic_file.write_atomically(line_index_file_name(file_name), lambda index_output: np.save(index_output, line_starts))
+    return line_starts
+
+
+def line_index(file_name):
+    """
+    Function to get the byte offset of the start of every line of a data file, building the line
+    index first if it doesn't exist yet (or is older than the data file).
+
+    Args:
+        file_name: Name of the data file
+    """
+    index_file_name = line_index_file_name(file_name)
+    if not os.path.exists(index_file_name) or os.path.getmtime(index_file_name) < os.path.getmtime(file_name):
+        return build_line_index(file_name)
+    return np.load(index_file_name, mmap_mode="r")
+
+
+def binary_ciphertexts(file_name):
+    """
+    Function to get the memory-mapped ciphertext matrix of a data file's binary version, or None
+    if there isn't an up to date one.
+
+    Args:
+        file_name: Name of the data file
+    """
+    ciphertexts_file_name = dataset.dataset_file_names(file_name)[0]
+    if os.path.exists(ciphertexts_file_name) and os.path.getmtime(ciphertexts_file_name) >= os.path.getmtime(file_name):
+        return np.load(ciphertexts_file_name, mmap_mode="r")
+    return None
+
+
+def number_of_samples(file_name):
+    """
+    Function to get how many samples (lines) a data file has.
+
+    Args:
+        file_name: Name of the data file
+    """
+    return len(line_index(file_name))
+
+
+def read_ciphertexts(file_name, lines, text_length):
+    """
+    Function to read the ciphertexts of some samples of a data file, as a 2-D uint8 array of letters
+    (values 0-25) with one row per sample, in the order given.
+
+    Args:
+        file_name: Name of the data file
+        lines: 1-D array of the samples (lines) to read
+        text_length: Number of characters of ciphertext at the start of each line
+    """
+    lines = np.asarray(lines, dtype=np.int64)
+    instrumentation.count("data_loader.samples_read", len(lines))
+    ciphertexts = binary_ciphertexts(file_name)
+    if ciphertexts is not None and ciphertexts.shape[1] >= text_length:
+        with instrumentation.timer("data_loader.read_binary"):
+            return np.asarray(ciphertexts[lines, :text_length])
+
+    offsets = np.asarray(line_index(file_name))[lines]
+    letters = np.empty((len(lines), text_length), dtype=np.uint8)
+    with instrumentation.timer("data_loader.read_text"), open(file_name, "rb") as file_input:
+        # Read in file order so the disk is read front to back, then put the rows back in the order asked for.
+        for i in np.argsort(offsets, kind="stable"):
+            file_input.seek(offsets[i])
+            letters[i] = np.frombuffer(file_input.read(text_length), dtype=np.uint8)
+    letters -= ord("a")
+    if letters.size > 0 and letters.max() > 25:
+        raise ValueError("Line of " + file_name + " doesn't start with " + str(text_length) + " lowercase letters")
+    return letters
+
+
+def stratified_split(file_names, training_samples_per_file, scoring_samples_per_file, seed=0):
+    """
+    Function to choose random, non-overlapping training and scoring samples from each data file.
+    Returns a list containing the training lines and the scoring lines, each of which is a list
+    with a (sorted) 1-D array of lines for each data file.
+
+    Args:
+        file_names: Names of the data files (one per class)
+        training_samples_per_file: Number of training samples to take from each file
+        scoring_samples_per_file: Number of scoring samples to take from each file
+        seed: Seed for choosing the samples
+    """
+    rng = np.random.default_rng(seed)
+    training_lines = []
+    scoring_lines = []
+    for file_name in file_names:
+        available = number_of_samples(file_name)
+        if training_samples_per_file + scoring_samples_per_file > available:
+            raise ValueError(file_name + " only has " + str(available) + " samples")
+        lines = rng.choice(available, training_samples_per_file + scoring_samples_per_file, replace=False)
+        training_lines.append(np.sort(lines[:training_samples_per_file]))
+        scoring_lines.append(np.sort(lines[training_samples_per_file:]))
+    return [training_lines, scoring_lines]
+
+
+def load_samples(file_names, lines_per_file, text_length):
+    """
+    Function to read the chosen samples of every data file. Returns a list containing a 2-D uint8
+    array of letters (the samples of each file, in order) and a 1-D array of their classifications,
+    where the samples of file j are classified as j.
+
+    Args:
+        file_names: Names of the data files (one per class)
+        lines_per_file: List with a 1-D array of lines to read for each data file
+        text_length: Number of characters of ciphertext at the start of each line
+    """
+    letters = [read_ciphertexts(file_name, lines, text_length) for file_name, lines in zip(file_names, lines_per_file)]
+    classifications = np.concatenate([np.full(len(lines), j) for j, lines in enumerate(lines_per_file)])
+    return [np.concatenate(letters), classifications]
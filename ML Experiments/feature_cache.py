@@ -0,0 +1,185 @@
+"""
+This file is used to cache the feature matrices that our experiment scripts train and score on, so
+that rerunning a script (e.g. after changing a classifier's hyperparameters) goes straight to fit()
+without re-reading the data files or recounting anything.
+
+Each cached matrix is keyed by the contents of the data files it was computed from (a sha1 hash
+of each file), the text length, the feature set and which samples were used (see data_loader.py).
+A file's hash is remembered along with its size and modification time, so the file is only read
+again when it changes. Matrices are stored as .npy files (one for dense matrices, and one for each of the data,
+indices and indptr arrays of sparse matrices) and are loaded with np.load(mmap_mode="r").
+
+The cache lives in ./.feature_cache. Whenever it grows past max_cache_size bytes, the least
+recently used entries are deleted.
+
+__author__ = "Aaron Smith"
+__date__ = "10/18/2026"
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+import numpy as np
+import scipy.sparse
+import data_loader
+import features
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Ciphers")) # For atomic_file.py
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Benchmarks")) # For instrumentation.py
+import atomic_file
+import instrumentation
+
+cache_directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".feature_cache")
+max_cache_size = 4 * 1024 ** 3 # Total bytes to keep in the cache before evicting entries
+hashes_file_name = os.path.join(cache_directory, "file_hashes.json")
+
+
+def file_hash(file_name):
+    """
+    Function to get the sha1 hash of a file's contents. Hashes are remembered (in file_hashes.json)
+    by the file's path, size and modification time, so unchanged files are only hashed once.
+
+    Args:
+        file_name: Name of the file to hash
+    """
+    path = os.path.abspath(file_name)
+    status = os.stat(path)
+    stamp = [status.st_size, status.st_mtime_ns]
+    hashes = {}
+    if os.path.exists(hashes_file_name):
+        with open(hashes_file_name, "r") as hashes_input:
+            hashes = json.load(hashes_input)
+    if path in hashes and hashes[path][:2] == stamp:
+        return hashes[path][2]
+
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as file_input:
+        for block in iter(lambda: file_input.read(1 << 20), b""):
+            sha1.update(block)
+    hashes[path] = stamp + [sha1.hexdigest()]
+    os.makedirs(cache_directory, exist_ok=True)
+    atomic_file.write_atomically(hashes_file_name, lambda hashes_output: hashes_output.write(json.dumps(hashes).encode()))
+    return sha1.hexdigest()
+
+
+def save_matrix(directory, matrix):
+    """
+    Function to write a dense numpy array or a scipy.sparse matrix into a directory as .npy files.
+
+    Args:
+        directory: Directory to write to (must already exist)
+        matrix: The matrix to write
+    """
+    if scipy.sparse.issparse(matrix):
+        matrix = matrix.tocsr()
+        arrays = {"data": matrix.data, "indices": matrix.indices, "indptr": matrix.indptr, "shape": np.array(matrix.shape)}
+    else:
+        arrays = {"dense": np.asarray(matrix)}
+    for name, array in arrays.items():
+        np.save(os.path.join(directory, name + ".npy"), array)
+
+
+def load_matrix(directory):
+    """
+    Function to load a matrix written by save_matrix(). The arrays are memory-mapped rather than read.
+
+    Args:
+        directory: Directory the matrix was written to
+    """
+    if os.path.exists(os.path.join(directory, "dense.npy")):
+        return np.load(os.path.join(directory, "dense.npy"), mmap_mode="r")
+    [data, indices, indptr, shape] = [np.load(os.path.join(directory, name + ".npy"), mmap_mode="r") for name in ["data", "indices", "indptr", "shape"]]
+    return scipy.sparse.csr_matrix((data, indices, indptr), shape=tuple(shape), copy=False)
+
+
+def directory_size(directory):
+    """
+    Function to get the total size in bytes of the files in a directory.
+
+    Args:
+        directory: The directory
+    """
+    return sum(entry.stat().st_size for entry in os.scandir(directory) if entry.is_file())
+
+
+def evict(max_size=None):
+    """
+    Function to delete the least recently used cache entries until the cache is at most max_size bytes.
+
+    Args:
+        max_size: Size to shrink the cache to (defaults to max_cache_size)
+    """
+    max_size = max_cache_size if max_size is None else max_size
+    if not os.path.isdir(cache_directory):
+        return
+    # The modification time of an entry's directory is updated every time it's used.
+    entries = [entry for entry in os.scandir(cache_directory) if entry.is_dir() and not entry.name.endswith(".tmp")]
+    entries.sort(key=lambda entry: entry.stat().st_mtime)
+    total_size = sum(directory_size(entry.path) for entry in entries)
+    for entry in entries:
+        if total_size <= max_size:
+            break
+        total_size -= directory_size(entry.path)
+        shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def cached(key, compute):
+    """
+    Function to get a matrix from the cache, or compute it (and add it to the cache) if it isn't there.
+
+    Args:
+        key: Any JSON serializable description of the matrix, which identifies its cache entry
+        compute: Function (with no arguments) that computes the matrix
+    """
+    name = hashlib.sha1(json.dumps(key, sort_keys=True).encode()).hexdigest()
+    directory = os.path.join(cache_directory, name)
+    if os.path.isdir(directory):
+        os.utime(directory) # Mark the entry as recently used
+        instrumentation.count("feature_cache.hits")
+        with instrumentation.timer("feature_cache.load"):
+            return load_matrix(directory)
+
+    instrumentation.count("feature_cache.misses")
+    matrix = compute()
+    temp_directory = atomic_file.temp_name(directory)
+    os.makedirs(temp_directory, exist_ok=True)
+    save_matrix(temp_directory, matrix)
+    try:
+        os.rename(temp_directory, directory)
+    except OSError:
+        # Another process added the same entry first.
+        shutil.rmtree(temp_directory, ignore_errors=True)
+    evict()
+    return matrix
+
+
+def load_features(file_names, text_length, lines_per_file, ngram_sizes=None, hmm_models=None):
+    """
+    Function to get the feature matrix for the chosen samples of each data file (e.g. from
+    data_loader.stratified_split()), from the cache if possible. With ngram_sizes = None the features
+    are the (dense) unigram counts, otherwise they are the (sparse) counts of features.ngram_features().
+    With hmm_models, they're followed by the score of each sample under each HMM (see features.feature_matrix()).
+
+    Args:
+        file_names: Names of the data files
+        text_length: Number of characters of ciphertext at the start of each line
+        lines_per_file: List with a 1-D array of the samples (lines) to use from each data file
+        ngram_sizes: List of n-gram sizes to count, or None for unigram counts
+        hmm_models: List of HMM model file names (e.g. written by HMM/HMM.c -o) to add scores of, or None
+    """
+    feature_set = "unigram" if ngram_sizes is None else "ngram_" + "_".join(str(n) for n in ngram_sizes)
+    key = {
+        "files": [file_hash(file_name) for file_name in file_names],
+        "text_length": text_length,
+        "feature_set": feature_set,
+        "lines": [hashlib.sha1(np.asarray(lines, dtype=np.int64).tobytes()).hexdigest() for lines in lines_per_file],
+    }
+    if hmm_models:
+        key["hmm_models"] = [file_hash(model_file_name) for model_file_name in hmm_models]
+
+    def compute():
+        [letters, classifications] = data_loader.load_samples(file_names, lines_per_file, text_length)
+        return features.feature_matrix(letters, ngram_sizes, hmm_models)
+
+    return cached(key, compute)
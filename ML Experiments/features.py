@@ -0,0 +1,241 @@
+"""
+This file is used to turn our ciphertexts into the feature vectors that our classifiers are
+trained and scored on. Rather than counting characters one at a time into lists of Python ints,
+the ciphertexts are first converted into a 2-D uint8 array of letters (one row per sample, values
+0-25), and the features for every sample are then computed at once with numpy. The results are
+compact integer numpy arrays (or scipy.sparse CSR matrices for bigram and trigram counts, which are
+mostly zeros), which sklearn takes directly. The counts can also have extra columns with how likely
+each ciphertext is under hidden Markov models of English (e.g. trained by ./HMM/HMM.c).
+
+Scripts in the folders below this one can use it with:
+
+    import sys
+    sys.path.append("..")
+    import features
+
+__author__ = "Aaron Smith"
+__date__ = "10/18/2026"
+"""
+
+import os
+import sys
+import numpy as np
+import scipy.sparse
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Benchmarks")) # For instrumentation.py
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "HMM")) # For hmm_numpy.py
+import instrumentation
+import hmm_numpy
+
+# Number of samples to count at a time. Small enough that the offset letters of a chunk fit in the
+# cache and in uint16 (chunk_size * 26 < 65536), which is about twice as fast as one big bincount.
+chunk_size = 1024
+
+
+def text_to_letters(texts):
+    """
+    Function to convert a list of lowercase strings (all the same length) into a 2-D uint8 array
+    of letters in the range 0-25, one row per string.
+
+    Args:
+        texts: List of strings made up of only lowercase letters
+    """
+    text_length = len(texts[0]) if len(texts) > 0 else 0
+    letters = np.frombuffer("".join(texts).encode("ascii"), dtype=np.uint8) - ord("a")
+    if letters.size != text_length * len(texts):
+        raise ValueError("Ciphertexts are not all the same length")
+    return letters.reshape(len(texts), text_length)
+
+
+def extract_letters(texts, text_length):
+    """
+    Function to turn arbitrary ciphertexts (e.g. intercepted texts, rather than lines of our data
+    files) into the 2-D uint8 array of letters our models take. Each text is lowercased, every
+    character that isn't a letter is dropped and only the first text_length letters are kept. Texts
+    with fewer than text_length letters are left out. Returns a list containing the letters of the
+    texts that were kept and a boolean array saying which texts those are.
+
+    Args:
+        texts: List of strings
+        text_length: Number of letters to keep from each text (the text length the model was trained on)
+    """
+    letters = []
+    kept = np.zeros(len(texts), dtype=bool)
+    for i, text in enumerate(texts):
+        raw = np.frombuffer(text.lower().encode("ascii", "ignore"), dtype=np.uint8)
+        raw = raw[(raw >= ord("a")) & (raw <= ord("z"))][:text_length]
+        if len(raw) == text_length:
+            letters.append(raw)
+            kept[i] = True
+    return [np.array(letters, dtype=np.uint8).reshape(len(letters), text_length) - ord("a"), kept]
+
+
+def prepare_ciphertexts(texts, text_length):
+    """
+    Function to do the same as extract_letters(), but raise a ValueError if any of the texts has
+    fewer than text_length letters.
+
+    Args:
+        texts: List of strings
+        text_length: Number of letters to keep from each text
+    """
+    [letters, kept] = extract_letters(texts, text_length)
+    if not kept.all():
+        raise ValueError("Ciphertext " + str(np.flatnonzero(~kept)[0]) + " has fewer than the " + str(text_length) + " letters needed")
+    return letters
+
+
+def read_ciphertexts(file_input, count, text_length):
+    """
+    Function to read the next count samples from an open data file (e.g. one of
+    ../Data/Shift Cipher/text_length_N.txt) and return their ciphertexts as a 2-D uint8 array.
+
+    Args:
+        file_input: Data file opened for reading
+        count: Number of samples (lines) to read
+        text_length: Number of characters of ciphertext at the start of each line
+    """
+    return text_to_letters([file_input.readline()[:text_length] for i in range(count)])
+
+
+def counts_dtype(text_length):
+    """
+    Function to get the smallest unsigned integer type that can hold a count of up to text_length.
+
+    Args:
+        text_length: Number of letters in each sample
+    """
+    return np.uint16 if text_length <= np.iinfo(np.uint16).max else np.uint32
+
+
+def unigram_counts(letters):
+    """
+    Function to count how many times each letter appears in each sample. Returns a
+    (number of samples x 26) array of counts. Every letter of row i is offset by 26 * i, so a
+    single bincount over all of the letters counts every row at once.
+
+    Args:
+        letters: 2-D array (number of samples x text length) of letters in the range 0-25
+    """
+    letters = np.asarray(letters)
+    [count, text_length] = letters.shape
+    counts = np.empty((count, 26), dtype=counts_dtype(text_length))
+    with instrumentation.timer("features.unigram_counts"):
+        for start in range(0, count, chunk_size):
+            chunk = letters[start:start + chunk_size]
+            offsets = (np.arange(len(chunk), dtype=np.uint16) * 26)[:, None]
+            counts[start:start + len(chunk)] = np.bincount((chunk + offsets).ravel(), minlength=26 * len(chunk)).reshape(len(chunk), 26)
+    return counts
+
+
+def ngram_codes(letters, n):
+    """
+    Function to get the index of every n-gram of every sample, where the n-gram of letters
+    (a, b, c) has index (a * 26 + b) * 26 + c. Returns a (number of samples x (text length - n + 1))
+    array. Trigram indexes go up to 26^3 - 1 = 17575, so uint16 holds them.
+
+    Args:
+        letters: 2-D array (number of samples x text length) of letters in the range 0-25
+        n: Size of the n-grams (1, 2 or 3)
+    """
+    letters = np.asarray(letters)
+    if n < 1 or n > 3:
+        raise ValueError("n-grams must be of size 1, 2 or 3, not " + str(n))
+    text_length = letters.shape[1]
+    codes = letters[:, :text_length - n + 1].astype(np.uint16)
+    for i in range(1, n):
+        codes = codes * 26 + letters[:, i:text_length - n + 1 + i]
+    return codes
+
+
+def ngram_counts(letters, n):
+    """
+    Function to count how many times each n-gram appears in each sample. Returns a sparse CSR
+    matrix of shape (number of samples x 26^n), built directly from the letters without ever
+    making the dense matrix. Each row's n-gram indexes are sorted, and every run of equal indexes
+    becomes one nonzero entry (the index) whose count is the length of the run.
+
+    Args:
+        letters: 2-D array (number of samples x text length) of letters in the range 0-25
+        n: Size of the n-grams (1, 2 or 3)
+    """
+    letters = np.asarray(letters)
+    count = letters.shape[0]
+    number_of_ngrams = max(letters.shape[1] - n + 1, 0)
+    indices = []
+    data = []
+    runs_per_row = []
+    with instrumentation.timer("features.ngram_counts_" + str(n)):
+        for start in range(0, count, chunk_size):
+            codes = np.sort(ngram_codes(letters[start:start + chunk_size], n), axis=1)
+            new_run = np.ones(codes.shape, dtype=bool)
+            new_run[:, 1:] = codes[:, 1:] != codes[:, :-1]
+            # Runs never cross rows, since the first n-gram of every row always starts a new run.
+            run_starts = np.flatnonzero(new_run)
+            indices.append(codes.ravel()[run_starts])
+            data.append(np.diff(np.append(run_starts, codes.size)).astype(counts_dtype(number_of_ngrams)))
+            runs_per_row.append(new_run.sum(axis=1))
+
+    indptr = np.zeros(count + 1, dtype=np.int64)
+    if count > 0:
+        np.cumsum(np.concatenate(runs_per_row), out=indptr[1:])
+    indices = np.concatenate(indices) if count > 0 else np.zeros(0, dtype=np.uint16)
+    data = np.concatenate(data) if count > 0 else np.zeros(0, dtype=counts_dtype(number_of_ngrams))
+    # scipy wants int32 indexes (int64 only if there are more than 2^31 nonzeros).
+    index_dtype = np.int32 if indptr[-1] < np.iinfo(np.int32).max else np.int64
+    return scipy.sparse.csr_matrix((data, indices.astype(index_dtype), indptr.astype(index_dtype)), shape=(count, 26 ** n))
+
+
+def ngram_features(letters, ngram_sizes):
+    """
+    Function to get the counts of several sizes of n-grams side by side, e.g. ngram_sizes = [1, 2, 3]
+    gives a sparse CSR matrix of shape (number of samples x 26 + 26^2 + 26^3), with the unigram
+    counts first, then the bigram counts and then the trigram counts.
+
+    Args:
+        letters: 2-D array (number of samples x text length) of letters in the range 0-25
+        ngram_sizes: List of the n-gram sizes to use (1, 2 and/or 3)
+    """
+    return scipy.sparse.hstack([ngram_counts(letters, n) for n in ngram_sizes], format="csr")
+
+
+def hmm_scores(letters, model_file_names):
+    """
+    Function to score every sample with each of several hidden Markov models (e.g. ones trained on
+    English text with HMM.c -o). Returns a (number of samples x number of models) float64 array of
+    the log probability of each sample given each model, divided by the text length so that scores
+    of different text lengths are comparable. Plaintext-like ciphertexts (e.g. from transposition
+    ciphers) score much higher than ones whose letters were substituted.
+
+    Args:
+        letters: 2-D array (number of samples x text length) of letters in the range 0-25
+        model_file_names: Names of the model files (see hmm_numpy.read_model())
+    """
+    letters = np.asarray(letters)
+    scores = np.empty((letters.shape[0], len(model_file_names)))
+    with instrumentation.timer("features.hmm_scores"):
+        for j, model_file_name in enumerate(model_file_names):
+            [A, B, Pi, log_prob] = hmm_numpy.read_model(model_file_name)
+            if B.shape[1] != 26:
+                raise ValueError(model_file_name + " has " + str(B.shape[1]) + " observation symbols, not 26")
+            scores[:, j] = hmm_numpy.score(A, B, Pi, letters) / max(letters.shape[1], 1)
+    return scores
+
+
+def feature_matrix(letters, ngram_sizes=None, hmm_models=None):
+    """
+    Function to compute a feature set: the unigram counts (a dense array) or the counts of
+    ngram_features() (a sparse CSR matrix), followed by a column of hmm_scores() per HMM if any
+    are given (the counts are then converted to float64 in the dense case).
+
+    Args:
+        letters: 2-D array (number of samples x text length) of letters in the range 0-25
+        ngram_sizes: List of n-gram sizes to count, or None for unigram counts
+        hmm_models: List of HMM model file names to add scores of, or None
+    """
+    counts = unigram_counts(letters) if ngram_sizes is None else ngram_features(letters, ngram_sizes)
+    if not hmm_models:
+        return counts
+    scores = hmm_scores(letters, hmm_models)
+    if scipy.sparse.issparse(counts):
+        return scipy.sparse.hstack([counts.astype(np.float64), scipy.sparse.csr_matrix(scores)], format="csr")
+    return np.hstack([counts.astype(np.float64), scores])
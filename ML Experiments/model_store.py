@@ -0,0 +1,137 @@
+"""
+This file is used to save our trained models so they can be used again without retraining. Each
+model is saved under a name (e.g. "knn") as a new version every time, in ./Models/<name>/v<N>/:
+
+    model.joblib: The fitted sklearn model
+    meta.json: What the model needs to classify new ciphertexts, i.e. the names of the ciphers it
+        classifies into (in order of its classifications), the text length and the feature set
+        (unigram or n-gram counts, and any HMM scores) it was trained on, along with anything else the training
+        script wants to record (e.g. its score).
+
+__author__ = "Aaron Smith"
+__date__ = "10/18/2026"
+"""
+
+import json
+import os
+import shutil
+import sys
+import time
+import joblib
+import numpy as np
+import features
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Ciphers")) # For atomic_file.py
+import atomic_file
+
+store_directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Models")
+
+# The ciphers our experiment scripts classify into, in the order of their file_names (and so their classifications)
+cipher_names = ["columnar", "shift", "playfair", "hill", "vigenere"]
+
+
+def versions(name):
+    """
+    Function to get the version numbers saved for a model, in increasing order.
+
+    Args:
+        name: Name of the model
+    """
+    directory = os.path.join(store_directory, name)
+    if not os.path.isdir(directory):
+        return []
+    return sorted(int(entry[1:]) for entry in os.listdir(directory) if entry.startswith("v") and entry[1:].isdigit())
+
+
+def save_model(model, name, text_length, ngram_sizes=None, classes=None, hmm_models=None, **metadata):
+    """
+    Function to save a trained model as the next version of name. Returns the directory it was saved to.
+
+    Args:
+        model: The fitted model
+        name: Name to save the model under (e.g. "knn")
+        text_length: Number of characters of ciphertext the model was trained on
+        ngram_sizes: List of n-gram sizes the model was trained on, or None for unigram counts
+        classes: Names of the ciphers, in order of the model's classifications (defaults to cipher_names)
+        hmm_models: List of HMM model files whose scores the model was trained on, or None
+        metadata: Anything else to record in meta.json (e.g. score=0.94)
+    """
+    meta = {
+        "name": name,
+        "classes": list(classes or cipher_names),
+        "text_length": text_length,
+        "ngram_sizes": ngram_sizes,
+        "hmm_models": [os.path.abspath(model_file_name) for model_file_name in hmm_models] if hmm_models else None,
+        "model_type": type(model).__name__,
+        "saved": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    meta.update(metadata)
+    os.makedirs(os.path.join(store_directory, name), exist_ok=True)
+
+    # Write to a temporary directory and then rename it, so that a half saved model is never loaded.
+    # If another process takes the version number first, try the next one.
+    temp_directory = atomic_file.temp_name(os.path.join(store_directory, name, "model"))
+    os.makedirs(temp_directory, exist_ok=True)
+    joblib.dump(model, os.path.join(temp_directory, "model.joblib"))
+    while True:
+        version = (versions(name) or [0])[-1] + 1
+        meta["version"] = version
+        with open(os.path.join(temp_directory, "meta.json"), "w") as meta_output:
+            json.dump(meta, meta_output, indent=4)
+        directory = os.path.join(store_directory, name, "v" + str(version))
+        try:
+            os.rename(temp_directory, directory)
+            return directory
+        except OSError:
+            if not os.path.isdir(directory):
+                shutil.rmtree(temp_directory, ignore_errors=True)
+                raise
+
+
+def load_model(name, version=None):
+    """
+    Function to load a saved model. Returns a list containing the model and its meta.json contents.
+
+    Args:
+        name: Name the model was saved under
+        version: Version number to load (defaults to the latest)
+    """
+    if version is None:
+        if len(versions(name)) == 0:
+            raise FileNotFoundError("No saved versions of model " + name + " in " + store_directory)
+        version = versions(name)[-1]
+    directory = os.path.join(store_directory, name, "v" + str(version))
+    with open(os.path.join(directory, "meta.json"), "r") as meta_input:
+        meta = json.load(meta_input)
+    return [joblib.load(os.path.join(directory, "model.joblib")), meta]
+
+
+def featurize(ciphertexts, meta):
+    """
+    Function to compute the features a saved model expects for a batch of ciphertexts.
+
+    Args:
+        ciphertexts: List of ciphertexts (strings), or a 2-D array of their letters (values 0-25)
+        meta: The model's meta.json contents (from load_model())
+    """
+    if not isinstance(ciphertexts, np.ndarray):
+        ciphertexts = features.prepare_ciphertexts(ciphertexts, meta["text_length"])
+    return features.feature_matrix(ciphertexts, meta["ngram_sizes"], meta.get("hmm_models"))
+
+
+def predict_probabilities(model, feature_matrix):
+    """
+    Function to get the probability of each class for each row of a feature matrix. Models that
+    can't estimate probabilities (e.g. an SVC trained without probability=True) give a probability
+    of 1 to their predicted class.
+
+    Args:
+        model: A fitted model
+        feature_matrix: Features of the ciphertexts (e.g. from featurize())
+    """
+    if hasattr(model, "predict_proba"):
+        try:
+            return model.predict_proba(feature_matrix)
+        except AttributeError:
+            pass # e.g. SVC exposes predict_proba but raises if it was trained without probability=True
+    predictions = model.predict(feature_matrix)
+    return (np.asarray(predictions)[:, None] == model.classes_[None, :]).astype(np.float64)
@@ -1,42 +1,86 @@
 """
-This file is used to create a bar graph using data obtained from various experimental results.
-These results have been hard coded after running various programs in ../ML\ Experiments\.
+This file is used to create bar graphs from the results of our experiments, which the programs in
+../ML\ Experiments\ record in the results database (see ./results_store.py). Accuracy is plotted
+next to cost (seconds spent fitting and predicting), so models can be chosen on accuracy per
+second of computing rather than accuracy alone. Only the latest result of each experiment is used.
+Results are for every cipher together, unless the graph is grouped by cipher (or --cipher is given),
+which uses the results scored on each cipher on its own (e.g. the "Cipher vs Rest" graph).
+
+Example: python CreateGraph.py --group-by classifier --text-length 1000 --samples 25000
+         python CreateGraph.py --group-by text_length --classifier random_forest --output Graphs/RF.png
+         python CreateGraph.py --group-by cipher --classifier svm_one_vs_rest --output Graphs/CipherVsRestAccuracy.png
 
 __author__ = "Aaron Smith"
 __date__ = "11/25/2019"
 """
 
+import argparse
 import matplotlib.pyplot as plot
+import results_store
 
-x_coordinates = [1, 2, 3, 4, 5]
+parser = argparse.ArgumentParser(description="Graph the accuracy and cost of our experiments.")
+parser.add_argument("--group-by", choices=["classifier", "text_length", "samples", "features", "cipher"], default="classifier",
+                    help="what each bar is")
+parser.add_argument("--classifier", help="only use results of this classifier (e.g. knn)")
+parser.add_argument("--text-length", type=int, help="only use results for this text length")
+parser.add_argument("--samples", type=int, help="only use results for this number of samples")
+parser.add_argument("--features", help="only use results for this feature set (e.g. unigram)")
+parser.add_argument("--cipher", help="only use results scored on this cipher's ciphertexts (e.g. shift)")
+parser.add_argument("--output", help="image file to save the graph to (shown in a window otherwise)")
+args = parser.parse_args()
 
-#heights = [.835, .929, .935, .942, .945, .949]
-#heights = [.923, .88, .829, .868]
-#heights = [.815, .855, .876, .9, .935]
-heights = [1, 1, 1, .903, .867]
+filters = {column: getattr(args, column) for column in ["classifier", "text_length", "samples", "features", "cipher"] if getattr(args, column) is not None}
+if args.group_by != "cipher" and args.cipher is None:
+    filters["cipher"] = None # Results over every cipher
+results = results_store.query_results(**filters)
+if args.group_by == "cipher":
+    results = [result for result in results if result["cipher"] is not None] # Only the results of a single cipher
+if len(results) == 0:
+    raise SystemExit("No results in " + results_store.database_file_name + " match " + str(filters) + " (run the programs in ../ML Experiments first)")
 
-# KNN = .835, Random Forest = .935, MLP = .945, SVM = .929, Adaboost = .942, VotingClassifier = .949
-# Using bigram counts MLP=.927, both combined = .9432, using trigram counts mlp=.83, using all 3=.868
+# Each bar needs a single result, so anything we didn't filter on or group by has to be the same for every result.
+for column in ["classifier", "text_length", "samples", "features", "cipher"]:
+    values = sorted(set(result[column] for result in results))
+    if column != args.group_by and len(values) > 1:
+        raise SystemExit("Results have more than one " + column + " (" + ", ".join(str(value) for value in values)
+                         + "), choose one with --" + column.replace("_", "-"))
+results.sort(key=lambda result: result[args.group_by])
 
-#labels = ["KNN", "SVM", "RF", "Adaboost", "MLP", "Voting"]
-#labels = ["monogram", "bigram", "trigram", "all combined"]
-#labels = ["100", "200", "300", "500", "1000"]
-labels = ["columnar", "shift", "playfair", "hill", "vigenere"]
+x_coordinates = list(range(1, len(results) + 1))
+labels = [str(result[args.group_by]) for result in results]
+heights = [result["accuracy"] for result in results]
+fit_seconds = [result["fit_seconds"] or 0 for result in results]
+predict_seconds = [result["predict_seconds"] or 0 for result in results]
 
-# plotting a bar chart
-plot.bar(x_coordinates, heights, tick_label = labels,
-        width = 0.8, color = ["blue"])
+for result, label in zip(results, labels):
+    seconds = (result["fit_seconds"] or 0) + (result["predict_seconds"] or 0)
+    print(label + ": accuracy " + str(round(result["accuracy"], 3)) + ", " + str(round(seconds, 2)) + "s, "
+          + (str(round(result["accuracy"] / seconds, 4)) + " accuracy per second, " if seconds > 0 else "")
+          + str(round((result["peak_memory_bytes"] or 0) / 1024 ** 2)) + " MB peak")
 
-#plot.xlabel("Classifier")
-#plot.xlabel("Statistic")
-#plot.xlabel("Ciphertext Length")
-plot.xlabel("Cipher vs Rest")
+figure, [accuracy_axes, cost_axes] = plot.subplots(1, 2, figsize=(12, 5))
+
+# plotting a bar chart of the accuracies
+accuracy_axes.bar(x_coordinates, heights, tick_label = labels,
+        width = 0.8, color = ["blue"])
+accuracy_axes.set_xlabel(args.group_by.replace("_", " ").title())
+accuracy_axes.set_ylabel("Accuracy")
+accuracy_axes.set_title("Accuracy")
 
-plot.ylabel("Accuracy")
+# and one of the costs, with the time spent predicting stacked on top of the time spent fitting
+cost_axes.bar(x_coordinates, fit_seconds, tick_label = labels, width = 0.8, color = ["orange"], label = "fit")
+cost_axes.bar(x_coordinates, predict_seconds, bottom = fit_seconds, width = 0.8, color = ["green"], label = "predict")
+cost_axes.set_xlabel(args.group_by.replace("_", " ").title())
+cost_axes.set_ylabel("Seconds")
+cost_axes.set_title("Cost")
+cost_axes.legend()
 
-#plot.title("Performance of Classifiers\n (text_length=1000, number_of_samples=25000)")
-#plot.title("Ciphertext Statistic Performance using MLP\n (text_length=1000, number_of_samples=5000)")
-#plot.title("Accuracy for each Ciphertext Length using RF\n (number_of_samples=25000)")
-plot.title("Cipher vs Rest Accuracy using SVM\n (text_length=1000, number_of_samples=5000)")
+settings = [column + "=" + str(results[0][column]) for column in ["classifier", "text_length", "samples", "features", "cipher"]
+            if column != args.group_by and results[0][column] is not None]
+figure.suptitle("Performance by " + args.group_by.replace("_", " ") + "\n (" + ", ".join(settings) + ")")
+figure.tight_layout()
 
-plot.show()
+if args.output:
+    plot.savefig(args.output)
+else:
+    plot.show()
@@ -0,0 +1,114 @@
+"""
+This file is used to keep the results of our experiments in a local SQLite database (./results.db),
+so graphs (see ./CreateGraph.py) can be made from them instead of from results copied by hand. Each
+run of an experiment script in ../ML Experiments adds one row with how accurate its classifier was
+and what it cost: the seconds spent fitting and predicting, and the peak memory of the process.
+Scripts that also score each cipher on its own (e.g. ../ML Experiments/SVM/SVM(one-vs-rest).py) add
+one more row per cipher, with the cipher column set. It's NULL in the rows for every cipher together.
+
+__author__ = "Aaron Smith"
+__date__ = "10/18/2026"
+"""
+
+import os
+import sqlite3
+import sys
+import time
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Benchmarks")) # For instrumentation.py
+import instrumentation
+
+database_file_name = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results.db")
+
+columns = ["classifier", "text_length", "samples", "features", "cipher", "accuracy", "fit_seconds", "predict_seconds", "peak_memory_bytes",
+           "recorded", "notes"]
+
+
+def connect(file_name=None):
+    """
+    Function to open the results database, creating it if it doesn't exist yet.
+
+    Args:
+        file_name: Database to open (defaults to database_file_name)
+    """
+    connection = sqlite3.connect(file_name or database_file_name, timeout=30)
+    connection.execute("""CREATE TABLE IF NOT EXISTS results (
+                              id INTEGER PRIMARY KEY AUTOINCREMENT,
+                              classifier TEXT NOT NULL,
+                              text_length INTEGER NOT NULL,
+                              samples INTEGER NOT NULL,
+                              features TEXT NOT NULL,
+                              cipher TEXT,
+                              accuracy REAL NOT NULL,
+                              fit_seconds REAL,
+                              predict_seconds REAL,
+                              peak_memory_bytes INTEGER,
+                              recorded TEXT NOT NULL,
+                              notes TEXT)""")
+    # Databases made before the cipher column was added get it now (NULL in their rows).
+    if "cipher" not in [row[1] for row in connection.execute("PRAGMA table_info(results)")]:
+        with connection:
+            connection.execute("ALTER TABLE results ADD COLUMN cipher TEXT")
+    return connection
+
+
+def feature_name(ngram_sizes=None, hmm_models=None):
+    """
+    Function to get the name of a feature set, e.g. "unigram", "unigram+bigram" or "unigram+hmm".
+
+    Args:
+        ngram_sizes: List of n-gram sizes (see ../ML Experiments/features.py), or None for unigram counts
+        hmm_models: List of HMM model files whose scores were also used, or None
+    """
+    names = {1: "unigram", 2: "bigram", 3: "trigram"}
+    return "+".join([names.get(n, str(n) + "-gram") for n in (ngram_sizes or [1])] + (["hmm"] if hmm_models else []))
+
+
+def record_result(classifier, text_length, samples, accuracy, fit_seconds=None, predict_seconds=None, ngram_sizes=None,
+                  peak_memory_bytes=None, notes=None, file_name=None, hmm_models=None, cipher=None):
+    """
+    Function to add the result of an experiment to the results database.
+
+    Args:
+        classifier: Name of the classifier (e.g. "knn")
+        text_length: Number of characters of ciphertext used
+        samples: Total number of samples used for training
+        accuracy: Score of the classifier on the scoring set
+        fit_seconds: Seconds spent fitting the classifier
+        predict_seconds: Seconds spent classifying the scoring set
+        ngram_sizes: List of n-gram sizes used as features, or None for unigram counts
+        peak_memory_bytes: Peak memory used (defaults to the peak of this process so far, see instrumentation.peak_memory())
+        notes: Anything else worth keeping (e.g. the seed)
+        file_name: Database to add to (defaults to database_file_name)
+        hmm_models: List of HMM model files whose scores were also used as features, or None
+        cipher: The cipher, if accuracy is for the ciphertexts of one cipher only (e.g. "shift"), or None if it's for every cipher
+    """
+    if peak_memory_bytes is None:
+        peak_memory_bytes = instrumentation.peak_memory() # Still None if it can't be measured here
+    connection = connect(file_name)
+    with connection:
+        connection.execute("INSERT INTO results (" + ", ".join(columns) + ") VALUES (" + ", ".join("?" * len(columns)) + ")",
+                           (classifier, int(text_length), int(samples), feature_name(ngram_sizes, hmm_models), cipher, float(accuracy), fit_seconds,
+                            predict_seconds, None if peak_memory_bytes is None else int(peak_memory_bytes), time.strftime("%Y-%m-%d %H:%M:%S"), notes))
+    connection.close()
+
+
+def query_results(latest=True, file_name=None, **filters):
+    """
+    Function to get results from the database, as a list of dictionaries (one per result, keyed by columns).
+
+    Args:
+        latest: Whether to keep only the most recent result of each classifier, text length, number of samples, feature set and cipher
+        file_name: Database to read (defaults to database_file_name)
+        filters: Column values results must have, e.g. text_length=1000 (or cipher=None for results over every cipher)
+    """
+    for column in filters:
+        if column not in columns:
+            raise ValueError("Unknown column " + column)
+    conditions = " AND ".join(column + (" IS NULL" if value is None else " = ?") for [column, value] in filters.items())
+    query = "SELECT " + ", ".join(columns) + " FROM results" + (" WHERE " + conditions if conditions else "")
+    if latest:
+        query += (" AND " if conditions else " WHERE ") + "id IN (SELECT MAX(id) FROM results GROUP BY classifier, text_length, samples, features, cipher)"
+    connection = connect(file_name)
+    rows = connection.execute(query + " ORDER BY id", tuple(value for value in filters.values() if value is not None)).fetchall()
+    connection.close()
+    return [dict(zip(columns, row)) for row in rows]